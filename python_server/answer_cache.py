@@ -0,0 +1,163 @@
+
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get('ANSWER_CACHE_MAX_ENTRIES', 512))
+DEFAULT_TTL_SECONDS = int(os.environ.get('ANSWER_CACHE_TTL_SECONDS', 6 * 3600))
+# Questions with at most this many words are eligible for fuzzy matching
+FUZZY_MAX_WORDS = 12
+# Filler words ignored when short questions are matched by their remaining words. Negations, places,
+# numbers and question words other than 'what' change the answer, so they always have to match.
+FUZZY_STOPWORDS = frozenset({
+    'a', 'an', 'the', 'is', 'are', 'was', 'were', 'be', 'do', 'does', 'did', 'please', 'tell', 'me', 'us',
+    'about', 'of', 'in', 'for', 'at', 'on', 'to', 'and', 'can', 'could', 'would', 'you', 'i', 'we', 'my', 'our',
+    'know', 'want', 'like', 'there', 'any', 'some', 'it', 'its', 'current', 'currently', 'kindly', 'hi', 'hello',
+    'what', 'whats', 'show',
+})
+
+
+def normalize_question(text):
+    """Lowercase, strip punctuation and collapse whitespace"""
+    text = re.sub(r'[^a-z0-9\s]', ' ', (text or '').lower())
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def fuzzy_words(normalized):
+    """The words two short questions must share, in any order, to share an answer"""
+    return frozenset(word for word in normalized.split() if word not in FUZZY_STOPWORDS)
+
+
+def _history_digest(chat_history):
+    digest = hashlib.sha1()
+    for msg in chat_history:
+        digest.update(f"{msg.get('role')}:{normalize_question(msg.get('content', ''))}".encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class AnswerCache:
+    """LRU cache of chatbot answers keyed on normalized question text"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.prompt_version = None
+        self._entries = OrderedDict()
+        # Word set -> key of the latest short single-turn question with those words, for fuzzy lookups
+        self._word_index = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'fuzzyHits': 0, 'misses': 0, 'latencySavedSeconds': 0.0, 'invalidations': 0}
+
+    def _key(self, normalized, chat_history):
+        if chat_history:
+            return f"{normalized}|{_history_digest(chat_history)}"
+        return normalized
+
+    def set_system_prompt(self, system_prompt):
+        """Invalidate all answers when the system prompt changes"""
+        version = hashlib.sha1(system_prompt.encode('utf-8')).hexdigest()
+        if version != self.prompt_version:
+            if self.prompt_version is not None:
+                print("System prompt changed, invalidating answer cache")
+            self.invalidate()
+            self.prompt_version = version
+
+    def invalidate(self):
+        """Drop every cached answer"""
+        with self._lock:
+            self._entries.clear()
+            self._word_index.clear()
+            self._stats['invalidations'] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None and self._word_index.get(entry['words']) == key:
+            del self._word_index[entry['words']]
+
+    def _fuzzy_lookup(self, words, now):
+        key = self._word_index.get(words)
+        if key is None:
+            return None
+        if now - self._entries[key]['created'] > self.ttl_seconds:
+            self._remove(key)
+            return None
+        return key
+
+    def get(self, question, chat_history=None):
+        """Return a cached answer or None"""
+        normalized = normalize_question(question)
+        key = self._key(normalized, chat_history)
+        now = self.clock()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry['created'] > self.ttl_seconds:
+                self._remove(key)
+                entry = None
+
+            fuzzy = False
+            if entry is None and not chat_history:
+                words = fuzzy_words(normalized)
+                if words and len(normalized.split()) <= FUZZY_MAX_WORDS:
+                    key = self._fuzzy_lookup(words, now)
+                    entry = self._entries.get(key) if key else None
+                    fuzzy = entry is not None
+
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            if fuzzy:
+                self._stats['fuzzyHits'] += 1
+            self._stats['latencySavedSeconds'] += entry['latency']
+            return entry['answer']
+
+    def put(self, question, answer, latency=0.0, chat_history=None):
+        """Store an answer along with the time it took to generate"""
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+        key = self._key(normalized, chat_history)
+        words = fuzzy_words(normalized)
+        indexed = not chat_history and bool(words) and len(normalized.split()) <= FUZZY_MAX_WORDS
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = {
+                'answer': answer,
+                'created': self.clock(),
+                'latency': latency,
+                'words': words if indexed else frozenset()
+            }
+            if indexed:
+                self._word_index[words] = key
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def get_or_generate(self, question, chat_history, generate):
+        """Return a cached answer, or call generate() and cache its result"""
+        answer = self.get(question, chat_history)
+        if answer is not None:
+            return answer
+
+        started = time.perf_counter()
+        answer = generate()
+        self.put(question, answer, time.perf_counter() - started, chat_history)
+        return answer
+
+    def stats(self):
+        """Return hit rate and latency saved"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hitRate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['latencySavedSeconds'] = round(stats['latencySavedSeconds'], 3)
+        return stats
@@ -1,25 +1,64 @@
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response
 from flask_cors import CORS
 import os
-import google.generativeai as genai
 import json
+import time
+import threading
+import base64
+import binascii
 from datetime import datetime
-import pandas as pd
-from data_fetcher import PCMCDataFetcher
+from city_registry import CityRegistry, UnknownCity
+from refresh_scheduler import RefreshScheduler, SOURCE_REFRESH_ENABLED
+from snapshot import SNAPSHOT_PATH, SnapshotError, load_snapshot
+from chat_history import ChatHistoryManager
+from answer_cache import AnswerCache
+from chat_model import get_chat_model, use_stub_model
+from priority import PRIORITY_MAX_BATCH, TEXT_FIELDS as PRIORITY_TEXT_FIELDS, prioritize_complaints
+from attachments import ATTACHMENT_MAX_BYTES, ATTACHMENT_MAX_FILES, ATTACHMENT_MAX_REQUEST_BYTES, get_attachment_extractor
+from concurrency import Overloaded
+from metrics import registry, request_latency, request_size, response_size, time_stage
+from profiling import RequestProfiler
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+app.config['MAX_CONTENT_LENGTH'] = ATTACHMENT_MAX_REQUEST_BYTES
 
-# Configure Gemini API with key from environment
+# Gemini API key from environment (google.generativeai is configured on first use)
 api_key = os.environ.get("GEMINI_API_KEY")
-if api_key:
-    genai.configure(api_key=api_key)
-else:
+if not api_key:
     print("WARNING: GEMINI_API_KEY not set in environment variables")
 
-# Initialize the data fetcher
-data_fetcher = PCMCDataFetcher()
+# One data fetcher per configured city (cities.json); data_fetcher is the default city's
+city_registry = CityRegistry()
+data_fetcher = city_registry.get()
+
+# Refreshes sources in the background on their own schedules; started by the
+# server entry points (not on import) so scripts importing app stay offline
+refresh_scheduler = RefreshScheduler(city_registry.fetchers())
+
+# Warm start from a snapshot baked into the image or mounted volume (snapshot.py export)
+if SNAPSHOT_PATH:
+    try:
+        load_snapshot(SNAPSHOT_PATH, city_registry)
+    except (OSError, SnapshotError) as e:
+        print(f"WARNING: could not load snapshot {SNAPSHOT_PATH}, starting cold: {e}")
+
+# Live complaint rates and resolution times per city, created on first use (live_stats needs numpy and
+# pandas); serve.py creates them before forking, so workers share them
+_complaint_streams = {}
+_complaint_streams_lock = threading.Lock()
+
+def get_complaint_streams():
+    with _complaint_streams_lock:
+        if not _complaint_streams:
+            from live_stats import ComplaintStream
+            for fetcher in city_registry.fetchers():
+                _complaint_streams[fetcher.city] = ComplaintStream(fetcher.areas, fetcher.city_names)
+    return _complaint_streams
+
+# Keeps /chatbot prompts within a token budget across long conversations
+chat_history_manager = ChatHistoryManager()
 
 # Dictionary of measurement explanations for water and energy metrics
 MEASUREMENT_EXPLANATIONS = {
@@ -41,6 +80,67 @@ MEASUREMENT_EXPLANATIONS = {
     }
 }
 
+# System prompt with context about the city services
+CHATBOT_SYSTEM_PROMPT = """
+You are CityAssist, a helpful assistant for a citizen services portal focusing on water and energy services in the Pimpri Chinchwad area.
+You help users navigate the portal and submit complaints about water and energy services.
+
+Some facts about the system:
+- Users can submit complaints through text, voice recording, or image upload
+- Complaints can be categorized as water or energy related
+- Complaints are assigned a priority (low, medium, high)
+- Users can track the status of their complaints
+
+Important facts about Pimpri Chinchwad water and electricity:
+- The city faces seasonal water shortages, especially during summer months
+- Water is supplied from Pavana dam and is treated at Nigdi water treatment plant
+- Electricity is distributed by MSEDCL (Maharashtra State Electricity Distribution Company Limited)
+- Power demand peaks during summer months due to air conditioning use
+- Many areas are experiencing infrastructure upgrades to support growing population
+
+Be concise, friendly, and helpful. If you don't know something, say so.
+"""
+
+# Cache answers to the handful of questions most users ask
+answer_cache = AnswerCache()
+answer_cache.set_system_prompt(CHATBOT_SYSTEM_PROMPT)
+
+registry.gauge(
+    'pcmc_answer_cache', 'Chatbot answer cache statistics', ('stat',),
+    callback=lambda: [((name,), value) for name, value in answer_cache.stats().items()]
+)
+registry.gauge(
+    'pcmc_source_age_seconds', 'Age of each cached data source', ('city', 'source'),
+    callback=lambda: [((fetcher.city, key), entry['ageSeconds']) for fetcher in city_registry.fetchers()
+                      for key, entry in fetcher.source_status().items() if entry['cached']]
+)
+registry.gauge(
+    'pcmc_source_cache', 'Source cache size and evictions', ('stat',),
+    callback=lambda: [((name,), value) for name, value in city_registry.cache.stats().items() if name != 'compress']
+)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_latency.observe(time.perf_counter() - started, endpoint, request.method, str(response.status_code))
+        request_size.observe(request.content_length or 0, endpoint)
+        response_size.observe(response.calculate_content_length() or 0, endpoint)
+    return response
+
+# Opt-in request profiling (PROFILE_TOKEN header or PROFILE_SAMPLE_RATE)
+request_profiler = RequestProfiler()
+request_profiler.init_app(app)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/chatbot', methods=['POST'])
 def chatbot():
     try:
@@ -51,52 +151,188 @@ def chatbot():
         
         message = data.get('message', '')
         chat_history = data.get('chatHistory', [])
+        conversation_id = data.get('conversationId')
         
         # Check if API key is available
-        if not api_key:
+        if not api_key and not use_stub_model():
             return jsonify({"error": "GEMINI_API_KEY not set"}), 500
         
-        # Create a prompt with context about the city services
-        system_prompt = """
-        You are CityAssist, a helpful assistant for a citizen services portal focusing on water and energy services in the Pimpri Chinchwad area.
-        You help users navigate the portal and submit complaints about water and energy services.
+        answer = answer_cache.get_or_generate(
+            message, chat_history,
+            lambda: generate_chat_response(message, chat_history, conversation_id)
+        )
         
-        Some facts about the system:
-        - Users can submit complaints through text, voice recording, or image upload
-        - Complaints can be categorized as water or energy related
-        - Complaints are assigned a priority (low, medium, high)
-        - Users can track the status of their complaints
-        
-        Important facts about Pimpri Chinchwad water and electricity:
-        - The city faces seasonal water shortages, especially during summer months
-        - Water is supplied from Pavana dam and is treated at Nigdi water treatment plant
-        - Electricity is distributed by MSEDCL (Maharashtra State Electricity Distribution Company Limited)
-        - Power demand peaks during summer months due to air conditioning use
-        - Many areas are experiencing infrastructure upgrades to support growing population
-        
-        Be concise, friendly, and helpful. If you don't know something, say so.
-        """
-        
-        # Format the chat history for Gemini
-        messages = [{"role": "system", "parts": [system_prompt]}]
+        return jsonify({"response": answer})
+    
+    except Exception as e:
+        print(f"Error in chatbot endpoint: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/chatbot/cache_stats', methods=['GET'])
+def chatbot_cache_stats():
+    return jsonify(answer_cache.stats())
+
+@app.route('/data_freshness', methods=['GET'])
+def data_freshness():
+    city = request.args.get('city')
+    if city and city not in city_registry.cities:
+        return jsonify({"error": f"Unknown city: {city}"}), 400
+    return jsonify(refresh_scheduler.status(city))
+
+@app.route('/cities', methods=['GET'])
+def cities():
+    return jsonify(city_registry.stats())
+
+def validate_priority_request(data):
+    """Error response for a bad /prioritize_complaints payload, or None"""
+    if not data:
+        return {"error": "No data provided"}, 400
+    complaints = data.get('complaints')
+    if not isinstance(complaints, list) or not complaints or not all(isinstance(c, dict) for c in complaints):
+        return {"error": "complaints must be a non-empty list of complaint objects"}, 400
+    if len(complaints) > PRIORITY_MAX_BATCH:
+        return {"error": f"At most {PRIORITY_MAX_BATCH} complaints per request"}, 413
+    for i, complaint in enumerate(complaints):
+        for field in PRIORITY_TEXT_FIELDS:
+            if complaint.get(field) is not None and not isinstance(complaint[field], str):
+                return {"error": f"complaints[{i}].{field} must be a string"}, 400
+    return None
+
+@app.route('/prioritize_complaints', methods=['POST'])
+def prioritize_complaints_endpoint():
+    try:
+        data = request.json
+        invalid = validate_priority_request(data)
+        if invalid:
+            return jsonify(invalid[0]), invalid[1]
         
-        for msg in chat_history:
-            role = "user" if msg.get("role") == "user" else "model"
-            messages.append({"role": role, "parts": [msg.get("content", "")]})
+        # Complaints the rules cannot decide go to the model unless the caller opts out
+        use_llm = data.get('useLlm', True) and (api_key or use_stub_model())
+        result = prioritize_complaints(data['complaints'], get_chat_model() if use_llm else None)
         
-        # Add the current message
-        messages.append({"role": "user", "parts": [message]})
+        return jsonify(result)
+    
+    except Exception as e:
+        print(f"Error in prioritize_complaints endpoint: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+def validate_events_request(data):
+    """Error response for a bad /complaint_events payload, or None"""
+    from live_stats import LIVE_STATS_MAX_BATCH
+    if not data:
+        return {"error": "No data provided"}, 400
+    events = data.get('events')
+    if not isinstance(events, list) or not events or not all(isinstance(e, dict) for e in events):
+        return {"error": "events must be a non-empty list of complaint event objects"}, 400
+    if len(events) > LIVE_STATS_MAX_BATCH:
+        return {"error": f"At most {LIVE_STATS_MAX_BATCH} events per request"}, 413
+    if data.get('city') and data['city'] not in get_complaint_streams():
+        return {"error": f"Unknown city: {data['city']}"}, 400
+    return None
+
+@app.route('/complaint_events', methods=['POST'])
+def complaint_events_endpoint():
+    try:
+        data = request.json
+        invalid = validate_events_request(data)
+        if invalid:
+            return jsonify(invalid[0]), invalid[1]
         
-        # Generate a response using Gemini
-        model = genai.GenerativeModel('gemini-pro')
-        response = model.generate_content(messages)
+        stream = get_complaint_streams()[data.get('city') or city_registry.default_city]
+        with time_stage('live_stats'):
+            result = stream.add_events(data['events'])
         
-        return jsonify({"response": response.text})
+        return jsonify(result)
     
     except Exception as e:
-        print(f"Error in chatbot endpoint: {str(e)}")
+        print(f"Error in complaint_events endpoint: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/live_stats', methods=['GET'])
+def live_stats():
+    city = request.args.get('city') or city_registry.default_city
+    streams = get_complaint_streams()
+    if city not in streams:
+        return jsonify({"error": f"Unknown city: {city}"}), 400
+    return jsonify(streams[city].snapshot())
+
+def attachment_request_bytes(content_length, content_type):
+    """Memory an attachment request is reserved before its body is read: the body, which is at most
+    ATTACHMENT_MAX_REQUEST_BYTES when its length is not declared, and for JSON also the decoded files"""
+    size = min(content_length or ATTACHMENT_MAX_REQUEST_BYTES, ATTACHMENT_MAX_REQUEST_BYTES)
+    return size if (content_type or '').startswith('multipart/') else 2 * size
+
+def read_attachment_files(uploads, data):
+    """(name, bytes) pairs from multipart (filename, file) uploads or JSON `files` with base64 `content`,
+    or an error response"""
+    if uploads:
+        files = [(name or f"file{i}", f.read(ATTACHMENT_MAX_BYTES + 1)) for i, (name, f) in enumerate(uploads)]
+    else:
+        entries = (data or {}).get('files')
+        if not isinstance(entries, list) or not all(isinstance(e, dict) and e.get('content') for e in entries):
+            return None, ({"error": "files must be uploaded as multipart files or a list of {name, content} objects"}, 400)
+        try:
+            files = [(entry.get('name') or f"file{i}", base64.b64decode(entry['content'], validate=True))
+                     for i, entry in enumerate(entries)]
+        except (binascii.Error, ValueError, TypeError):
+            return None, ({"error": "file content must be base64 encoded"}, 400)
+    if not files:
+        return None, ({"error": "No files provided"}, 400)
+    if len(files) > ATTACHMENT_MAX_FILES:
+        return None, ({"error": f"At most {ATTACHMENT_MAX_FILES} files per request"}, 413)
+    too_large = [name for name, content in files if len(content) > ATTACHMENT_MAX_BYTES]
+    if too_large:
+        return None, ({"error": f"Files larger than {ATTACHMENT_MAX_BYTES} bytes: {', '.join(too_large)}"}, 413)
+    return files, None
+
+@app.route('/extract_attachments', methods=['POST'])
+def extract_attachments_endpoint():
+    try:
+        extractor = get_attachment_extractor(city_registry.cache)
+        # Reserved before request.files or the JSON body is read, so queued requests do not hold their files
+        with extractor.reserved(attachment_request_bytes(request.content_length, request.mimetype)):
+            uploads = [(f.filename, f) for f in request.files.getlist('files')]
+            files, invalid = read_attachment_files(uploads, request.get_json(silent=True))
+            if invalid:
+                return jsonify(invalid[0]), invalid[1]
+
+            return jsonify(extractor.extract_batch(files))
+    
+    except Overloaded as e:
+        return jsonify({"error": str(e)}), 503, {'Retry-After': str(e.retry_after)}
+    except Exception as e:
+        print(f"Error in extract_attachments endpoint: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+def build_chat_messages(message, chat_history, conversation_id):
+    """Build the Gemini prompt for a chat turn"""
+    # Collapse older turns into a rolling summary to stay within the token budget
+    summary, recent_history = chat_history_manager.compact(conversation_id, chat_history)
+    
+    # Format the chat history for Gemini
+    system_parts = [CHATBOT_SYSTEM_PROMPT]
+    if summary:
+        system_parts.append(f"Summary of the earlier conversation:\n{summary}")
+    messages = [{"role": "system", "parts": system_parts}]
+    
+    for msg in recent_history:
+        role = "user" if msg.get("role") == "user" else "model"
+        messages.append({"role": role, "parts": [msg.get("content", "")]})
+    
+    # Add the current message
+    messages.append({"role": "user", "parts": [message]})
+    
+    return messages
+
+def generate_chat_response(message, chat_history, conversation_id):
+    """Generate a response for a chat turn using Gemini"""
+    messages = build_chat_messages(message, chat_history, conversation_id)
+    model = get_chat_model()
+    with time_stage('upstream_chat'):
+        response = model.generate_content(messages)
+    
+    return response.text
+
 @app.route('/generate_analytics', methods=['POST'])
 def generate_analytics():
     try:
@@ -108,60 +344,73 @@ def generate_analytics():
         complaints = data.get('complaints', [])
         user_role = data.get('userRole', 'citizen')
         view_type = data.get('viewType', 'overview')
+        city_fetcher = city_registry.get(data.get('city'))
         
         # Fetch real-time analytics data based on role
-        water_analytics = data_fetcher.get_water_analytics()
-        energy_analytics = data_fetcher.get_energy_analytics()
-        
-        # Get the measurement explanations
-        water_explanations = MEASUREMENT_EXPLANATIONS["water"]
-        energy_explanations = MEASUREMENT_EXPLANATIONS["energy"]
+        water_analytics = city_fetcher.get_water_analytics()
+        energy_analytics = city_fetcher.get_energy_analytics()
         
         # Process complaints data if available
-        complaint_analytics = process_complaints(complaints, user_role) if complaints else {}
+        with time_stage('aggregate'):
+            complaint_analytics = process_complaints(complaints, user_role, city_fetcher.areas,
+                                                     data.get('incidents') is True,
+                                                     city_fetcher.city_names) if complaints else {}
         
-        # Generate dynamic advisory based on the analytics
-        water_advisory = generate_water_advisory(water_analytics, complaints)
-        energy_advisory = generate_energy_advisory(energy_analytics, complaints)
-        
-        # Combine all analytics data
-        combined_analytics = {
-            # Include general analytics first
-            **complaint_analytics,
-            
-            # Add water-specific analytics
-            "waterConsumption": water_analytics.get('waterConsumption', []),
-            "waterSources": water_analytics.get('waterSources', []),
-            "seasonalWaterDemand": water_analytics.get('seasonalDemand', []),
-            "waterQuality": water_analytics.get('waterQuality', []),
-            "waterAlerts": water_analytics.get('citizenAlerts', []),
-            "waterProjections": water_analytics.get('waterProjections', []),
-            "waterEfficiency": water_analytics.get('waterEfficiency', []),
-            "waterRisks": water_analytics.get('waterRisks', []),
-            "waterExplanations": water_explanations,
-            "waterAdvisory": water_advisory,
-            
-            # Add energy-specific analytics
-            "energyConsumption": energy_analytics.get('energyConsumption', []),
-            "energySources": energy_analytics.get('energySources', []),
-            "seasonalEnergyDemand": energy_analytics.get('seasonalDemand', []),
-            "energyQuality": energy_analytics.get('energyQuality', []),
-            "energyAlerts": energy_analytics.get('citizenAlerts', []),
-            "energyProjections": energy_analytics.get('energyProjections', []),
-            "energyEfficiency": energy_analytics.get('energyEfficiency', []),
-            "energyRisks": energy_analytics.get('energyRisks', []),
-            "energyExplanations": energy_explanations,
-            "energyAdvisory": energy_advisory
-        }
+        combined_analytics = combine_analytics(water_analytics, energy_analytics, complaint_analytics, complaints)
         
         print(f"Generated combined analytics with {len(combined_analytics.keys())} key metrics")
         
         return jsonify(combined_analytics)
     
+    except UnknownCity as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error in generate_analytics endpoint: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+def combine_analytics(water_analytics, energy_analytics, complaint_analytics, complaints):
+    """Merge resource analytics, complaint analytics and advisories into one response"""
+    # Get the measurement explanations
+    water_explanations = MEASUREMENT_EXPLANATIONS["water"]
+    energy_explanations = MEASUREMENT_EXPLANATIONS["energy"]
+    
+    # Generate dynamic advisory based on the analytics
+    with time_stage('advisory'):
+        water_advisory = generate_water_advisory(water_analytics, complaints)
+        energy_advisory = generate_energy_advisory(energy_analytics, complaints)
+    
+    # Combine all analytics data
+    combined_analytics = {
+        # Include general analytics first
+        **complaint_analytics,
+        
+        # Add water-specific analytics
+        "waterConsumption": water_analytics.get('waterConsumption', []),
+        "waterSources": water_analytics.get('waterSources', []),
+        "seasonalWaterDemand": water_analytics.get('seasonalDemand', []),
+        "waterQuality": water_analytics.get('waterQuality', []),
+        "waterAlerts": water_analytics.get('citizenAlerts', []),
+        "waterProjections": water_analytics.get('waterProjections', []),
+        "waterEfficiency": water_analytics.get('waterEfficiency', []),
+        "waterRisks": complaint_analytics.get('waterRisks') or water_analytics.get('waterRisks', []),
+        "waterExplanations": water_explanations,
+        "waterAdvisory": water_advisory,
+        
+        # Add energy-specific analytics
+        "energyConsumption": energy_analytics.get('energyConsumption', []),
+        "energySources": energy_analytics.get('energySources', []),
+        "seasonalEnergyDemand": energy_analytics.get('seasonalDemand', []),
+        "energyQuality": energy_analytics.get('energyQuality', []),
+        "energyAlerts": energy_analytics.get('citizenAlerts', []),
+        "energyProjections": energy_analytics.get('energyProjections', []),
+        "energyEfficiency": energy_analytics.get('energyEfficiency', []),
+        "energyRisks": complaint_analytics.get('energyRisks') or energy_analytics.get('energyRisks', []),
+        "energyExplanations": energy_explanations,
+        "energyAdvisory": energy_advisory
+    }
+    
+    return combined_analytics
+
 def generate_water_advisory(water_data, complaints):
     """Generate dynamic water advisory based on current data"""
     try:
@@ -325,11 +574,16 @@ def generate_charts():
         if not data_source or not params:
             return jsonify({"error": "Missing data source or parameters"}), 400
         
+        city_fetcher = city_registry.get(data.get('city'))
+        
         # Generate the chart
-        chart_result = data_fetcher.generate_analytics_chart(chart_type, data_source, params)
+        with time_stage('chart_render'):
+            chart_result = city_fetcher.generate_analytics_chart(chart_type, data_source, params)
         
         return jsonify(chart_result)
     
+    except UnknownCity as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error in generate_charts endpoint: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -348,28 +602,57 @@ def fetch_resource_data():
         if not resource_type:
             return jsonify({"error": "Missing resource type"}), 400
         
-        # Fetch data based on resource type
-        if resource_type == 'water':
-            result = data_fetcher.get_water_analytics()
-            result['explanations'] = MEASUREMENT_EXPLANATIONS['water']
-        elif resource_type == 'energy':
-            result = data_fetcher.get_energy_analytics()
-            result['explanations'] = MEASUREMENT_EXPLANATIONS['energy']
-        else:
+        if resource_type not in RESOURCE_TYPES:
             return jsonify({"error": f"Unknown resource type: {resource_type}"}), 400
         
+        result = get_resource_analytics(resource_type, data.get('city'))
+        
         return jsonify({
             "success": True,
             "data": result,
             "timestamp": datetime.now().isoformat()
         })
     
+    except UnknownCity as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error in fetch_resource_data endpoint: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-def process_complaints(complaints, user_role):
-    """Process complaints data to generate analytics"""
+RESOURCE_TYPES = ('water', 'energy')
+
+def get_resource_analytics(resource_type, city=None):
+    """Fetch analytics for one resource type along with its measurement explanations"""
+    city_fetcher = city_registry.get(city)
+    # Fetch data based on resource type
+    if resource_type == 'water':
+        result = city_fetcher.get_water_analytics()
+    else:
+        result = city_fetcher.get_energy_analytics()
+    result['explanations'] = MEASUREMENT_EXPLANATIONS[resource_type]
+    return result
+
+def complaint_incidents(df):
+    """Group a complaints DataFrame's near-duplicate descriptions into incidents"""
+    import pandas as pd
+    from incidents import cluster_complaints
+
+    if 'date' in df.columns and pd.api.types.is_datetime64_any_dtype(df['date']):
+        dates = df['date'] if df['date'].dt.tz is not None else df['date'].dt.tz_localize('UTC')
+        timestamps = ((dates - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(seconds=1)).tolist()
+    else:
+        timestamps = [None] * len(df)
+    return cluster_complaints(
+        df['description'].tolist(), timestamps,
+        df['category'].tolist() if 'category' in df.columns else None,
+        df['location'].tolist() if 'location' in df.columns else None
+    )
+
+def process_complaints(complaints, user_role, areas=None, incidents=False, city_names=()):
+    """Process complaints data to generate analytics; with the city's areas (and names), also per-area figures
+    and risks, and with incidents=True also near-duplicate incidents"""
+    import pandas as pd
+    
     try:
         # Create a pandas DataFrame for more advanced analysis
         df = pd.DataFrame(complaints)
@@ -466,6 +749,18 @@ def process_complaints(complaints, user_role):
             time_counts.columns = ['name', 'value']
             result['timeOfDayData'] = time_counts.to_dict('records')
         
+        # Near-duplicate complaints about the same incident, grouped in arrival order (on request only)
+        if incidents and 'description' in df.columns:
+            try:
+                result['incidentData'] = complaint_incidents(df)
+            except Exception as e:
+                print(f"Error clustering complaint incidents: {e}")
+        
+        # Complaints tagged with the area they name, and supply risk per area computed from them
+        if areas:
+            from areas import complaint_area_analytics
+            result.update(complaint_area_analytics(df, areas, city_names))
+        
         return result
     
     except Exception as e:
@@ -474,4 +769,6 @@ def process_complaints(complaints, user_role):
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 5000))
+    if SOURCE_REFRESH_ENABLED:
+        refresh_scheduler.start()
     app.run(host='0.0.0.0', port=port, debug=True)
@@ -0,0 +1,292 @@
+"""Complaint locality tagging and per-area supply risk from complaint data
+
+Each city's areas and the localities inside them (the `aliases` in
+cities.json) are compiled together with the issue phrases into one keyword
+automaton, so a single pass over a complaint finds the area it names and the
+kind of problem it reports. Texts are scanned once per distinct value and
+remembered across requests. AreaAggregates keeps mergeable per-area,
+per-category sums of complaint volume, severity, resolution time and issue
+counts, so batches can be added as they arrive; the risk scores are computed
+from the totals with numpy.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from keyword_automaton import KeywordAutomaton, normalize
+
+# Distinct complaint texts whose scan results are remembered; the memo is cleared when full
+AREA_SCAN_CACHE_SIZE = int(os.environ.get('AREA_SCAN_CACHE_SIZE', 200000))
+
+# Base risk score per area risk tier in the supply risk assessments
+BASE_RISK = {
+    'water': {'low': 30, 'medium': 45, 'high': 60},
+    'energy': {'low': 25, 'medium': 40, 'high': 55},
+}
+
+# Risk columns per category as (key, issue, offset from the area's base risk)
+RISK_COLUMNS = {
+    'water': [('shortageRisk', 'shortage', 0), ('infrastructureRisk', 'infrastructure', -5),
+              ('qualityRisk', 'quality', -10)],
+    'energy': [('outageRisk', 'outage', 0), ('capacityRisk', 'capacity', -3),
+               ('infrastructureRisk', 'infrastructure', -8)],
+}
+
+# Phrases reporting each kind of problem, from the wording of sample_complaints/. A trailing '*' matches any
+# word starting with the stem.
+ISSUE_PHRASES = {
+    ('water', 'shortage'): [
+        'no water', 'without water', 'shortage*', 'low pressure', 'low water pressure', 'pressure dropping',
+        'dry tap*', 'irregular supply', 'irregular water supply', 'supply cut', 'no supply', 'tanker*',
+        'intermittent', 'only for', 'not received',
+    ],
+    ('water', 'quality'): [
+        'contaminat*', 'dirty water', 'muddy water', 'brown water', 'brownish', 'yellow water', 'discolo*',
+        'foul smell', 'bad smell', 'strong smell', 'foul odo*', 'sewage', 'unsafe for consumption',
+        'falling sick', 'falling ill', 'illness', 'turbid*', 'water quality', 'drinking water',
+    ],
+    ('water', 'infrastructure'): [
+        'leak*', 'burst*', 'pipe*', 'pipeline*', 'water main', 'valve*', 'meter*', 'drain*', 'sewer*',
+        'overflow*', 'water logging', 'waterlogging', 'damage*', 'broken', 'repair*',
+    ],
+    ('energy', 'outage'): [
+        'outage*', 'power cut*', 'no power', 'no electricity', 'blackout*', 'power failure', 'load shedding',
+        'without power', 'without electricity', 'tripping', 'power goes', 'power went',
+    ],
+    ('energy', 'capacity'): [
+        'voltage', 'fluctuat*', 'overload*', 'dim', 'flicker*', 'surge*', 'capacity', 'peak hours',
+        'appliances',
+    ],
+    ('energy', 'infrastructure'): [
+        'transformer*', 'wire*', 'wiring', 'cable*', 'pole*', 'meter*', 'spark*', 'substation*',
+        'street light*', 'streetlight*', 'damage*', 'broken', 'repair*',
+    ],
+}
+
+# Pseudo-complaints that score exactly the base risk tier, added to every area before it is compared with the
+# city, so an area with a handful of complaints stays near its base tier
+AREA_RISK_PRIOR = float(os.environ.get('AREA_RISK_PRIOR', 10))
+
+# Severity of a complaint by its priority; complaints without one count as medium
+SEVERITY_WEIGHTS = {'high': 1.0, 'medium': 0.5, 'low': 0.0}
+DEFAULT_SEVERITY = 0.5
+
+
+class Gazetteer:
+    """Finds the area and the issues a complaint names in one automaton pass"""
+
+    def __init__(self, areas, city_names=(), issue_phrases=ISSUE_PHRASES, cache_size=AREA_SCAN_CACHE_SIZE):
+        self.areas = [area['name'] for area in areas]
+        self.issues = list(issue_phrases)
+        phrases = {}
+        for name in city_names:
+            # The city's own name tags no area, and area names inside it ('Chinchwad' in 'Pimpri Chinchwad')
+            # do not count
+            phrases.setdefault(name, []).append(('city', None, len(normalize(name))))
+        for area in areas:
+            for name in [area['name'], *area.get('aliases', [])]:
+                # The longest name matched wins, so 'Chinchwad Station' is one match, not 'Chinchwad'
+                phrases.setdefault(name, []).append(('area', area['name'], len(normalize(name))))
+        for bit, key in enumerate(self.issues):
+            for phrase in issue_phrases[key]:
+                phrases.setdefault(phrase, []).append(('issue', 1 << bit))
+        self.automaton = KeywordAutomaton({phrase: tuple(values) for phrase, values in phrases.items()})
+        self._cache = {}
+        self._cache_size = cache_size
+
+    def scan(self, text):
+        """(area or None, bitmask of self.issues) named in a text"""
+        cached = self._cache.get(text)
+        if cached is not None:
+            return cached
+        issues, cities, names = 0, [], []
+        for end, values in self.automaton.find_ends(normalize(text)):
+            for value in values:
+                if value[0] == 'issue':
+                    issues |= value[1]
+                else:
+                    (cities if value[0] == 'city' else names).append((end - value[2], end, value))
+        area, longest = None, 0
+        for start, end, value in names:
+            if value[2] > longest and not any(start >= city_start and end <= city_end
+                                               for city_start, city_end, _ in cities):
+                area, longest = value[1], value[2]
+        if len(self._cache) >= self._cache_size:
+            self._cache.clear()
+        self._cache[text] = (area, issues)
+        return area, issues
+
+    def _scan_column(self, values):
+        codes, distinct = pd.factorize(pd.Series(values, dtype=object).fillna('').astype(str))
+        scanned = [self.scan(text) for text in distinct]
+        areas = np.array([area for area, _ in scanned], dtype=object)[codes]
+        issues = np.fromiter((issues for _, issues in scanned), dtype=np.int64, count=len(scanned))
+        return areas, issues[codes] if len(scanned) else np.zeros(len(codes), dtype=np.int64)
+
+    def tag(self, descriptions, locations=None):
+        """Area (None when unknown) and issue bitmask arrays for complaints
+
+        The area comes from the location field when it names one and from the description otherwise.
+        """
+        areas, issues = self._scan_column(descriptions)
+        if locations is not None:
+            located, _ = self._scan_column(locations)
+            areas = np.where(pd.isna(located), areas, located)
+        return areas, issues
+
+
+_gazetteers = {}
+
+
+def get_gazetteer(areas, city_names=()):
+    """The gazetteer for a city's areas and names, built once per process"""
+    key = (tuple((area['name'], tuple(area.get('aliases', []))) for area in areas), tuple(city_names))
+    if key not in _gazetteers:
+        _gazetteers[key] = Gazetteer(areas, city_names)
+    return _gazetteers[key]
+
+
+class AreaAggregates:
+    """Mergeable per-area, per-category sums of complaint volume, severity, resolution time and issues"""
+
+    def __init__(self, issues=tuple(ISSUE_PHRASES)):
+        self.issues = list(issues)
+        self.issue_columns = [f"{category}:{issue}" for category, issue in self.issues]
+        self.columns = ['complaints', 'severity', 'resolved', 'resolutionHours'] + self.issue_columns
+        self.totals = pd.DataFrame(columns=self.columns, dtype=float,
+                                   index=pd.MultiIndex.from_tuples([], names=['area', 'category']))
+        self.unlocated = 0
+
+    def add(self, areas, categories, severities, resolution_hours, issues):
+        """Add a batch of tagged complaints to the totals; resolution hours are NaN for open complaints"""
+        resolution_hours = np.asarray(resolution_hours, dtype=float)
+        frame = pd.DataFrame({
+            'area': areas,
+            'category': np.asarray(categories, dtype=object),
+            'complaints': 1.0,
+            'severity': np.asarray(severities, dtype=float),
+            'resolved': ~np.isnan(resolution_hours),
+            'resolutionHours': np.nan_to_num(resolution_hours),
+        })
+        issues = np.asarray(issues, dtype=np.int64)
+        for bit, column in enumerate(self.issue_columns):
+            frame[column] = (issues >> bit) & 1
+        located = frame['area'].notna() & frame['category'].notna()
+        self.unlocated += int((~located).sum())
+        batch = frame[located].groupby(['area', 'category']).sum().astype(float)
+        self.totals = batch if self.totals.empty else self.totals.add(batch, fill_value=0)
+        return self
+
+    def add_complaints(self, df, gazetteer):
+        """Tag a DataFrame of complaints with the gazetteer and add it to the totals"""
+        areas, issues = gazetteer.tag(df['description'] if 'description' in df.columns else [''] * len(df),
+                                      df['location'] if 'location' in df.columns else None)
+        if 'priority' in df.columns:
+            severities = df['priority'].map(SEVERITY_WEIGHTS).fillna(DEFAULT_SEVERITY)
+        else:
+            severities = np.full(len(df), DEFAULT_SEVERITY)
+        if 'resolution_hours' in df.columns:
+            resolution_hours = df['resolution_hours'].where(df['resolution_hours'] >= 0)
+        else:
+            resolution_hours = np.full(len(df), np.nan)
+        categories = df['category'] if 'category' in df.columns else [None] * len(df)
+        return self.add(areas, categories, severities, resolution_hours, issues)
+
+    def merge(self, other):
+        """Add another aggregate's totals to this one"""
+        if not other.totals.empty:
+            self.totals = other.totals.copy() if self.totals.empty else self.totals.add(other.totals, fill_value=0)
+        self.unlocated += other.unlocated
+        return self
+
+    def _rows(self, names, category):
+        if self.totals.empty or category not in self.totals.index.get_level_values('category'):
+            rows = pd.DataFrame(columns=self.columns, dtype=float)
+        else:
+            rows = self.totals.xs(category, level='category')
+        return rows.reindex(names, fill_value=0).astype(float)
+
+    def risks(self, areas, category, prior=AREA_RISK_PRIOR):
+        """Risk records for a city's areas, in the layout of the waterRisks/energyRisks arrays
+
+        Each score starts from the area's base risk tier and moves with the area's complaint volume and
+        issue counts relative to the city's average area, its mean complaint severity and how much slower
+        or faster than average its complaints are resolved. Every area first gets `prior` pseudo-complaints
+        of medium severity with the city's average resolution time and issues, so small samples stay near
+        the base tier. Without complaints it is the base tier.
+        """
+        names = [area['name'] for area in areas]
+        base = np.array([BASE_RISK[category][area['risk']] for area in areas], dtype=float)
+        rows = self._rows(names, category)
+        complaints = rows['complaints'].to_numpy()
+        total = complaints.sum()
+        adjustment = np.zeros(len(names))
+        if total > 0:
+            adjustment += 8 * np.clip((complaints + prior) / (complaints.mean() + prior) - 1, -1, 2)
+            severity = np.divide(rows['severity'].to_numpy() + prior * DEFAULT_SEVERITY, complaints + prior,
+                                 out=np.full(len(names), DEFAULT_SEVERITY), where=complaints + prior > 0)
+            adjustment += 20 * (severity - DEFAULT_SEVERITY)
+            resolved = rows['resolved'].to_numpy()
+            hours = rows['resolutionHours'].to_numpy()
+            if resolved.sum() > 0 and hours.sum() > 0:
+                overall = hours.sum() / resolved.sum()
+                pseudo = prior * resolved.sum() / total
+                mean_hours = np.divide(hours + pseudo * overall, resolved + pseudo, out=np.full(len(names), overall),
+                                       where=resolved + pseudo > 0)
+                adjustment += 8 * np.clip(mean_hours / overall - 1, -1, 1)
+
+        records = [{'area': name} for name in names]
+        for key, issue, offset in RISK_COLUMNS[category]:
+            counts = rows[f"{category}:{issue}"].to_numpy()
+            if counts.sum() > 0:
+                pseudo = prior * counts.sum() / total
+                issue_term = 8 * np.clip((counts + pseudo) / (counts.mean() + pseudo) - 1, -1, 2)
+            else:
+                issue_term = 0
+            scores = np.clip(np.round(base + offset + adjustment + issue_term), 5, 95)
+            for record, score in zip(records, scores.tolist()):
+                record[key] = int(score)
+        return records
+
+    def records(self):
+        """Per-area, per-category complaint figures, busiest first"""
+        records = []
+        totals = self.totals.sort_values('complaints', ascending=False)
+        for (area, category), row in totals.iterrows():
+            count = row['complaints']
+            records.append({
+                'area': area,
+                'category': category,
+                'complaints': int(count),
+                'severity': round(float(row['severity'] / count), 3) if count else None,
+                'resolved': int(row['resolved']),
+                'meanResolutionHours': round(float(row['resolutionHours'] / row['resolved']), 2) if row['resolved'] else None,
+                'issues': {issue: int(row[column]) for (issue_category, issue), column
+                           in zip(self.issues, self.issue_columns) if issue_category == category},
+            })
+        return records
+
+    def summary(self):
+        return {
+            'located': int(self.totals['complaints'].sum()) if not self.totals.empty else 0,
+            'unlocated': self.unlocated,
+            'areas': self.records()
+        }
+
+
+def area_risks(areas, category, aggregates=None):
+    """Risk records for a city's areas from complaint aggregates; the base tiers when there are none"""
+    return (aggregates or AreaAggregates()).risks(areas, category)
+
+
+def complaint_area_analytics(df, areas, city_names=()):
+    """Area figures and complaint-based risk arrays for the categories present in a DataFrame of complaints"""
+    aggregates = AreaAggregates().add_complaints(df, get_gazetteer(areas, city_names))
+    result = {'areaData': aggregates.summary()}
+    categories = set(df['category'].dropna()) if 'category' in df.columns else set()
+    for category in ('water', 'energy'):
+        if category in categories:
+            result[f"{category}Risks"] = aggregates.risks(areas, category)
+    return result
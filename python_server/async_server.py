@@ -0,0 +1,417 @@
+
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime
+
+from aiohttp import web
+
+import app as flask_app
+import priority
+from chat_model import get_chat_model, use_stub_model
+from metrics import registry, request_latency, request_size, response_size, stage_latency
+from refresh_scheduler import SOURCE_REFRESH_ENABLED
+from city_registry import UnknownCity
+from table_extraction import close_table_extractors
+from attachments import (
+    ATTACHMENT_MAX_REQUEST_BYTES, ATTACHMENT_MAX_PENDING_BYTES, ATTACHMENT_QUEUE_WAIT, ATTACHMENT_WORKERS,
+    ATTACHMENT_MAX_QUEUE, close_attachment_extractors
+)
+from concurrency import (
+    Overloaded, UpstreamLimiter, ByteBudget, REQUEST_DEADLINE_SECONDS,
+    GEMINI_MAX_CONCURRENCY, GEMINI_MAX_QUEUE,
+    SOURCE_FETCH_MAX_CONCURRENCY, SOURCE_FETCH_MAX_QUEUE, CPU_MAX_QUEUE
+)
+
+# Workers for CPU-heavy work (complaint analytics, chart rendering)
+CPU_WORKERS = int(os.environ.get('CPU_WORKERS', os.cpu_count() or 2))
+
+# Per-upstream limits: Gemini calls, source fetches and CPU-bound work
+gemini_limiter = UpstreamLimiter('gemini', GEMINI_MAX_CONCURRENCY, GEMINI_MAX_QUEUE)
+source_limiter = UpstreamLimiter('sources', SOURCE_FETCH_MAX_CONCURRENCY, SOURCE_FETCH_MAX_QUEUE)
+cpu_limiter = UpstreamLimiter('cpu', CPU_WORKERS, CPU_MAX_QUEUE)
+# Attachment request bodies held in memory at once, reserved before a body is read
+attachment_budget = ByteBudget('attachments', ATTACHMENT_MAX_PENDING_BYTES, ATTACHMENT_QUEUE_WAIT)
+
+# Blocking source downloads run in threads, CPU-bound work in processes
+io_executor = ThreadPoolExecutor(max_workers=SOURCE_FETCH_MAX_CONCURRENCY, thread_name_prefix='source-fetch')
+# Attachment batches block on the extraction workers, so they get their own threads, one per batch the
+# extractor can admit at once, and never hold up source fetches
+attachment_executor = ThreadPoolExecutor(max_workers=max(ATTACHMENT_WORKERS, 1) + ATTACHMENT_MAX_QUEUE,
+                                         thread_name_prefix='attachments')
+# Live-stats batches update one lock-guarded set of arrays, so a single thread applies them in order and
+# a burst of events never takes threads from source fetches
+events_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='complaint-events')
+cpu_executor = None
+
+
+def _render_chart(city, chart_type, data_source, params):
+    return flask_app.city_registry.get(city).generate_analytics_chart(chart_type, data_source, params)
+
+
+def _get_cpu_executor():
+    global cpu_executor
+    if cpu_executor is None:
+        cpu_executor = ProcessPoolExecutor(max_workers=CPU_WORKERS)
+    return cpu_executor
+
+
+async def run_io(func, *args):
+    """Run a blocking source fetch in the I/O pool under the source limiter"""
+    loop = asyncio.get_running_loop()
+    return await source_limiter.run(lambda: loop.run_in_executor(io_executor, func, *args))
+
+
+async def run_cpu(func, *args, stage=None):
+    """Run CPU-heavy work in the process pool so it does not block the event loop"""
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    result = await cpu_limiter.run(lambda: loop.run_in_executor(_get_cpu_executor(), func, *args))
+    # Timed from the event loop, since metrics recorded in pool processes are not exported
+    if stage:
+        stage_latency.observe(time.perf_counter() - started, stage)
+    return result
+
+
+@web.middleware
+async def request_middleware(request, handler):
+    """Apply CORS headers, request deadlines, overload responses and request metrics"""
+    started = time.perf_counter()
+    if request.method == 'OPTIONS':
+        response = web.Response(text='ok')
+    else:
+        try:
+            response = await asyncio.wait_for(handler(request), REQUEST_DEADLINE_SECONDS)
+        except Overloaded as e:
+            response = web.json_response({"error": str(e)}, status=503,
+                                         headers={'Retry-After': str(e.retry_after)})
+        except web.HTTPException as e:
+            # Router errors (404, 405) get the CORS headers and metrics as well
+            headers = {name: value for name, value in e.headers.items()
+                       if name.lower() not in ('content-type', 'content-length')}
+            response = web.json_response({"error": e.reason}, status=e.status, headers=headers)
+        except asyncio.TimeoutError:
+            print(f"Request to {request.path} exceeded {REQUEST_DEADLINE_SECONDS}s deadline")
+            response = web.json_response({"error": "Request deadline exceeded"}, status=504)
+
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Allow-Headers'] = 'authorization, content-type'
+
+    route = request.match_info.route.resource
+    endpoint = route.canonical if route is not None else 'unmatched'
+    request_latency.observe(time.perf_counter() - started, endpoint, request.method, str(response.status))
+    request_size.observe(request.content_length or 0, endpoint)
+    response_size.observe(response.content_length or 0, endpoint)
+    return response
+
+
+async def _read_json(request):
+    try:
+        return await request.json()
+    except Exception:
+        return None
+
+
+async def chatbot(request):
+    try:
+        data = await _read_json(request)
+
+        if not data:
+            return web.json_response({"error": "No data provided"}, status=400)
+
+        message = data.get('message', '')
+        chat_history = data.get('chatHistory', [])
+        conversation_id = data.get('conversationId')
+
+        if not flask_app.api_key and not use_stub_model():
+            return web.json_response({"error": "GEMINI_API_KEY not set"}, status=500)
+
+        answer = flask_app.answer_cache.get(message, chat_history)
+        if answer is None:
+            messages = flask_app.build_chat_messages(message, chat_history, conversation_id)
+            model = get_chat_model()
+
+            started = asyncio.get_running_loop().time()
+            response = await gemini_limiter.run(model.generate_content_async, messages)
+            answer = response.text
+            latency = asyncio.get_running_loop().time() - started
+            stage_latency.observe(latency, 'upstream_chat')
+            flask_app.answer_cache.put(message, answer, latency, chat_history)
+
+        return web.json_response({"response": answer})
+
+    except Overloaded:
+        raise
+    except Exception as e:
+        print(f"Error in chatbot endpoint: {str(e)}")
+        return web.json_response({"error": str(e)}, status=500)
+
+
+async def prioritize_complaints(request):
+    try:
+        data = await _read_json(request)
+        invalid = flask_app.validate_priority_request(data)
+        if invalid:
+            return web.json_response(invalid[0], status=invalid[1])
+
+        complaints = data['complaints']
+        started = time.perf_counter()
+        results = await run_cpu(priority.score_complaints, complaints, stage='priority')
+
+        # Batches of undecided complaints share the Gemini limiter with the chatbot;
+        # a batch that fails or is rejected keeps the rule fallback
+        llm_calls = llm_errors = 0
+        if data.get('useLlm', True) and (flask_app.api_key or use_stub_model()):
+            model = get_chat_model()
+            batches = list(priority.llm_batches(complaints, results))
+            llm_calls = len(batches)
+            replies = await asyncio.gather(
+                *(gemini_limiter.run(model.generate_content_async, messages) for _, messages in batches),
+                return_exceptions=True)
+            for (indices, _), reply in zip(batches, replies):
+                if isinstance(reply, Exception):
+                    llm_errors += 1
+                    print(f"Error asking the model for complaint priorities: {reply}")
+                else:
+                    priority.apply_llm_reply(results, indices, reply.text)
+
+        priority.finalize(results)
+        stats = priority.summarize(results, llm_calls, llm_errors, time.perf_counter() - started)
+        return web.json_response({'results': results, 'stats': stats})
+
+    except Overloaded:
+        raise
+    except Exception as e:
+        print(f"Error in prioritize_complaints endpoint: {str(e)}")
+        return web.json_response({"error": str(e)}, status=500)
+
+
+async def generate_analytics(request):
+    try:
+        data = await _read_json(request)
+
+        if not data:
+            return web.json_response({"error": "No data provided"}, status=400)
+
+        complaints = data.get('complaints', [])
+        user_role = data.get('userRole', 'citizen')
+        city_fetcher = flask_app.city_registry.get(data.get('city'))
+
+        # Source fetches and complaint processing run concurrently
+        water_task = run_io(city_fetcher.get_water_analytics)
+        energy_task = run_io(city_fetcher.get_energy_analytics)
+        if complaints:
+            complaint_task = run_cpu(flask_app.process_complaints, complaints, user_role, city_fetcher.areas,
+                                     data.get('incidents') is True, city_fetcher.city_names, stage='aggregate')
+            water_analytics, energy_analytics, complaint_analytics = await asyncio.gather(water_task, energy_task, complaint_task)
+        else:
+            water_analytics, energy_analytics = await asyncio.gather(water_task, energy_task)
+            complaint_analytics = {}
+
+        combined_analytics = flask_app.combine_analytics(water_analytics, energy_analytics, complaint_analytics, complaints)
+
+        return web.json_response(combined_analytics)
+
+    except Overloaded:
+        raise
+    except UnknownCity as e:
+        return web.json_response({"error": str(e)}, status=400)
+    except Exception as e:
+        print(f"Error in generate_analytics endpoint: {str(e)}")
+        return web.json_response({"error": str(e)}, status=500)
+
+
+async def generate_charts(request):
+    try:
+        data = await _read_json(request)
+
+        if not data:
+            return web.json_response({"error": "No data provided"}, status=400)
+
+        chart_type = data.get('chartType', 'bar')
+        data_source = data.get('dataSource', [])
+        params = data.get('params', {})
+
+        if not data_source or not params:
+            return web.json_response({"error": "Missing data source or parameters"}, status=400)
+
+        # Validate the city here; the worker process looks it up again by name
+        city = flask_app.city_registry.get(data.get('city')).city
+        chart_result = await run_cpu(_render_chart, city, chart_type, data_source, params, stage='chart_render')
+
+        return web.json_response(chart_result)
+
+    except Overloaded:
+        raise
+    except UnknownCity as e:
+        return web.json_response({"error": str(e)}, status=400)
+    except Exception as e:
+        print(f"Error in generate_charts endpoint: {str(e)}")
+        return web.json_response({"error": str(e)}, status=500)
+
+
+async def fetch_resource_data(request):
+    try:
+        data = await _read_json(request)
+
+        if not data:
+            return web.json_response({"error": "No data provided"}, status=400)
+
+        resource_type = data.get('resourceType', '')
+
+        if not resource_type:
+            return web.json_response({"error": "Missing resource type"}, status=400)
+        if resource_type not in flask_app.RESOURCE_TYPES:
+            return web.json_response({"error": f"Unknown resource type: {resource_type}"}, status=400)
+
+        result = await run_io(flask_app.get_resource_analytics, resource_type, data.get('city'))
+
+        return web.json_response({
+            "success": True,
+            "data": result,
+            "timestamp": datetime.now().isoformat()
+        })
+
+    except Overloaded:
+        raise
+    except UnknownCity as e:
+        return web.json_response({"error": str(e)}, status=400)
+    except Exception as e:
+        print(f"Error in fetch_resource_data endpoint: {str(e)}")
+        return web.json_response({"error": str(e)}, status=500)
+
+
+async def complaint_events(request):
+    try:
+        data = await _read_json(request)
+        invalid = flask_app.validate_events_request(data)
+        if invalid:
+            return web.json_response(invalid[0], status=invalid[1])
+
+        # The streams live in this process's shared memory, so events are added on a thread, not in the process pool
+        stream = flask_app.get_complaint_streams()[data.get('city') or flask_app.city_registry.default_city]
+        started = time.perf_counter()
+        result = await asyncio.get_running_loop().run_in_executor(events_executor, stream.add_events, data['events'])
+        stage_latency.observe(time.perf_counter() - started, 'live_stats')
+        return web.json_response(result)
+
+    except Overloaded:
+        raise
+    except Exception as e:
+        print(f"Error in complaint_events endpoint: {str(e)}")
+        return web.json_response({"error": str(e)}, status=500)
+
+
+async def extract_attachments(request):
+    try:
+        loop = asyncio.get_running_loop()
+        extractor = flask_app.get_attachment_extractor(flask_app.city_registry.cache)
+        # Reserved before the body is read, so queued requests do not hold their files
+        size = flask_app.attachment_request_bytes(request.content_length, request.content_type)
+        await attachment_budget.acquire(size)
+        release = True
+        try:
+            if request.content_type.startswith('multipart/'):
+                form = await request.post()
+                uploads = [(field.filename, field.file) for field in form.getall('files', []) if hasattr(field, 'file')]
+                data = None
+            else:
+                uploads, data = [], await _read_json(request)
+            files, invalid = flask_app.read_attachment_files(uploads, data)
+            if invalid:
+                return web.json_response(invalid[0], status=invalid[1])
+
+            # Blocks on the extraction worker pool, which bounds and queues the work itself
+            batch = loop.run_in_executor(attachment_executor, extractor.extract_batch, files)
+            try:
+                result = await asyncio.shield(batch)
+            except asyncio.CancelledError:
+                # The batch still holds its files until its thread finishes
+                release = False
+                batch.add_done_callback(lambda _: attachment_budget.release(size))
+                raise
+            return web.json_response(result)
+        finally:
+            if release:
+                attachment_budget.release(size)
+
+    except Overloaded:
+        raise
+    except Exception as e:
+        print(f"Error in extract_attachments endpoint: {str(e)}")
+        return web.json_response({"error": str(e)}, status=500)
+
+
+async def live_stats(request):
+    city = request.query.get('city') or flask_app.city_registry.default_city
+    streams = flask_app.get_complaint_streams()
+    if city not in streams:
+        return web.json_response({"error": f"Unknown city: {city}"}, status=400)
+    return web.json_response(streams[city].snapshot())
+
+
+async def upstream_stats(request):
+    return web.json_response({
+        **{limiter.name: limiter.stats() for limiter in (gemini_limiter, source_limiter, cpu_limiter)},
+        attachment_budget.name: attachment_budget.stats()
+    })
+
+
+async def data_freshness(request):
+    city = request.query.get('city')
+    if city and city not in flask_app.city_registry.cities:
+        return web.json_response({"error": f"Unknown city: {city}"}, status=400)
+    return web.json_response(flask_app.refresh_scheduler.status(city))
+
+
+async def cities(request):
+    return web.json_response(flask_app.city_registry.stats())
+
+
+async def metrics(request):
+    return web.Response(text=registry.render(), content_type='text/plain', charset='utf-8')
+
+
+async def _start_background_work(application):
+    # Fork the CPU pool while this is the only thread, so its processes cannot inherit a lock another
+    # thread holds; forked with all its workers at the first submit, they also share the warm state
+    _get_cpu_executor().submit(os.getpid).result()
+    if SOURCE_REFRESH_ENABLED:
+        flask_app.refresh_scheduler.start()
+
+
+async def _shutdown_executors(application):
+    flask_app.refresh_scheduler.stop(wait=False)
+    close_table_extractors()
+    close_attachment_extractors()
+    io_executor.shutdown(wait=False)
+    attachment_executor.shutdown(wait=False)
+    events_executor.shutdown(wait=False)
+    if cpu_executor is not None:
+        cpu_executor.shutdown(wait=False)
+
+
+def create_app():
+    """Build the aiohttp application serving the same endpoints as app.py"""
+    application = web.Application(middlewares=[request_middleware], client_max_size=ATTACHMENT_MAX_REQUEST_BYTES)
+    application.router.add_post('/chatbot', chatbot)
+    application.router.add_post('/generate_analytics', generate_analytics)
+    application.router.add_post('/prioritize_complaints', prioritize_complaints)
+    application.router.add_post('/generate_charts', generate_charts)
+    application.router.add_post('/fetch_resource_data', fetch_resource_data)
+    application.router.add_post('/complaint_events', complaint_events)
+    application.router.add_get('/live_stats', live_stats)
+    application.router.add_post('/extract_attachments', extract_attachments)
+    application.router.add_get('/upstream_stats', upstream_stats)
+    application.router.add_get('/data_freshness', data_freshness)
+    application.router.add_get('/cities', cities)
+    application.router.add_get('/metrics', metrics)
+    application.on_startup.append(_start_background_work)
+    application.on_cleanup.append(_shutdown_executors)
+    return application
+
+
+if __name__ == '__main__':
+    port = int(os.environ.get("PORT", 5000))
+    web.run_app(create_app(), host='0.0.0.0', port=port)
@@ -0,0 +1,457 @@
+"""Text extraction from complaint attachments: OCR for images, text (or OCR) for PDFs
+
+Files are extracted by a bounded pool of ATTACHMENT_WORKERS long-lived
+worker processes (worker_process.py), so OCR never runs in a web worker and
+a file that hangs or exhausts memory only costs its own worker, which is
+replaced. Images are converted to grayscale, downscaled to OCR_MAX_SIDE and
+binarized before tesseract reads them; PDF pages use their embedded text and
+fall back to OCR when a page is scanned. Results are cached by a hash of the
+file's content, so a re-uploaded file is not extracted again.
+
+Requests reserve their body size against ATTACHMENT_MAX_PENDING_BYTES
+before the body is read, and at most ATTACHMENT_WORKERS +
+ATTACHMENT_MAX_QUEUE files are admitted at once, with admitted files
+waiting for a free worker. A request or batch that does not fit waits up to
+ATTACHMENT_QUEUE_WAIT seconds for room and is then rejected with
+Overloaded, so bursts are queued while sustained overload is turned away
+instead of piling file contents up in memory. Everything runs locally.
+"""
+
+import io
+import os
+import sys
+import json
+import math
+import time
+import queue
+import hashlib
+import argparse
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection
+
+from concurrency import Overloaded
+from metrics import attachment_files, stage_latency
+from worker_process import WorkerProcess, peak_rss_kb, serve
+
+# Worker processes extracting attachments; 0 extracts in the calling thread
+ATTACHMENT_WORKERS = int(os.environ.get('ATTACHMENT_WORKERS', min(4, os.cpu_count() or 1)))
+# Admitted files waiting for a worker beyond those being extracted
+ATTACHMENT_MAX_QUEUE = int(os.environ.get('ATTACHMENT_MAX_QUEUE', 32))
+# Seconds a batch waits for room in the queue before it is rejected
+ATTACHMENT_QUEUE_WAIT = float(os.environ.get('ATTACHMENT_QUEUE_WAIT', 10))
+# Seconds one file may take before its worker is restarted
+ATTACHMENT_TIMEOUT = float(os.environ.get('ATTACHMENT_TIMEOUT', 120))
+# Files a worker extracts before it is replaced, bounding memory leaked by the OCR and PDF libraries
+ATTACHMENT_WORKER_MAX_FILES = int(os.environ.get('ATTACHMENT_WORKER_MAX_FILES', 500))
+# Largest file, files per request and PDF pages read per file
+ATTACHMENT_MAX_BYTES = int(os.environ.get('ATTACHMENT_MAX_BYTES', 20 * 1024 * 1024))
+ATTACHMENT_MAX_FILES = int(os.environ.get('ATTACHMENT_MAX_FILES', 20))
+ATTACHMENT_MAX_PAGES = int(os.environ.get('ATTACHMENT_MAX_PAGES', 30))
+# Largest request body the servers accept, so a batch of files can be uploaded in one request
+ATTACHMENT_MAX_REQUEST_BYTES = int(os.environ.get('ATTACHMENT_MAX_REQUEST_BYTES', 64 * 1024 * 1024))
+# Request bytes held in memory by attachment requests at once; a request reserves its size before its body is read
+ATTACHMENT_MAX_PENDING_BYTES = int(os.environ.get('ATTACHMENT_MAX_PENDING_BYTES', 2 * ATTACHMENT_MAX_REQUEST_BYTES))
+# Largest decoded image, in pixels; larger ones are rejected rather than decoded
+ATTACHMENT_MAX_PIXELS = int(os.environ.get('ATTACHMENT_MAX_PIXELS', 60_000_000))
+
+# Longest image side, in pixels, that images are downscaled to before OCR
+OCR_MAX_SIDE = int(os.environ.get('OCR_MAX_SIDE', 2000))
+# Tesseract languages, e.g. 'eng+mar' for Marathi complaints as well
+OCR_LANG = os.environ.get('OCR_LANG', 'eng')
+# Resolution scanned PDF pages are rendered at for OCR
+OCR_PDF_DPI = int(os.environ.get('OCR_PDF_DPI', 200))
+# PDF pages with fewer characters of embedded text than this are treated as scanned
+PDF_MIN_TEXT_CHARS = 20
+
+# Bump when extraction output changes, so cached results are not reused
+EXTRACTION_VERSION = 1
+
+IMAGE_SIGNATURES = (b'\x89PNG\r\n\x1a\n', b'\xff\xd8\xff', b'GIF87a', b'GIF89a', b'II*\x00', b'MM\x00*', b'BM')
+AUDIO_SIGNATURES = (b'ID3', b'OggS', b'fLaC')
+# ISO base media (ftyp) brands of HEIF/AVIF images, such as phone photos; other ftyp files are audio or video
+IMAGE_BRANDS = (b'heic', b'heix', b'heim', b'heis', b'hevc', b'hevx', b'mif1', b'msf1', b'avif', b'avis')
+
+
+def detect_type(data):
+    """'pdf', 'image', 'audio', 'text' or 'unknown', from a file's leading bytes"""
+    if data.startswith(b'%PDF'):
+        return 'pdf'
+    if data.startswith(IMAGE_SIGNATURES) or (data[:4] == b'RIFF' and data[8:12] == b'WEBP') or \
+            (data[4:8] == b'ftyp' and data[8:12] in IMAGE_BRANDS):
+        return 'image'
+    if data.startswith(AUDIO_SIGNATURES) or (data[:4] == b'RIFF' and data[8:12] == b'WAVE') or data[4:8] == b'ftyp':
+        return 'audio'
+    sample = data[:4096]
+    if b'\x00' in sample:
+        return 'unknown'
+    try:
+        sample.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # A character cut off at the end of the sample is still text
+        return 'text' if e.start > len(sample) - 4 else 'unknown'
+    return 'text'
+
+
+def _otsu_threshold(pixels):
+    """Gray level separating dark text from a light background, by Otsu's method"""
+    import numpy as np
+    histogram = np.bincount(pixels.ravel(), minlength=256).astype(float)
+    weights = np.cumsum(histogram)
+    means = np.cumsum(histogram * np.arange(256))
+    background = weights[-1] - weights
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = (means[-1] * weights - means * weights[-1]) ** 2 / (weights * background)
+    return int(np.nanargmax(between[:-1]))
+
+
+def preprocess_image(image, max_side=OCR_MAX_SIDE):
+    """Grayscale, downscaled and binarized copy of an image for OCR
+
+    Uses opencv's adaptive threshold, which copes with uneven lighting in photos, and a global
+    Otsu threshold when opencv is not installed.
+    """
+    import numpy as np
+    from PIL import Image, ImageOps
+
+    image = ImageOps.exif_transpose(image).convert('L')
+    if max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    pixels = np.asarray(image)
+    try:
+        import cv2
+        binary = cv2.adaptiveThreshold(cv2.medianBlur(pixels, 3), 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                       cv2.THRESH_BINARY, 31, 15)
+    except ImportError:
+        binary = np.where(pixels > _otsu_threshold(pixels), 255, 0).astype(np.uint8)
+    return Image.fromarray(binary)
+
+
+def _ocr(image):
+    try:
+        import pytesseract
+    except ImportError:
+        raise RuntimeError('OCR needs pytesseract and the tesseract binary')
+    return pytesseract.image_to_string(preprocess_image(image), lang=OCR_LANG, timeout=ATTACHMENT_TIMEOUT)
+
+
+def _clean(text):
+    lines = (' '.join(line.split()) for line in text.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def extract_image(data):
+    from PIL import Image
+    try:
+        # HEIF and AVIF photos decode only with pillow-heif installed
+        import pillow_heif
+        pillow_heif.register_heif_opener()
+    except ImportError:
+        pass
+    image = Image.open(io.BytesIO(data))
+    if image.width * image.height > ATTACHMENT_MAX_PIXELS:
+        raise ValueError(f"Image of {image.width}x{image.height} pixels is too large")
+    scale = OCR_MAX_SIDE / max(image.size)
+    if image.format == 'JPEG' and scale < 1:
+        # Let the decoder downscale by a power of two while decoding, which is much cheaper
+        image.draft('L', (math.ceil(image.width * scale), math.ceil(image.height * scale)))
+    return {'text': _clean(_ocr(image)), 'method': 'ocr', 'pages': 1}
+
+
+def extract_pdf(data):
+    import pdfplumber
+    texts = []
+    ocr_pages = 0
+    ocr_error = None
+    with pdfplumber.open(io.BytesIO(data)) as pdf:
+        page_count = len(pdf.pages)
+        for page in pdf.pages[:ATTACHMENT_MAX_PAGES]:
+            text = page.extract_text() or ''
+            if len(text.strip()) < PDF_MIN_TEXT_CHARS and ocr_error is None:
+                # A scanned page: read the rendered page instead
+                try:
+                    text = _ocr(page.to_image(resolution=OCR_PDF_DPI).original)
+                    ocr_pages += 1
+                except Exception as e:
+                    ocr_error = str(e)
+            texts.append(_clean(text))
+            # Release the page's parsed objects before the next one
+            page.close()
+    result = {'text': '\n\n'.join(text for text in texts if text), 'pages': page_count,
+              'method': 'pdf-ocr' if ocr_pages else 'pdf-text'}
+    if ocr_error and not result['text']:
+        raise RuntimeError(ocr_error)
+    return result
+
+
+def extract_file(data):
+    """Text of one attachment as {type, text, method, pages, seconds}"""
+    started = time.perf_counter()
+    file_type = detect_type(data)
+    if file_type == 'pdf':
+        result = extract_pdf(data)
+    elif file_type == 'image':
+        result = extract_image(data)
+    elif file_type == 'text':
+        result = {'text': _clean(data.decode('utf-8', errors='replace')), 'method': 'text', 'pages': 1}
+    else:
+        raise ValueError(f"Unsupported attachment type: {file_type}")
+    return {'type': file_type, **result, 'seconds': round(time.perf_counter() - started, 4)}
+
+
+def _worker_main(connection):
+    """Serve extraction requests until the connection closes"""
+    from PIL import Image
+    # Decompression bombs are refused by PIL itself, not only by the size check
+    Image.MAX_IMAGE_PIXELS = ATTACHMENT_MAX_PIXELS
+    counts = {'files': 0}
+
+    def handle(message):
+        if message[0] == 'stats':
+            return {**counts, **peak_rss_kb()}
+        counts['files'] += 1
+        return extract_file(message[1])
+
+    serve(connection, handle)
+
+
+class AttachmentWorker(WorkerProcess):
+    """One extraction process, replaced after ATTACHMENT_WORKER_MAX_FILES files"""
+
+    description = 'Attachment extraction'
+
+    def __init__(self, timeout=ATTACHMENT_TIMEOUT):
+        super().__init__(__file__, ['--worker'], timeout)
+
+    def extract(self, data):
+        if self.requests >= ATTACHMENT_WORKER_MAX_FILES:
+            self.restart()
+        return self.call(('extract', data))
+
+    def stats(self):
+        return self.call(('stats',))
+
+
+class AttachmentExtractor:
+    """Extracts batches of attachments through the worker pool, caching results by content hash"""
+
+    def __init__(self, cache=None, workers=ATTACHMENT_WORKERS, max_queue=ATTACHMENT_MAX_QUEUE,
+                 queue_wait=ATTACHMENT_QUEUE_WAIT, max_pending_bytes=ATTACHMENT_MAX_PENDING_BYTES):
+        self.cache = cache
+        self.workers = workers
+        self.capacity = max(workers, 1) + max_queue
+        self.queue_wait = queue_wait
+        self.max_pending_bytes = max_pending_bytes
+        self.pending = 0
+        self.pending_bytes = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._room = threading.Condition(self._lock)
+        self._owner = None
+        self._idle = None
+        self._dispatch = None
+        self._pool = []
+
+    def _ensure_pool(self):
+        with self._lock:
+            if self._owner == os.getpid():
+                return
+            # Started lazily, and again in a process forked after it was started
+            self._owner = os.getpid()
+            self._pool = [AttachmentWorker() for _ in range(self.workers)]
+            self._idle = queue.Queue()
+            for worker in self._pool:
+                self._idle.put(worker)
+            self._dispatch = ThreadPoolExecutor(max_workers=max(self.workers, 1), thread_name_prefix='attachments')
+
+    def _cache_path(self, digest):
+        variant = f"{OCR_LANG}-{OCR_MAX_SIDE}-{OCR_PDF_DPI}"
+        return os.path.join(self.cache.cache_dir, 'attachments', digest[:2], f"{digest}-{variant}-v{EXTRACTION_VERSION}.json")
+
+    def _cached(self, digest):
+        if self.cache is None:
+            return None
+        path = self._cache_path(digest)
+        try:
+            return json.loads(self.cache.read(path))
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            # A truncated or corrupt entry (JSON or UTF-8 errors): drop it and extract the file again
+            print(f"Discarding unreadable attachment cache entry {path}: {e}")
+            self.cache.remove(path)
+            return None
+
+    def _admit(self, count):
+        with self._room:
+            # An oversized batch still runs once nothing else is pending
+            if not self._room.wait_for(lambda: not self.pending or self.pending + count <= self.capacity,
+                                       timeout=self.queue_wait):
+                self.rejected += 1
+                raise Overloaded('attachments')
+            self.pending += count
+
+    def _release(self, count=1):
+        with self._room:
+            self.pending -= count
+            self._room.notify_all()
+
+    def reserve_bytes(self, size):
+        """Wait for room to hold a request body of size bytes, or raise Overloaded; release_bytes() it after"""
+        with self._room:
+            # An oversized request still runs once nothing else is reserved
+            if not self._room.wait_for(lambda: not self.pending_bytes or
+                                       self.pending_bytes + size <= self.max_pending_bytes,
+                                       timeout=self.queue_wait):
+                self.rejected += 1
+                raise Overloaded('attachments')
+            self.pending_bytes += size
+
+    def release_bytes(self, size):
+        with self._room:
+            self.pending_bytes -= size
+            self._room.notify_all()
+
+    @contextmanager
+    def reserved(self, size):
+        """Hold a reservation of size request bytes for the duration of the block"""
+        self.reserve_bytes(size)
+        try:
+            yield
+        finally:
+            self.release_bytes(size)
+
+    def _extract(self, data):
+        try:
+            started = time.perf_counter()
+            if not self.workers:
+                return extract_file(data), 0.0
+            worker = self._idle.get()
+            waited = time.perf_counter() - started
+            try:
+                return worker.extract(data), waited
+            finally:
+                self._idle.put(worker)
+        finally:
+            self._release()
+
+    def extract_batch(self, files):
+        """Text of each (name, bytes) file, in order, with per-file timing; failures carry an error"""
+        started = time.perf_counter()
+        results = []
+        pending = {}
+        for name, data in files:
+            digest = hashlib.sha256(data).hexdigest()
+            result = {'name': name, 'sha256': digest, 'bytes': len(data)}
+            results.append(result)
+            file_type = detect_type(data)
+            cached = self._cached(digest)
+            if file_type not in ('pdf', 'image', 'text'):
+                # Not worth a worker: audio and unknown files have no text to read
+                result.update(type=file_type, error=f"Unsupported attachment type: {file_type}", cached=False)
+                attachment_files.inc(file_type, 'error')
+            elif cached is not None:
+                result.update(cached, cached=True, seconds=0.0, waitSeconds=0.0)
+                attachment_files.inc(cached['type'], 'cached')
+            else:
+                # The same file twice in a batch is extracted once
+                pending.setdefault(digest, (data, []))[1].append(result)
+
+        if pending:
+            self._admit(len(pending))
+            futures = {}
+            try:
+                if self.workers:
+                    self._ensure_pool()
+                    for digest, (data, _) in pending.items():
+                        futures[digest] = self._dispatch.submit(self._extract, data)
+            finally:
+                if self.workers and len(futures) < len(pending):
+                    # Files that never reached the pool release their admission here
+                    self._release(len(pending) - len(futures))
+            for digest, (data, waiting) in pending.items():
+                try:
+                    if self.workers:
+                        extracted, waited = futures[digest].result()
+                    else:
+                        extracted, waited = self._extract(data)
+                    stage_latency.observe(extracted['seconds'], 'attachment')
+                    attachment_files.inc(extracted['type'], 'extracted')
+                    if self.cache is not None:
+                        self.cache.write(self._cache_path(digest), json.dumps(extracted))
+                    outcome = {**extracted, 'cached': False, 'waitSeconds': round(waited, 4)}
+                except Exception as e:
+                    attachment_files.inc(detect_type(data), 'error')
+                    outcome = {'type': detect_type(data), 'error': str(e), 'cached': False}
+                for result in waiting:
+                    result.update(outcome)
+
+        stats = {
+            'files': len(results),
+            'cached': sum(1 for result in results if result.get('cached')),
+            'extracted': sum(1 for result in results if not result.get('cached') and 'error' not in result),
+            'errors': sum(1 for result in results if 'error' in result),
+            'seconds': round(time.perf_counter() - started, 4)
+        }
+        return {'results': results, 'stats': stats}
+
+    def stats(self):
+        return {'workers': self.workers, 'pending': self.pending, 'capacity': self.capacity,
+                'pendingBytes': self.pending_bytes, 'maxPendingBytes': self.max_pending_bytes, 'rejected': self.rejected,
+                'running': sum(1 for worker in self._pool if worker._process is not None)}
+
+    def close(self):
+        with self._lock:
+            pool, dispatch = self._pool, self._dispatch
+            self._pool, self._dispatch, self._owner = [], None, None
+        if dispatch is not None:
+            dispatch.shutdown(wait=False)
+        for worker in pool:
+            worker.close()
+
+
+_extractors = {}
+_extractors_lock = threading.Lock()
+
+
+def get_attachment_extractor(cache):
+    """Extractor shared by every request using the same cache, so they share one worker pool"""
+    with _extractors_lock:
+        if cache.cache_dir not in _extractors:
+            _extractors[cache.cache_dir] = AttachmentExtractor(cache)
+        return _extractors[cache.cache_dir]
+
+
+def close_attachment_extractors():
+    """Stop every shared extractor's workers; the next batch starts new ones"""
+    with _extractors_lock:
+        extractors = list(_extractors.values())
+    for extractor in extractors:
+        extractor.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Extract text from attachments, or serve as an extraction worker')
+    parser.add_argument('files', nargs='*', help='files to extract')
+    parser.add_argument('--worker', action='store_true', help='run as a worker (started by AttachmentWorker)')
+    parser.add_argument('--fd', type=int, help='file descriptor of the connection to the parent')
+    args = parser.parse_args(argv)
+    if args.worker:
+        _worker_main(Connection(args.fd))
+        return 0
+
+    files = []
+    for path in args.files:
+        with open(path, 'rb') as f:
+            files.append((os.path.basename(path), f.read()))
+    extractor = AttachmentExtractor()
+    try:
+        print(json.dumps(extractor.extract_batch(files), indent=2))
+    finally:
+        extractor.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""Throughput, caching and back-pressure of attachment extraction
+
+    python -m benchmarks.attachments                       # 40 files per kind, 1 and 4 workers
+    python -m benchmarks.attachments --files 100 --workers 2 --workers 8
+
+Synthetic attachments are generated offline: text PDFs (the fixture PDFs
+with a varying trailer, so each has its own content hash) and photographed
+complaint notes (JPEGs of rendered text on an unevenly lit background). For
+each worker count the report gives files per second on a cold cache, on a
+warm cache and the peak memory of one worker. A burst of concurrent batches
+larger than the queue then shows how many wait their turn and how many are
+turned away after a short queue wait instead of being held in memory. OCR needs pytesseract and the
+tesseract binary; without them images are reported as errors.
+"""
+
+import io
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+
+from benchmarks.fixtures import FIXTURE_DIR, PDF_SOURCES, write_fixtures
+from benchmarks.synthetic import generate_complaints
+
+
+def _pdfs(count):
+    paths = [os.path.join(FIXTURE_DIR, f"{source_key}.pdf") for source_key in PDF_SOURCES]
+    if not all(os.path.exists(path) for path in paths):
+        write_fixtures()
+    documents = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            documents.append(f.read())
+    # Bytes after %%EOF are ignored by readers but change the content hash
+    return [(f"report-{i}.pdf", documents[i % len(documents)] + f"\n% copy {i}\n".encode()) for i in range(count)]
+
+
+def _photos(count, seed=42):
+    import numpy as np
+    from PIL import Image, ImageDraw, ImageFont
+
+    rng = np.random.default_rng(seed)
+    font = ImageFont.load_default()
+    photos = []
+    for i, complaint in enumerate(generate_complaints(count, seed=seed)):
+        # A lighting gradient and sensor noise, as in a phone photo of a handwritten or printed note
+        gradient = np.linspace(150, 235, 2400)[None, :] + np.linspace(0, 20, 1800)[:, None]
+        pixels = np.clip(gradient + rng.normal(0, 6, gradient.shape), 0, 255).astype(np.uint8)
+        image = Image.fromarray(pixels).convert('RGB')
+        draw = ImageDraw.Draw(image)
+        words = complaint['description'].split()
+        for line in range(0, len(words), 8):
+            draw.text((120, 200 + line * 12), ' '.join(words[line:line + 8]), fill=(30, 30, 40), font=font)
+        image = image.resize((image.width * 2, image.height * 2))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=85)
+        photos.append((f"photo-{i}.jpg", buffer.getvalue()))
+    return photos
+
+
+def bench_workers(files, workers):
+    from cache_manager import CacheManager
+    from attachments import AttachmentExtractor
+
+    cache_dir = tempfile.mkdtemp(prefix='pcmc-attachments-')
+    extractor = AttachmentExtractor(CacheManager(cache_dir, max_bytes=0), workers=workers, max_queue=len(files))
+    try:
+        # Start every worker and import its libraries first, on files outside the measured set
+        extractor.extract_batch([(f"warmup-{i}", data + b'\n%% warmup %d\n' % i) for i, (_, data) in
+                                 enumerate(files[:1] * workers)])
+        started = time.perf_counter()
+        cold = extractor.extract_batch(files)
+        cold_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        warm = extractor.extract_batch(files)
+        warm_seconds = time.perf_counter() - started
+        peak = max((worker.stats()['peakRssKb'] for worker in extractor._pool), default=0)
+    finally:
+        extractor.close()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    seconds = sorted(result['seconds'] for result in cold['results'] if 'seconds' in result)
+    errors = sorted({result['error'] for result in cold['results'] if 'error' in result})
+    return {
+        'workers': workers,
+        'coldFilesPerSecond': round(len(files) / cold_seconds, 1),
+        'warmFilesPerSecond': round(len(files) / warm_seconds, 1),
+        'cached': warm['stats']['cached'],
+        'medianFileSeconds': seconds[len(seconds) // 2] if seconds else None,
+        'workerPeakRssMb': round(peak / 1024, 1),
+        'errors': errors,
+    }
+
+
+def bench_burst(files, workers, max_queue, batches, batch_size, queue_wait):
+    from concurrency import Overloaded
+    from attachments import AttachmentExtractor
+
+    extractor = AttachmentExtractor(None, workers=workers, max_queue=max_queue, queue_wait=queue_wait)
+    outcomes = {'completed': 0, 'rejected': 0}
+    lock = threading.Lock()
+
+    def send(start):
+        batch = files[start:start + batch_size]
+        try:
+            extractor.extract_batch(batch)
+            outcome = 'completed'
+        except Overloaded:
+            outcome = 'rejected'
+        with lock:
+            outcomes[outcome] += 1
+
+    threads = [threading.Thread(target=send, args=((i * batch_size) % max(len(files) - batch_size, 1),))
+               for i in range(batches)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    extractor.close()
+    return {**outcomes, 'seconds': round(time.perf_counter() - started, 2), 'admitted': extractor.capacity}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=40, help='files of each kind')
+    parser.add_argument('--workers', type=int, action='append', help='worker counts to compare (default 1 and 4)')
+    args = parser.parse_args(argv)
+
+    kinds = {'pdf': _pdfs(args.files), 'photo': _photos(args.files)}
+    print(f"{'kind':<6} {'workers':>7} {'cold files/s':>13} {'warm files/s':>13} {'median s':>9} {'worker RSS':>11}")
+    for kind, files in kinds.items():
+        for workers in args.workers or (1, 4):
+            result = bench_workers(files, workers)
+            median = '-' if result['medianFileSeconds'] is None else f"{result['medianFileSeconds']:.3f}"
+            print(f"{kind:<6} {workers:>7} {result['coldFilesPerSecond']:>13} {result['warmFilesPerSecond']:>13} "
+                  f"{median:>9} {result['workerPeakRssMb']:>10}M")
+            for error in result['errors']:
+                print(f"       error: {error}")
+
+    for queue_wait in (10, 0.5):
+        burst = bench_burst(kinds['pdf'], workers=2, max_queue=8, batches=12, batch_size=4, queue_wait=queue_wait)
+        print(f"burst of 12 batches of 4 files, 2 workers, {burst['admitted']} files admitted at once, "
+              f"{queue_wait}s queue wait: {burst['completed']} completed, {burst['rejected']} rejected "
+              f"in {burst['seconds']}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
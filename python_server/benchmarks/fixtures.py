@@ -0,0 +1,159 @@
+
+"""Local copies of each data source type, and a static server for them
+
+The fixture files in benchmarks/fixtures/ are named <source_key>.<csv|pdf|html>
+so the directory can be served as PCMC_SOURCE_MIRROR. Regenerate them with
+
+    python -m benchmarks.fixtures
+"""
+
+import os
+import threading
+import functools
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+# Text for each PDF source, written so the metric patterns in data_fetcher match
+PDF_SOURCES = {
+    'green_city_action_plan': [
+        'Pimpri Chinchwad Green City Action Plan',
+        'Annual CO2 emissions from the city are estimated at 2450.5 MT per year.',
+        'The share of renewable energy in municipal consumption reached 12.5% in 2023.',
+        'Total green cover in the city is 45.2 sq km across parks and gardens.',
+        'Ward  Trees planted  Solar rooftops',
+        'Pimpri  12000  340',
+        'Chinchwad  9800  280',
+    ],
+    'water_sustainability': [
+        'Water Sustainability Assessment of Pune',
+        'Current water demand in the region is 795 MLD and is rising every year.',
+        'Average groundwater level has dropped to 18.5 meters below ground.',
+        'Areas under water stress account for 34.0% of the metropolitan region.',
+    ],
+    'pollution_index': [
+        'MPCB CEPI Report Pimpri Chinchwad March 2024',
+        'The overall CEPI score for the cluster is 62.4 for the year.',
+        'The average air quality index recorded was 118 during winter months.',
+        'The water quality index of the Pavana river stretch was 54.',
+    ],
+}
+
+ARTICLE_HTML = """<html><head><title>PCMC water analytics</title></head>
+<body><div class="article">
+<p>Pimpri Chinchwad Municipal Corporation is saving 31,000 million litres of water every year using data and analytics.</p>
+<p>Smart meters and pressure monitoring helped reduce leakage by 18.5% across the distribution network.</p>
+<p>Ward level dashboards show consumption patterns and flag abnormal usage for field teams.</p>
+</div></body></html>
+"""
+
+AREAS = ['Pimpri', 'Chinchwad', 'Bhosari', 'Wakad', 'Nigdi']
+
+
+def _csv_sources():
+    water = ['Year,Total_Demand_MLD,Domestic_Demand_MLD,Industrial_Demand_MLD']
+    for i, year in enumerate(range(2014, 2025)):
+        total = 620 + i * 17.5
+        water.append(f"{year},{total:.1f},{total * 0.72:.1f},{total * 0.28:.1f}")
+
+    electricity = ['City,Year,Month,Consumption_MWh,Population']
+    for year in range(2018, 2025):
+        for month in range(1, 13):
+            consumption = 180000 + (year - 2018) * 9000 + (month in (4, 5)) * 25000
+            electricity.append(f"Pimpri Chinchwad,{year},{month},{consumption},{1700000 + (year - 2018) * 60000}")
+            electricity.append(f"Pune,{year},{month},{consumption * 2},{3500000}")
+
+    green = ['Year,Renewable_Percentage,Green_Cover_SqKm']
+    for i, year in enumerate(range(2018, 2025)):
+        green.append(f"{year},{8 + i * 1.8:.1f},{40 + i * 0.9:.1f}")
+
+    return {
+        'water_sustainability_data': "\n".join(water) + "\n",
+        'electricity_consumption': "\n".join(electricity) + "\n",
+        'pcmc_green_city': "\n".join(green) + "\n",
+    }
+
+
+def make_pdf(lines, lines_per_page=40):
+    """Build a minimal text PDF (one Helvetica text block per page)"""
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+    objects = []
+    page_ids = []
+    font_id = 3
+    next_id = 4
+    for page_lines in pages:
+        escaped = [line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') for line in page_lines]
+        stream = "BT /F1 11 Tf 14 TL 50 780 Td " + " ".join(f"({line}) '" for line in escaped) + " ET"
+        content_id, page_id = next_id, next_id + 1
+        next_id += 2
+        objects.append((content_id, f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"))
+        objects.append((page_id, f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                                 f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >>"))
+        page_ids.append(page_id)
+
+    objects = [
+        (1, "<< /Type /Catalog /Pages 2 0 R >>"),
+        (2, f"<< /Type /Pages /Kids [{' '.join(f'{p} 0 R' for p in page_ids)}] /Count {len(page_ids)} >>"),
+        (font_id, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"),
+    ] + objects
+
+    out = "%PDF-1.4\n"
+    offsets = {}
+    for obj_id, body in objects:
+        offsets[obj_id] = len(out.encode('latin-1'))
+        out += f"{obj_id} 0 obj\n{body}\nendobj\n"
+    xref_offset = len(out.encode('latin-1'))
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    for obj_id in range(1, len(objects) + 1):
+        out += f"{offsets[obj_id]:010d} 00000 n \n"
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n"
+    return out.encode('latin-1')
+
+
+def write_fixtures(directory=FIXTURE_DIR, pdf_pages=3):
+    """Write one fixture per source into directory and return their paths"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for source_key, content in _csv_sources().items():
+        paths.append(os.path.join(directory, f"{source_key}.csv"))
+        with open(paths[-1], 'w') as f:
+            f.write(content)
+
+    for source_key, lines in PDF_SOURCES.items():
+        # Repeat the body so extraction works over several pages
+        body = []
+        for page in range(pdf_pages):
+            body.extend(lines + [f"Page {page + 1} notes for {area}: supply and demand tracked monthly." for area in AREAS])
+        paths.append(os.path.join(directory, f"{source_key}.pdf"))
+        with open(paths[-1], 'wb') as f:
+            f.write(make_pdf(body, lines_per_page=len(lines) + len(AREAS)))
+
+    paths.append(os.path.join(directory, 'water_conservation.html'))
+    with open(paths[-1], 'w') as f:
+        f.write(ARTICLE_HTML)
+    return paths
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve_fixtures(directory=FIXTURE_DIR, host='127.0.0.1', port=0):
+    """Serve a fixture directory over HTTP and yield its base URL"""
+    handler = functools.partial(_QuietHandler, directory=directory)
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://{host}:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    for path in write_fixtures():
+        print(f"Wrote {path}")
@@ -0,0 +1,75 @@
+"""Linear time and bounded memory of near-duplicate incident clustering
+
+    python -m benchmarks.incidents                         # stream 1,000,000 complaints
+    python -m benchmarks.incidents --count 200000 --corpus 50000
+
+A synthetic corpus (benchmarks.synthetic) is replayed back to back, each
+replay shifted later in time, and fed to one IncidentClusterer in batches.
+After every batch the report shows the throughput of that batch, the open
+incidents and the memory the clusterer holds, which should stay flat while
+the number of complaints grows. Tracing memory slows clustering several
+times; pass --no-trace for the raw throughput.
+"""
+
+import sys
+import time
+import argparse
+import tracemalloc
+
+from benchmarks.synthetic import generate_complaints
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=1000000, help='complaints to stream')
+    parser.add_argument('--corpus', type=int, default=100000, help='distinct synthetic complaints replayed')
+    parser.add_argument('--batch', type=int, default=100000, help='complaints per report line')
+    parser.add_argument('--no-trace', action='store_true', help='do not trace memory')
+    args = parser.parse_args(argv)
+
+    from incidents import IncidentClusterer, _timestamp
+
+    complaints = generate_complaints(args.corpus)
+    texts = [complaint['description'] for complaint in complaints]
+    timestamps = [_timestamp(complaint['date']) for complaint in complaints]
+    categories = [complaint['category'] for complaint in complaints]
+    locations = [complaint['location'] for complaint in complaints]
+    period = timestamps[-1] - timestamps[0] + 1
+
+    if not args.no_trace:
+        tracemalloc.start()
+    clusterer = IncidentClusterer()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    print(f"{'complaints':>10} {'batch/s':>10} {'incidents':>10} {'open':>8} {'memory MB':>10}")
+    streamed = 0
+    while streamed < args.count:
+        batch_started = time.perf_counter()
+        size = min(args.batch, args.count - streamed)
+        batch_done = 0
+        while batch_done < size:
+            replay, offset = divmod(streamed + batch_done, args.corpus)
+            take = min(size - batch_done, args.corpus - offset)
+            shift = replay * period
+            clusterer.add_batch(texts[offset:offset + take], [t + shift for t in timestamps[offset:offset + take]],
+                                categories[offset:offset + take], locations[offset:offset + take])
+            batch_done += take
+        streamed += size
+        seconds = time.perf_counter() - batch_started
+        memory = (tracemalloc.get_traced_memory()[0] - baseline) / 1024 / 1024
+        print(f"{streamed:>10} {size / seconds:>10,.0f} {clusterer.incidents:>10} "
+              f"{len(clusterer._active):>8} {memory:>10.1f}")
+
+    total = time.perf_counter() - started
+    peak = (tracemalloc.get_traced_memory()[1] - baseline) / 1024 / 1024
+    if not args.no_trace:
+        tracemalloc.stop()
+    summary = clusterer.summary()
+    print(f"{streamed} complaints in {total:.1f}s ({streamed / total:,.0f}/s), peak {peak:.1f} MB; "
+          f"{summary['incidents']} incidents, {summary['duplicateComplaints']} duplicates, "
+          f"largest {summary['largestIncidents'][0]['size'] if summary['largestIncidents'] else 0}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Ingest rate, query latency and memory of the live complaint stream
+
+    python -m benchmarks.live_stats                        # stream 1,000,000 events
+    python -m benchmarks.live_stats --count 200000 --batch 1000
+
+A synthetic corpus (benchmarks.synthetic) is replayed as complaint events,
+creations and resolutions in time order, shifted later on every replay so
+the windows keep sliding. After every report interval the report shows the
+rate of add_events, the latency of a full snapshot and the stream's memory,
+which stays fixed however many events have arrived. At the end the streamed
+resolution-time quantiles are compared with exact ones over the same events.
+"""
+
+import sys
+import time
+import argparse
+import statistics
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate_complaints
+
+
+def _events(complaints):
+    """Creation and resolution events in time order as (epoch seconds, resolution hours or None, event)"""
+    events = []
+    for complaint in complaints:
+        created_at = pd.Timestamp(complaint['date'])
+        created = {key: complaint[key] for key in ('category', 'location', 'description')}
+        events.append((created_at.timestamp(), None, {**created, 'date': created_at}))
+        if 'resolved_date' in complaint:
+            resolved_at = pd.Timestamp(complaint['resolved_date'])
+            events.append((resolved_at.timestamp(), (resolved_at - created_at).total_seconds() / 3600,
+                           {**created, 'type': 'resolved', 'date': created_at, 'resolved_date': resolved_at}))
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def _shifted(event, shift):
+    return {key: (value + shift).isoformat() if isinstance(value, pd.Timestamp) else value
+            for key, value in event.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=1000000, help='events to stream')
+    parser.add_argument('--corpus', type=int, default=50000, help='synthetic complaints replayed')
+    parser.add_argument('--days', type=int, default=7, help='days the corpus spans')
+    parser.add_argument('--batch', type=int, default=5000, help='events per add_events call')
+    parser.add_argument('--report', type=int, default=100000, help='events per report line')
+    args = parser.parse_args(argv)
+
+    from live_stats import QUANTILES, ComplaintStream
+    from data_fetcher import DEFAULT_CITY, city_names, load_city_config
+
+    city_config = load_city_config()[DEFAULT_CITY]
+    stream = ComplaintStream(city_config['areas'], city_names(city_config))
+    complaints = generate_complaints(args.corpus, days=args.days)
+    events = _events(complaints)
+    period = events[-1][0] - events[0][0] + 1
+
+    print(f"{'events':>10} {'events/s':>10} {'query ms':>9} {'memory MB':>10}")
+    streamed = 0
+    ingest_seconds = 0
+    resolution_hours = {'water': [], 'energy': []}
+    while streamed < args.count:
+        target = min(streamed + args.report, args.count)
+        size = target - streamed
+        seconds = 0
+        while streamed < target:
+            replay, offset = divmod(streamed, len(events))
+            take = min(args.batch, target - streamed, len(events) - offset)
+            shift = pd.Timedelta(seconds=replay * period)
+            batch = [_shifted(event, shift) for _, _, event in events[offset:offset + take]]
+            for _, hours, event in events[offset:offset + take]:
+                if hours is not None and event['category'] in resolution_hours:
+                    resolution_hours[event['category']].append(hours)
+            clock = events[offset + take - 1][0] + replay * period
+            batch_started = time.perf_counter()
+            stream.add_events(batch, now=clock)
+            seconds += time.perf_counter() - batch_started
+            streamed += take
+        ingest_seconds += seconds
+        queries = []
+        for _ in range(20):
+            query_started = time.perf_counter()
+            stream.snapshot(now=clock)
+            queries.append(time.perf_counter() - query_started)
+        print(f"{streamed:>10} {size / seconds:>10,.0f} {statistics.median(queries) * 1000:>9.2f} "
+              f"{stream.memory_bytes / 1024 / 1024:>10.2f}")
+
+    print(f"{streamed} events added in {ingest_seconds:.1f}s ({streamed / ingest_seconds:,.0f}/s)")
+
+    snapshot = stream.snapshot(now=clock)
+    for category, hours in resolution_hours.items():
+        exact = np.percentile(hours, [q * 100 for q in QUANTILES.values()])
+        streamed_values = snapshot['resolutionHours']['all']['byCategory'].get(category, {})
+        print(f"{category} resolution hours: " + ', '.join(
+            f"{name} {streamed_values.get(name, float('nan')):.2f} (exact {value:.2f})"
+            for name, value in zip(QUANTILES, exact)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
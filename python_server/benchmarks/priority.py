@@ -0,0 +1,61 @@
+"""Throughput and decision mix of batch complaint prioritization on a synthetic corpus
+
+    python -m benchmarks.priority                          # 100,000 complaints
+    python -m benchmarks.priority --count 20000 --llm-latency 1.5
+
+Complaints come from benchmarks.synthetic, whose templates carry the priority
+of the sample complaint they were drawn from. The report gives complaints
+per second for the rule pass, how many complaints the rules decided and how
+often they agree with the template priority, and how many model calls the
+ambiguous complaints need in batches compared with one call each. With
+--llm-latency the batched calls are made against the local stub model to
+show end-to-end time.
+"""
+
+import sys
+import math
+import time
+import argparse
+from collections import Counter
+
+from benchmarks.synthetic import generate_complaints
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000, help='complaints in the corpus')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--llm-latency', type=float, help='also run the batched model calls against a stub with this latency')
+    args = parser.parse_args(argv)
+
+    from priority import PRIORITY_LLM_BATCH_SIZE, PRIORITY_LLM_CONCURRENCY, prioritize_complaints, score_complaints
+
+    complaints = generate_complaints(args.count, seed=args.seed)
+    started = time.perf_counter()
+    results = score_complaints(complaints)
+    seconds = time.perf_counter() - started
+
+    decided = [(complaint, result) for complaint, result in zip(complaints, results) if result['priority']]
+    agree = sum(complaint['priority'] == result['priority'] for complaint, result in decided)
+    ambiguous = len(results) - len(decided)
+    reasons = Counter(result['reason'] for result in results)
+
+    print(f"{args.count} complaints scored in {seconds:.3f}s ({args.count / seconds:,.0f} complaints/s)")
+    print(f"decided by rules: {len(decided)} ({len(decided) / args.count:.1%}), "
+          f"agreeing with the template priority: {agree / max(len(decided), 1):.1%}")
+    print("reasons: " + ', '.join(f"{reason} {count}" for reason, count in reasons.most_common()))
+    print(f"ambiguous: {ambiguous} ({ambiguous / args.count:.1%}) -> "
+          f"{math.ceil(ambiguous / PRIORITY_LLM_BATCH_SIZE)} model calls of {PRIORITY_LLM_BATCH_SIZE} "
+          f"instead of {ambiguous} (and {args.count} with a model call per complaint)")
+
+    if args.llm_latency is not None:
+        from chat_model import StubChatModel
+        model = StubChatModel(latency=args.llm_latency)
+        result = prioritize_complaints(complaints, model)
+        print(f"with a {args.llm_latency}s model and {PRIORITY_LLM_CONCURRENCY} calls in flight: "
+              f"{result['stats']['seconds']:.2f}s for {model.calls} calls")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
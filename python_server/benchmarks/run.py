@@ -0,0 +1,259 @@
+
+"""Benchmark suite for python_server
+
+    python -m benchmarks.run                               # run everything, write benchmarks/results/<timestamp>.json
+    python -m benchmarks.run --filter process_complaints   # run matching scenarios only
+    python -m benchmarks.run compare base.json new.json    # flag regressions between two runs
+
+Run from the python_server directory. Sources are served from the local
+fixtures in benchmarks/fixtures/, so no network access is needed.
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+
+from benchmarks.fixtures import FIXTURE_DIR, serve_fixtures, write_fixtures
+from benchmarks.synthetic import generate_complaints
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+COMPLAINT_SCALES = (100, 1000, 10000, 100000)
+CHART_TYPES = ('bar', 'line', 'pie', 'scatter')
+# A scenario is a regression when its median slows down by more than this fraction
+DEFAULT_THRESHOLD = 0.10
+
+SCENARIOS = []
+
+
+def scenario(name, repeat=5, setup=None):
+    """Register a benchmark; setup() runs before every repetition and is not timed"""
+    def register(func):
+        SCENARIOS.append({'name': name, 'func': func, 'repeat': repeat, 'setup': setup})
+        return func
+    return register
+
+
+def measure(func, repeat, setup=None):
+    timings = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        gc.collect()
+        started = time.perf_counter()
+        func(state) if setup else func()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        'repeat': repeat,
+        'min': timings[0],
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'p95': timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))],
+        'max': timings[-1]
+    }
+
+
+class BenchContext:
+    """Shared state: a fixture mirror, a scratch cache directory and synthetic data"""
+
+    def __init__(self, mirror):
+        self.mirror = mirror
+        self.cache_root = tempfile.mkdtemp(prefix='pcmc-bench-')
+        self._complaints = {}
+
+    def fresh_fetcher(self):
+        from data_fetcher import PCMCDataFetcher
+        cache_dir = tempfile.mkdtemp(dir=self.cache_root)
+        return PCMCDataFetcher(cache_dir=cache_dir, source_mirror=self.mirror)
+
+    def warm_fetcher(self):
+        if not hasattr(self, '_warm'):
+            self._warm = self.fresh_fetcher()
+            self._warm.warm()
+        return self._warm
+
+    def complaints(self, count):
+        if count not in self._complaints:
+            self._complaints[count] = generate_complaints(count)
+        return self._complaints[count]
+
+    def close(self):
+        shutil.rmtree(self.cache_root, ignore_errors=True)
+
+
+def build_scenarios(ctx):
+    """Register every scenario against a context"""
+    SCENARIOS.clear()
+
+    source_types = {'csv': 'water_sustainability_data', 'pdf': 'green_city_action_plan', 'article': 'water_conservation'}
+    for source_type, source_key in source_types.items():
+        scenario(f"fetch_data.cold.{source_type}", repeat=3, setup=ctx.fresh_fetcher)(
+            lambda fetcher, key=source_key: fetcher.fetch_data(key))
+
+        def disk_setup(key=source_key):
+            # Cache file on disk, nothing parsed in memory yet
+            fetcher = ctx.fresh_fetcher()
+            fetcher.fetch_data(key)
+            fetcher._loaded.clear()
+            return fetcher
+        scenario(f"fetch_data.disk.{source_type}", setup=disk_setup)(
+            lambda fetcher, key=source_key: fetcher.fetch_data(key))
+
+        scenario(f"fetch_data.warm.{source_type}", repeat=50, setup=ctx.warm_fetcher)(
+            lambda fetcher, key=source_key: fetcher.fetch_data(key))
+
+    scenario('get_water_analytics', repeat=20, setup=ctx.warm_fetcher)(lambda fetcher: fetcher.get_water_analytics())
+    scenario('get_energy_analytics', repeat=20, setup=ctx.warm_fetcher)(lambda fetcher: fetcher.get_energy_analytics())
+
+    from app import process_complaints
+    from data_fetcher import DEFAULT_CITY, city_names, load_city_config
+    city_config = load_city_config()[DEFAULT_CITY]
+    areas, names = city_config['areas'], city_names(city_config)
+    for count in COMPLAINT_SCALES:
+        repeat = 5 if count <= 10000 else 3
+        scenario(f"process_complaints.{count}", repeat=repeat, setup=lambda count=count: ctx.complaints(count))(
+            lambda complaints: process_complaints(complaints, 'admin', areas, city_names=names))
+
+    import pandas as pd
+    from areas import complaint_area_analytics
+    for count in COMPLAINT_SCALES:
+        scenario(f"area_analytics.{count}", repeat=5 if count <= 10000 else 3,
+                 setup=lambda count=count: pd.DataFrame(ctx.complaints(count)))(
+            lambda df: complaint_area_analytics(df, areas, names))
+
+    from incidents import cluster_complaints
+
+    def cluster(complaints):
+        cluster_complaints([c['description'] for c in complaints], [c['date'] for c in complaints],
+                           [c['category'] for c in complaints], [c['location'] for c in complaints])
+    for count in COMPLAINT_SCALES:
+        scenario(f"cluster_complaints.{count}", repeat=5 if count <= 10000 else 3,
+                 setup=lambda count=count: ctx.complaints(count))(cluster)
+
+    from priority import score_complaints
+    for count in COMPLAINT_SCALES:
+        scenario(f"score_complaints.{count}", repeat=5 if count <= 10000 else 3,
+                 setup=lambda count=count: ctx.complaints(count))(score_complaints)
+
+    chart_params = {
+        'bar': ({'x': 'year', 'y': 'total'}, 'waterConsumption'),
+        'line': ({'x': 'year', 'y': 'total'}, 'waterConsumption'),
+        'pie': ({'value': 'value', 'label': 'name'}, 'waterSources'),
+        'scatter': ({'x': 'domestic', 'y': 'industrial'}, 'waterConsumption'),
+    }
+    for chart_type in CHART_TYPES:
+        params, key = chart_params[chart_type]
+
+        def render(data_source, chart_type=chart_type, params=params):
+            result = ctx.warm_fetcher().generate_analytics_chart(chart_type, data_source, params)
+            if not result.get('success'):
+                raise RuntimeError(result.get('error'))
+        scenario(f"generate_analytics_chart.{chart_type}", repeat=5,
+                 setup=lambda key=key: ctx.warm_fetcher().get_water_analytics()[key])(render)
+
+    return SCENARIOS
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(args):
+    if not os.path.exists(os.path.join(FIXTURE_DIR, 'water_conservation.html')):
+        write_fixtures()
+
+    results = {}
+    with serve_fixtures() as mirror:
+        ctx = BenchContext(mirror)
+        try:
+            for entry in build_scenarios(ctx):
+                if args.filter and not any(f in entry['name'] for f in args.filter):
+                    continue
+                result = measure(entry['func'], entry['repeat'], entry['setup'])
+                results[entry['name']] = result
+                print(f"{entry['name']:<40} median {result['median'] * 1000:>10.2f} ms   "
+                      f"min {result['min'] * 1000:>10.2f} ms", file=sys.stderr)
+        finally:
+            ctx.close()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpuCount': os.cpu_count()
+        },
+        'results': results
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}", file=sys.stderr)
+    return 0
+
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)['results']
+    with open(args.new) as f:
+        new = json.load(f)['results']
+
+    regressions = 0
+    print(f"{'scenario':<40} {'base ms':>10} {'new ms':>10} {'change':>8}")
+    for name in sorted(set(base) | set(new)):
+        if name not in base or name not in new:
+            print(f"{name:<40} {'only in ' + ('new' if name in new else 'base'):>30}")
+            continue
+        old_median, new_median = base[name]['median'], new[name]['median']
+        change = (new_median - old_median) / old_median if old_median else 0.0
+        flag = ''
+        if change > args.threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        elif change < -args.threshold:
+            flag = '  improved'
+        print(f"{name:<40} {old_median * 1000:>10.2f} {new_median * 1000:>10.2f} {change:>+7.1%}{flag}")
+
+    if regressions:
+        print(f"{regressions} regression(s) above {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command')
+
+    run_parser = subparsers.add_parser('run', help='run the benchmarks (default)')
+    compare_parser = subparsers.add_parser('compare', help='compare two result files')
+    for p in (parser, run_parser):
+        p.add_argument('--filter', action='append', help='only run scenarios containing this text')
+        p.add_argument('--output', help='result file (default benchmarks/results/<timestamp>.json)')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                                help='relative slowdown of the median that counts as a regression')
+
+    args = parser.parse_args(argv)
+    if args.command == 'compare':
+        return compare(args)
+    return run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+
+"""Synthetic complaint generator modeled on sample_complaints/"""
+
+import os
+import re
+import random
+from datetime import datetime, timedelta
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'sample_complaints')
+
+# Localities named in the sample complaints, used when a template has no location
+LOCALITIES = [
+    'Pimpri', 'Chinchwad', 'Chinchwad East', 'Bhosari', 'Wakad', 'Nigdi', 'Akurdi', 'Ravet',
+    'Pimple Saudagar', 'Pimple Nilakh', 'Sangvi', 'Thergaon', 'Kalewadi', 'Dighi', 'Moshi',
+    'Chikhli', 'Tathawade', 'Punawale', 'Sant Tukaram Nagar', 'Nigdi Sector 25', 'Morwadi'
+]
+
+# Phrases citizens add when re-reporting the same incident
+DUPLICATE_SUFFIXES = [
+    '', ' Please help.', ' Still not resolved.', ' Since morning.', ' Kindly look into this.',
+    ' Same issue as reported by neighbours.', ' Please send someone.'
+]
+
+# Share of complaints resolved within each delay range (hours)
+RESOLUTION_HOURS = [(0.5, 6, 0.25), (6, 12, 0.2), (12, 24, 0.2), (24, 48, 0.2), (48, 240, 0.15)]
+
+
+def load_templates(sample_dir=SAMPLE_DIR):
+    """Parse sample complaint files into (category, priority, text, location) templates"""
+    templates = []
+    for filename in sorted(os.listdir(sample_dir)):
+        if not filename.endswith('.txt'):
+            continue
+        category = 'water' if filename.startswith('water') else 'energy'
+        with open(os.path.join(sample_dir, filename), encoding='utf-8') as f:
+            content = f.read()
+
+        # Quoted complaints grouped under "## <Priority> Priority ..." headings
+        priority = 'medium'
+        for line in content.splitlines():
+            heading = re.match(r'##\s+(High|Medium|Low)\s+Priority', line)
+            if heading:
+                priority = heading.group(1).lower()
+            quoted = re.match(r'\d+\.\s+"(.+)"\s*$', line.strip())
+            if quoted:
+                templates.append((category, priority, quoted.group(1), None))
+
+        # Structured complaints with Priority/Description/Location fields
+        for block in re.finditer(r'Priority:\s*(\w+)\s+Description:\s*(.+?)\s+Location:\s*(.+)', content):
+            templates.append((category, block.group(1).lower(), block.group(2).strip(), block.group(3).strip()))
+
+    return templates
+
+
+def _resolution_delay(rng):
+    roll = rng.random()
+    for low, high, share in RESOLUTION_HOURS:
+        if roll < share:
+            return timedelta(hours=rng.uniform(low, high))
+        roll -= share
+    return timedelta(hours=rng.uniform(48, 240))
+
+
+def generate_complaints(count, seed=42, start=None, days=365, duplicate_rate=0.3, resolved_rate=0.8):
+    """Generate complaint dicts shaped like the /generate_analytics payload
+
+    duplicate_rate is the share of complaints that re-report a recent incident
+    with small wording changes, as happens during outages.
+    """
+    rng = random.Random(seed)
+    templates = load_templates()
+    start = start or datetime(2024, 1, 1)
+    span_seconds = days * 24 * 3600
+    recent = []
+    complaints = []
+
+    # Sorted arrival times so complaints stream in chronological order
+    offsets = sorted(rng.random() * span_seconds for _ in range(count))
+    for i, offset in enumerate(offsets):
+        created = start + timedelta(seconds=offset)
+
+        if recent and rng.random() < duplicate_rate:
+            category, priority, text, location = rng.choice(recent)
+            text = text + rng.choice(DUPLICATE_SUFFIXES)
+            if rng.random() < 0.3:
+                text = text.lower()
+        else:
+            category, priority, text, location = rng.choice(templates)
+            location = location or rng.choice(LOCALITIES)
+            recent.append((category, priority, text, location))
+            if len(recent) > 50:
+                recent.pop(0)
+
+        complaint = {
+            'id': f"C{i:07d}",
+            'category': category,
+            'priority': priority,
+            'description': text,
+            'location': location,
+            'date': created.isoformat(),
+            'status': 'pending'
+        }
+        if rng.random() < resolved_rate:
+            complaint['resolved_date'] = (created + _resolution_delay(rng)).isoformat()
+            complaint['status'] = 'resolved'
+        complaints.append(complaint)
+
+    return complaints
@@ -0,0 +1,168 @@
+"""Compare the table extraction backends on source PDFs
+
+    python -m benchmarks.tables                                  # both backends on the fixture PDFs
+    python -m benchmarks.tables --pdf Green-City-Action-Plan.pdf --pdf CEPI.pdf --repeat 5
+    python -m benchmarks.tables --backend pdfplumber --output tables.json
+
+For each backend this reports pages per second on the first pass (which
+includes starting the worker and, for tabula, the JVM), on later passes
+through the same warm worker and with every page served from the page
+cache, together with the worker's peak resident memory. For tabula the
+previous approach, one `tabula.read_pdf(pages='all')` call per document
+with its own JVM, is measured as a baseline.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+from benchmarks.fixtures import FIXTURE_DIR, PDF_SOURCES, write_fixtures
+
+
+def _load_documents(paths):
+    import PyPDF2
+    documents = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            content = f.read()
+        pages = len(PyPDF2.PdfReader(io.BytesIO(content)).pages)
+        documents.append({'name': os.path.basename(path), 'content': content, 'pages': pages})
+    return documents
+
+
+def _extract_all(extractor, documents):
+    started = time.perf_counter()
+    tables = sum(len(extractor.extract(document['content'])) for document in documents)
+    return time.perf_counter() - started, tables
+
+
+def bench_backend(backend, documents, repeat):
+    from cache_manager import CacheManager
+    from table_extraction import TableExtractor, resolve_backend
+
+    if resolve_backend(backend) != backend:
+        raise RuntimeError('no Java runtime found')
+    pages = sum(document['pages'] for document in documents)
+    extractor = TableExtractor(backend, cache=None, use_worker=True)
+    cache_dir = tempfile.mkdtemp(prefix='pcmc-tables-')
+    cached_extractor = TableExtractor(backend, cache=CacheManager(cache_dir, max_bytes=0), use_worker=True)
+    try:
+        cold_seconds, tables = _extract_all(extractor, documents)
+        warm = [_extract_all(extractor, documents)[0] for _ in range(repeat)]
+        stats = extractor.stats()
+
+        _extract_all(cached_extractor, documents)
+        cached = [_extract_all(cached_extractor, documents)[0] for _ in range(repeat)]
+    finally:
+        extractor.close()
+        cached_extractor.close()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    warm_seconds = statistics.median(warm)
+    cached_seconds = statistics.median(cached)
+    return {
+        'backend': backend,
+        'pages': pages,
+        'tables': tables,
+        'coldSeconds': round(cold_seconds, 4),
+        'coldPagesPerSecond': round(pages / cold_seconds, 1),
+        'warmSeconds': round(warm_seconds, 4),
+        'warmPagesPerSecond': round(pages / warm_seconds, 1),
+        'cachedPagesPerSecond': round(pages / cached_seconds, 1),
+        'peakRssMb': round(stats['peakRssKb'] / 1024, 1),
+        'childPeakRssMb': round(stats['childPeakRssKb'] / 1024, 1),
+    }
+
+
+def bench_tabula_per_call(documents, repeat):
+    """The previous approach: every document read with its own tabula-java subprocess"""
+    import resource
+    import tabula
+
+    pages = sum(document['pages'] for document in documents)
+    timings = []
+    directory = tempfile.mkdtemp(prefix='pcmc-tables-')
+    try:
+        paths = []
+        for document in documents:
+            paths.append(os.path.join(directory, document['name']))
+            with open(paths[-1], 'wb') as f:
+                f.write(document['content'])
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for path in paths:
+                tabula.read_pdf(path, pages='all', multiple_tables=True, silent=True, force_subprocess=True)
+            timings.append(time.perf_counter() - started)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    seconds = statistics.median(timings)
+    return {
+        'backend': 'tabula (JVM per call)',
+        'pages': pages,
+        'warmSeconds': round(seconds, 4),
+        'warmPagesPerSecond': round(pages / seconds, 1),
+        'childPeakRssMb': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+def _print_results(results):
+    print(f"{'backend':<24} {'pages':>6} {'cold p/s':>9} {'warm p/s':>9} {'cached p/s':>11} {'peak RSS':>9} {'child RSS':>10}")
+    for result in results:
+        if 'error' in result:
+            print(f"{result['backend']:<24} unavailable: {result['error']}")
+            continue
+
+        def cell(key, width, unit=''):
+            value = result.get(key)
+            return f"{'-' if value is None else f'{value}{unit}':>{width}}"
+
+        print(f"{result['backend']:<24} {result['pages']:>6} {cell('coldPagesPerSecond', 9)} "
+              f"{cell('warmPagesPerSecond', 9)} {cell('cachedPagesPerSecond', 11)} "
+              f"{cell('peakRssMb', 9, 'M')} {cell('childPeakRssMb', 10, 'M')}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pdf', action='append', help='PDF to extract (repeatable, default the fixture PDFs)')
+    parser.add_argument('--backend', action='append', choices=('pdfplumber', 'tabula'),
+                        help='backend to measure (repeatable, default both)')
+    parser.add_argument('--repeat', type=int, default=3, help='warm and cached passes per backend')
+    parser.add_argument('--output', help='also write the results as JSON')
+    args = parser.parse_args(argv)
+
+    paths = args.pdf
+    if not paths:
+        paths = [os.path.join(FIXTURE_DIR, f"{source_key}.pdf") for source_key in PDF_SOURCES]
+        if not all(os.path.exists(path) for path in paths):
+            write_fixtures()
+    documents = _load_documents(paths)
+    print(f"{len(documents)} documents, {sum(document['pages'] for document in documents)} pages")
+
+    results = []
+    for backend in args.backend or ('pdfplumber', 'tabula'):
+        try:
+            results.append(bench_backend(backend, documents, args.repeat))
+        except Exception as e:
+            results.append({'backend': backend, 'error': str(e).splitlines()[0] if str(e) else type(e).__name__})
+        if backend == 'tabula':
+            try:
+                results.append(bench_tabula_per_call(documents, args.repeat))
+            except Exception as e:
+                results.append({'backend': 'tabula (JVM per call)', 'error': str(e).splitlines()[0] if str(e) else type(e).__name__})
+
+    _print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'documents': [document['name'] for document in documents], 'results': results}, f, indent=2)
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,346 @@
+"""Size-bounded cache of downloaded and processed files
+
+    python cache_manager.py list                     # entries by last access, with sizes
+    python cache_manager.py prune                    # evict down to PCMC_CACHE_MAX_BYTES
+    python cache_manager.py prune --max-bytes 50M    # evict down to another budget
+    python cache_manager.py clear [--include-pinned] # remove unpinned (or all) entries
+"""
+
+import os
+import sys
+import gzip
+import time
+import argparse
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process coordination only
+    fcntl = None
+
+# Total bytes kept on disk before least recently used entries are evicted (0 disables the limit)
+CACHE_MAX_BYTES = int(os.environ.get('PCMC_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+# Store entries gzip-compressed (as <name>.gz)
+CACHE_COMPRESS = os.environ.get('PCMC_CACHE_COMPRESS', '0') == '1'
+# Entries smaller than this are stored uncompressed
+COMPRESS_MIN_BYTES = 1024
+# Reads update an entry's access time at most this often, to keep the syscalls off hot paths
+TOUCH_INTERVAL_SECONDS = 60
+# Entries whose last touch is remembered for that throttling; the least recently touched are forgotten first
+TOUCH_MEMO_SIZE = 10000
+# Between walks of the cache directory the size is kept from this process's own writes and removals;
+# a walk at most this often picks up entries other worker processes wrote
+RESYNC_INTERVAL_SECONDS = 60
+
+COMPRESSED_SUFFIX = '.gz'
+# Lock and temp files live next to entries but are not entries themselves
+IGNORED_SUFFIXES = ('.lock', '.tmp')
+
+
+def write_atomic(path, content):
+    """Write bytes or text to path via a temp file and rename, so readers never see a partial file"""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb' if isinstance(content, bytes) else 'w') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive advisory lock on path, shared by every worker process on the host"""
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def parse_size(text):
+    """Parse a byte count such as 500000, 64K, 50M or 2G"""
+    text = str(text).strip().upper().rstrip('B')
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+class CacheManager:
+    """Tracks size and last access of the files in a cache directory and evicts them LRU
+
+    Entries are addressed by their uncompressed path; a compressed entry is
+    stored next to it as <path>.gz. Last access is kept in the file's atime
+    (set explicitly, so noatime mounts work) and the mtime stays the time the
+    entry was written, which callers use for freshness. Pinned entries are
+    never evicted. The total size is kept as entries are written and removed,
+    so the directory is only walked and sorted when the cache is over budget.
+    """
+
+    def __init__(self, cache_dir, max_bytes=CACHE_MAX_BYTES, compress=CACHE_COMPRESS, pinned=()):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.pinned = set(pinned)
+        self.evictions = 0
+        self._touched = OrderedDict()
+        # Entry count and sizes as of the last walk plus this process's changes since, None before a walk
+        self._totals = None
+        self._synced = 0
+        self._lock = threading.Lock()
+
+    def _name(self, path):
+        """Entry name: its path relative to the cache directory"""
+        return os.path.relpath(path, self.cache_dir).replace(os.sep, '/')
+
+    def pin(self, path):
+        self.pinned.add(self._name(path))
+
+    def _stored_path(self, path):
+        """Path of the file actually holding an entry, or None when it is not cached"""
+        if os.path.exists(path):
+            return path
+        if os.path.exists(path + COMPRESSED_SUFFIX):
+            return path + COMPRESSED_SUFFIX
+        return None
+
+    def exists(self, path):
+        return self._stored_path(path) is not None
+
+    def getmtime(self, path):
+        stored = self._stored_path(path)
+        if stored is None:
+            raise FileNotFoundError(path)
+        return os.path.getmtime(stored)
+
+    def read(self, path):
+        """Return an entry's bytes, decompressing if needed"""
+        stored = self._stored_path(path)
+        if stored is None:
+            raise FileNotFoundError(path)
+        with open(stored, 'rb') as f:
+            content = f.read()
+        self.touch(path, force=True)
+        return gzip.decompress(content) if stored.endswith(COMPRESSED_SUFFIX) else content
+
+    @staticmethod
+    def _stored_bytes(path):
+        """Bytes on disk of an entry's stored files, and whether there are any"""
+        size, found = 0, False
+        for stored in (path, path + COMPRESSED_SUFFIX):
+            try:
+                size += os.path.getsize(stored)
+                found = True
+            except FileNotFoundError:
+                pass
+        return size, found
+
+    def _account(self, path, added_bytes, added_entries):
+        with self._lock:
+            if self._totals is None:
+                return
+            self._totals['entries'] += added_entries
+            self._totals['bytes'] += added_bytes
+            if self._name(path) in self.pinned:
+                self._totals['pinnedBytes'] += added_bytes
+
+    def _sync(self):
+        """Walk the directory and reset the totals from it; returns the entries, least recently used first"""
+        entries = self.entries()
+        with self._lock:
+            self._totals = {
+                'entries': len(entries),
+                'bytes': sum(entry['bytes'] for entry in entries),
+                'pinnedBytes': sum(entry['bytes'] for entry in entries if entry['pinned'])
+            }
+            self._synced = time.monotonic()
+        return entries
+
+    def _current_totals(self):
+        if self._totals is None or time.monotonic() - self._synced > RESYNC_INTERVAL_SECONDS:
+            self._sync()
+        with self._lock:
+            return dict(self._totals)
+
+    def write(self, path, content, written_at=None):
+        """Atomically store an entry, then evict others if the cache is over budget
+
+        written_at backdates the entry's mtime, e.g. when restoring a copy fetched earlier.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        replaced_bytes, replaced = self._stored_bytes(path)
+        if self.compress and len(content) >= COMPRESS_MIN_BYTES:
+            stored, stale = path + COMPRESSED_SUFFIX, path
+            content = gzip.compress(content, compresslevel=6)
+        else:
+            stored, stale = path, path + COMPRESSED_SUFFIX
+        write_atomic(stored, content)
+        if written_at is not None:
+            os.utime(stored, (time.time(), written_at))
+        # Drop the other representation left from a different compression setting
+        if os.path.exists(stale):
+            os.remove(stale)
+        self._account(path, len(content) - replaced_bytes, 0 if replaced else 1)
+        if self.max_bytes and self._current_totals()['bytes'] > self.max_bytes:
+            self.prune(keep=self._name(path))
+
+    def touch(self, path, force=False):
+        """Record an access without changing the entry's mtime"""
+        now = time.time()
+        with self._lock:
+            if not force and now - self._touched.get(path, 0) < TOUCH_INTERVAL_SECONDS:
+                return
+            self._touched[path] = now
+            self._touched.move_to_end(path)
+            if len(self._touched) > TOUCH_MEMO_SIZE:
+                self._touched.popitem(last=False)
+        stored = self._stored_path(path)
+        if stored is not None:
+            try:
+                os.utime(stored, (now, os.path.getmtime(stored)))
+            except FileNotFoundError:
+                pass
+
+    def remove(self, path):
+        removed_bytes, found = self._stored_bytes(path)
+        for stored in (path, path + COMPRESSED_SUFFIX):
+            if os.path.exists(stored):
+                os.remove(stored)
+        with self._lock:
+            self._touched.pop(path, None)
+        if found:
+            self._account(path, -removed_bytes, -1)
+
+    def entries(self):
+        """Every entry with its size on disk and last access, least recently used first"""
+        entries = []
+        for directory, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                if filename.endswith(IGNORED_SUFFIXES):
+                    continue
+                stored = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(stored)
+                except FileNotFoundError:
+                    continue
+                compressed = filename.endswith(COMPRESSED_SUFFIX)
+                path = stored[:-len(COMPRESSED_SUFFIX)] if compressed else stored
+                name = self._name(path)
+                entries.append({
+                    'name': name,
+                    'path': path,
+                    'bytes': stat.st_size,
+                    'lastAccess': max(stat.st_atime, stat.st_mtime),
+                    'written': stat.st_mtime,
+                    'compressed': compressed,
+                    'pinned': name in self.pinned
+                })
+        entries.sort(key=lambda entry: entry['lastAccess'])
+        return entries
+
+    def total_bytes(self):
+        return self._current_totals()['bytes']
+
+    def prune(self, max_bytes=None, keep=None):
+        """Evict unpinned entries, least recently used first, until the cache fits max_bytes
+
+        Returns the evicted entries. keep names an entry that is never evicted
+        (the one just written).
+        """
+        if max_bytes is None:
+            if not self.max_bytes:
+                return []
+            max_bytes = self.max_bytes
+        entries = self._sync()
+        total = sum(entry['bytes'] for entry in entries)
+        evicted = []
+        for entry in entries:
+            if total <= max_bytes:
+                break
+            if entry['pinned'] or entry['name'] == keep:
+                continue
+            self.remove(entry['path'])
+            total -= entry['bytes']
+            evicted.append(entry)
+        if evicted:
+            self.evictions += len(evicted)
+            print(f"Evicted {len(evicted)} cache entries, {total} bytes remain")
+        return evicted
+
+    def clear(self, include_pinned=False):
+        removed = [entry for entry in self.entries() if include_pinned or not entry['pinned']]
+        for entry in removed:
+            self.remove(entry['path'])
+        return removed
+
+    def stats(self):
+        return {
+            **self._current_totals(),
+            'maxBytes': self.max_bytes,
+            'compress': self.compress,
+            'evictions': self.evictions
+        }
+
+
+def _format_bytes(size):
+    for unit in ('B', 'K', 'M', 'G'):
+        if size < 1024 or unit == 'G':
+            return f"{size:.0f}{unit}" if unit == 'B' else f"{size:.1f}{unit}"
+        size /= 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Inspect and prune the source cache')
+    parser.add_argument('--cache-dir', help='cache directory (default PCMC_CACHE_DIR or ./cache)')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('list', help='list entries, least recently used first (default)')
+    prune_parser = subparsers.add_parser('prune', help='evict unpinned entries until the cache fits the budget')
+    prune_parser.add_argument('--max-bytes', type=parse_size, help='budget, e.g. 50M (default PCMC_CACHE_MAX_BYTES)')
+    clear_parser = subparsers.add_parser('clear', help='remove every unpinned entry')
+    clear_parser.add_argument('--include-pinned', action='store_true', help='remove pinned entries too')
+    args = parser.parse_args(argv)
+
+    # The city registry knows which sources are pinned
+    from city_registry import CityRegistry
+    from data_fetcher import CACHE_DIR
+    cache = CityRegistry(cache_dir=args.cache_dir or CACHE_DIR).cache
+
+    if args.command == 'prune':
+        evicted = cache.prune(args.max_bytes)
+        for entry in evicted:
+            print(f"evicted {entry['name']} ({_format_bytes(entry['bytes'])})")
+    elif args.command == 'clear':
+        for entry in cache.clear(args.include_pinned):
+            print(f"removed {entry['name']} ({_format_bytes(entry['bytes'])})")
+    else:
+        now = time.time()
+        print(f"{'entry':<60} {'size':>8} {'idle':>10} {'age':>10}  flags")
+        for entry in cache.entries():
+            flags = ' '.join(flag for flag, on in (('pinned', entry['pinned']), ('gz', entry['compressed'])) if on)
+            print(f"{entry['name']:<60} {_format_bytes(entry['bytes']):>8} {now - entry['lastAccess']:>9.0f}s "
+                  f"{now - entry['written']:>9.0f}s  {flags}")
+
+    stats = cache.stats()
+    budget = _format_bytes(stats['maxBytes']) if stats['maxBytes'] else 'unlimited'
+    print(f"{stats['entries']} entries, {_format_bytes(stats['bytes'])} of {budget} "
+          f"({_format_bytes(stats['pinnedBytes'])} pinned)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
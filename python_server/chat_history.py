@@ -0,0 +1,132 @@
+
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Token budget for the chat history sent to the model (summary + recent turns)
+DEFAULT_TOKEN_BUDGET = int(os.environ.get('CHAT_HISTORY_TOKEN_BUDGET', 2000))
+# Share of the budget reserved for the rolling summary of older turns
+DEFAULT_SUMMARY_RATIO = 0.25
+# Number of conversations whose summaries are kept in memory
+DEFAULT_MAX_CONVERSATIONS = int(os.environ.get('CHAT_HISTORY_MAX_CONVERSATIONS', 1000))
+
+
+def estimate_tokens(text):
+    """Rough token estimate for Gemini models (about 4 characters per token)"""
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
+
+
+def _turn_text(turn):
+    role = 'User' if turn.get('role') == 'user' else 'Assistant'
+    return f"{role}: {turn.get('content', '')}"
+
+
+def extractive_summarizer(previous_summary, turns, max_tokens):
+    """Fold turns into the previous summary by keeping the lead sentence of each turn"""
+    lines = [previous_summary] if previous_summary else []
+    for turn in turns:
+        content = re.sub(r'\s+', ' ', turn.get('content', '')).strip()
+        if not content:
+            continue
+        lead = re.split(r'(?<=[.!?])\s', content, maxsplit=1)[0][:200]
+        role = 'User' if turn.get('role') == 'user' else 'Assistant'
+        lines.append(f"{role}: {lead}")
+    summary = "\n".join(lines)
+
+    # Keep the most recent part of the summary when it outgrows its budget
+    max_chars = max_tokens * 4
+    if len(summary) > max_chars:
+        summary = summary[-max_chars:]
+        summary = summary[summary.find("\n") + 1:] if "\n" in summary else summary
+    return summary
+
+
+class ChatHistoryManager:
+    """Keeps chat prompts within a token budget using a rolling summary of older turns"""
+
+    def __init__(self, token_budget=DEFAULT_TOKEN_BUDGET, summary_ratio=DEFAULT_SUMMARY_RATIO,
+                 max_conversations=DEFAULT_MAX_CONVERSATIONS, summarizer=None):
+        self.token_budget = token_budget
+        self.summary_budget = int(token_budget * summary_ratio)
+        self.max_conversations = max_conversations
+        self.summarizer = summarizer or extractive_summarizer
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _extend_digest(digest, turns):
+        """Feed turns into a running digest of a history prefix"""
+        for turn in turns:
+            digest.update(_turn_text(turn).encode('utf-8'))
+            digest.update(b'\0')
+        return digest
+
+    def _split_point(self, chat_history):
+        """Index of the first turn that fits in the verbatim part of the budget"""
+        recent_budget = self.token_budget - self.summary_budget
+        used = 0
+        split = len(chat_history)
+        # Always keep the latest turn verbatim, even if it alone exceeds the budget
+        while split > 0:
+            cost = estimate_tokens(_turn_text(chat_history[split - 1]))
+            if used + cost > recent_budget and split < len(chat_history):
+                break
+            used += cost
+            split -= 1
+        return split
+
+    def compact(self, conversation_id, chat_history):
+        """Return (summary, recent_turns) for a conversation within the token budget"""
+        if not chat_history:
+            return "", []
+
+        split = self._split_point(chat_history)
+        # Without a conversation id there is nothing safe to key a summary by, so it is built afresh
+        key = str(conversation_id) if conversation_id else None
+
+        entry = None
+        if key is not None:
+            with self._lock:
+                entry = self._summaries.get(key)
+                if entry is not None:
+                    self._summaries.move_to_end(key)
+
+        # Reuse the cached summary only if every turn folded into it is unchanged in the client history,
+        # so an edited earlier turn or a forked conversation is summarized again
+        digest = hashlib.sha1()
+        if entry is not None:
+            if (entry['compacted'] > len(chat_history) or
+                    self._extend_digest(digest, chat_history[:entry['compacted']]).hexdigest() != entry['digest']):
+                entry, digest = None, hashlib.sha1()
+
+        summary = entry['summary'] if entry else ""
+        compacted = entry['compacted'] if entry else 0
+
+        if split == 0 and compacted == 0:
+            return "", list(chat_history)
+
+        # Compact as soon as the verbatim turns exceed their budget; turns already folded into the
+        # summary are never summarized again
+        if split > compacted:
+            summary = self.summarizer(summary, chat_history[compacted:split], self.summary_budget)
+            if key is not None:
+                # The running digest continues from the turns just checked
+                entry = {'summary': summary, 'compacted': split,
+                         'digest': self._extend_digest(digest, chat_history[compacted:split]).hexdigest()}
+                with self._lock:
+                    self._summaries[key] = entry
+                    self._summaries.move_to_end(key)
+                    while len(self._summaries) > self.max_conversations:
+                        self._summaries.popitem(last=False)
+            compacted = split
+
+        return summary, list(chat_history[compacted:])
+
+    def stats(self):
+        """Return the number of conversations with a cached summary"""
+        with self._lock:
+            return {'conversations': len(self._summaries), 'tokenBudget': self.token_budget}
@@ -0,0 +1,109 @@
+
+import os
+import time
+import asyncio
+
+# Set CHAT_MODEL=stub to answer /chatbot locally without calling Gemini
+CHAT_MODEL = os.environ.get('CHAT_MODEL', 'gemini-pro')
+# Base URL of a Gemini-compatible REST API (e.g. the load-test stand-in); unset uses google.generativeai
+GEMINI_API_ENDPOINT = os.environ.get('GEMINI_API_ENDPOINT')
+GEMINI_REQUEST_TIMEOUT = float(os.environ.get('GEMINI_REQUEST_TIMEOUT', 60))
+
+
+class ChatResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubChatModel:
+    """Local stand-in for the Gemini model, for tests and offline runs"""
+
+    def __init__(self, latency=None, reply=None):
+        self.latency = float(os.environ.get('STUB_MODEL_LATENCY', 0.0)) if latency is None else latency
+        self.reply = reply
+        self.calls = 0
+
+    def generate_content(self, messages):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResponse(self._reply(messages))
+
+    async def generate_content_async(self, messages):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatResponse(self._reply(messages))
+
+    def _reply(self, messages):
+        question = messages[-1]['parts'][0] if messages else ''
+        return self.reply or f"[stub] You asked: {question}"
+
+
+class RestChatModel:
+    """Calls the Gemini generateContent REST API at a configurable endpoint"""
+
+    def __init__(self, endpoint=None, model=CHAT_MODEL, api_key=None, timeout=GEMINI_REQUEST_TIMEOUT):
+        self.endpoint = (endpoint or GEMINI_API_ENDPOINT).rstrip('/')
+        self.model = model
+        self.api_key = api_key or os.environ.get("GEMINI_API_KEY", '')
+        self.timeout = timeout
+
+    @property
+    def url(self):
+        return f"{self.endpoint}/v1beta/models/{self.model}:generateContent?key={self.api_key}"
+
+    @staticmethod
+    def _payload(messages):
+        contents = []
+        for message in messages:
+            text = "\n\n".join(message['parts'])
+            if message['role'] == 'system':
+                # The REST API has no system role; send it as an acknowledged opening turn
+                contents.append({'role': 'user', 'parts': [{'text': text}]})
+                contents.append({'role': 'model', 'parts': [{'text': 'Understood.'}]})
+            else:
+                contents.append({'role': message['role'], 'parts': [{'text': text}]})
+        return {'contents': contents}
+
+    @staticmethod
+    def _response(body):
+        parts = body['candidates'][0]['content']['parts']
+        return ChatResponse(''.join(part.get('text', '') for part in parts))
+
+    def generate_content(self, messages):
+        import requests
+        response = requests.post(self.url, json=self._payload(messages), timeout=self.timeout)
+        response.raise_for_status()
+        return self._response(response.json())
+
+    async def generate_content_async(self, messages):
+        import aiohttp
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.post(self.url, json=self._payload(messages)) as response:
+                response.raise_for_status()
+                return self._response(await response.json())
+
+
+def use_stub_model():
+    return CHAT_MODEL == 'stub'
+
+
+_genai_configured = False
+
+
+def get_chat_model():
+    """Return the configured generative model"""
+    global _genai_configured
+    if use_stub_model():
+        return StubChatModel()
+    if GEMINI_API_ENDPOINT:
+        return RestChatModel()
+
+    # Imported on first use: google.generativeai pulls in grpc and protobuf
+    import google.generativeai as genai
+    if not _genai_configured:
+        genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
+        _genai_configured = True
+    return genai.GenerativeModel(CHAT_MODEL)
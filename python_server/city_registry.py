@@ -0,0 +1,97 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from cache_manager import CacheManager
+from data_fetcher import CACHE_DIR, SOURCE_MIRROR, DEFAULT_CITY, PCMCDataFetcher, load_city_config
+
+# Cities whose parsed sources are kept in memory at once; others are re-read from the cache on use
+CITY_MAX_RESIDENT = int(os.environ.get('CITY_MAX_RESIDENT', 4))
+# Cities downloaded in parallel during warmup
+CITY_WARM_WORKERS = int(os.environ.get('CITY_WARM_WORKERS', 4))
+
+
+class UnknownCity(ValueError):
+    """Raised for a city that is not in the source registry"""
+
+
+class CityRegistry:
+    """One PCMCDataFetcher per configured city, with a bound on how many hold data in memory
+
+    Fetchers for every city exist up front (they hold no data until used). The
+    most recently used CITY_MAX_RESIDENT cities keep their parsed sources in
+    memory; older ones are unloaded and read back from the shared cache.
+    """
+
+    def __init__(self, config=None, cache_dir=CACHE_DIR, source_mirror=SOURCE_MIRROR, default_city=DEFAULT_CITY,
+                 max_resident=CITY_MAX_RESIDENT):
+        config = config if config is not None else load_city_config()
+        if default_city not in config:
+            raise UnknownCity(f"Default city {default_city} is not configured")
+        self.default_city = default_city
+        self.max_resident = max_resident
+        # One cache manager for all cities, so the byte budget covers the whole cache
+        self.cache = CacheManager(cache_dir)
+        self._fetchers = {
+            city: PCMCDataFetcher(cache_dir=cache_dir, source_mirror=source_mirror, city=city,
+                                  city_config=city_config, cache=self.cache)
+            for city, city_config in config.items()
+        }
+        self._resident = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def cities(self):
+        return list(self._fetchers)
+
+    def fetchers(self):
+        return list(self._fetchers.values())
+
+    def get(self, city=None):
+        """Fetcher for a city (the default city when None), marking it recently used"""
+        city = city or self.default_city
+        fetcher = self._fetchers.get(city)
+        if fetcher is None:
+            raise UnknownCity(f"Unknown city: {city}")
+        evicted = None
+        with self._lock:
+            self._resident[city] = True
+            self._resident.move_to_end(city)
+            if len(self._resident) > self.max_resident:
+                evicted, _ = self._resident.popitem(last=False)
+        if evicted is not None:
+            self._fetchers[evicted].unload()
+        return fetcher
+
+    def warm(self, max_workers=CITY_WARM_WORKERS):
+        """Download every city's sources in parallel and load the default and first resident cities into memory
+
+        Returns the loaded sources as city/source keys.
+        """
+        # Default city first so it is resident even with a small bound
+        order = [self.default_city] + [city for city in self._fetchers if city != self.default_city]
+        resident = set(order[:self.max_resident])
+
+        def warm_city(city):
+            fetcher = self._fetchers[city]
+            if city in resident:
+                loaded = fetcher.warm()
+                return [f"{city}/{source_key}" for source_key in loaded]
+            for source_key in fetcher.data_sources:
+                fetcher.fetch_data(source_key)
+            fetcher.unload()
+            return []
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='city-warm') as pool:
+            results = list(pool.map(warm_city, order))
+        # Mark residency in order, so the default city is the most recently used
+        for city in reversed(order[:self.max_resident]):
+            self.get(city)
+        return [key for keys in results for key in keys]
+
+    def stats(self):
+        with self._lock:
+            resident = list(self._resident)
+        return {'cities': self.cities, 'defaultCity': self.default_city, 'resident': resident,
+                'maxResident': self.max_resident}
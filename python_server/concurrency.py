@@ -0,0 +1,114 @@
+
+import os
+import asyncio
+
+# Per-upstream limits for the async server
+GEMINI_MAX_CONCURRENCY = int(os.environ.get('GEMINI_MAX_CONCURRENCY', 8))
+GEMINI_MAX_QUEUE = int(os.environ.get('GEMINI_MAX_QUEUE', 32))
+SOURCE_FETCH_MAX_CONCURRENCY = int(os.environ.get('SOURCE_FETCH_MAX_CONCURRENCY', 4))
+SOURCE_FETCH_MAX_QUEUE = int(os.environ.get('SOURCE_FETCH_MAX_QUEUE', 16))
+CPU_MAX_QUEUE = int(os.environ.get('CPU_MAX_QUEUE', 64))
+# Seconds a request may take before it is abandoned with a 504
+REQUEST_DEADLINE_SECONDS = float(os.environ.get('REQUEST_DEADLINE_SECONDS', 30))
+# Seconds clients are asked to wait before retrying a rejected request
+RETRY_AFTER_SECONDS = int(os.environ.get('RETRY_AFTER_SECONDS', 2))
+
+
+class Overloaded(Exception):
+    """Raised when an upstream's wait queue is full"""
+
+    def __init__(self, upstream, retry_after=RETRY_AFTER_SECONDS):
+        super().__init__(f"{upstream} is overloaded, retry in {retry_after}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class UpstreamLimiter:
+    """Bounds concurrent calls to one upstream and rejects work once its queue is full"""
+
+    def __init__(self, name, max_concurrency, max_queue, retry_after=RETRY_AFTER_SECONDS):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = None
+
+    def _get_semaphore(self):
+        # Created lazily so the semaphore binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def run(self, func, *args):
+        """Await func(*args) once a slot is free, or raise Overloaded"""
+        semaphore = self._get_semaphore()
+        if semaphore.locked() and self.waiting >= self.max_queue:
+            raise Overloaded(self.name, self.retry_after)
+
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            return await func(*args)
+        finally:
+            self.active -= 1
+            semaphore.release()
+
+    def stats(self):
+        return {
+            'active': self.active,
+            'waiting': self.waiting,
+            'maxConcurrency': self.max_concurrency,
+            'maxQueue': self.max_queue
+        }
+
+
+class ByteBudget:
+    """Bounds the bytes held by concurrent requests; a request waits up to wait seconds for room
+
+    Releasing is synchronous, so a reservation can be returned from a cancelled handler or a done callback.
+    """
+
+    def __init__(self, name, max_bytes, wait, retry_after=RETRY_AFTER_SECONDS):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.wait = wait
+        self.retry_after = retry_after
+        self.held = 0
+        self.rejected = 0
+        self._waiters = []
+
+    async def acquire(self, size):
+        """Reserve size bytes once they fit, or raise Overloaded; an oversized request runs once nothing is held"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait
+        while self.held and self.held + size > self.max_bytes:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                self.rejected += 1
+                raise Overloaded(self.name, self.retry_after)
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._waiters.remove(waiter)
+        self.held += size
+
+    def release(self, size):
+        self.held -= size
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def stats(self):
+        return {'heldBytes': self.held, 'maxBytes': self.max_bytes, 'waiting': len(self._waiters),
+                'rejected': self.rejected}
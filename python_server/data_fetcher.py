@@ -1,64 +1,115 @@
 
 import os
-import pandas as pd
-import requests
 import io
-import PyPDF2
 import re
-from bs4 import BeautifulSoup
-import numpy as np
 import json
-import tabula
-import csv
-import matplotlib.pyplot as plt
+import time
+import threading
 from io import BytesIO
 import base64
+from metrics import fetch_cache_results, time_stage
+from cache_manager import CacheManager, file_lock
+from table_extraction import get_table_extractor
+
+# Heavy dependencies (pandas, numpy, requests, PyPDF2, bs4, tabula, matplotlib)
+# are imported inside the methods that use them, so importing this module stays
+# cheap and tabula's JVM and the plotting stack load only when first needed.
 
 # Directory to store cached data
-CACHE_DIR = os.path.join(os.path.dirname(__file__), 'cache')
+CACHE_DIR = os.environ.get('PCMC_CACHE_DIR', os.path.join(os.path.dirname(__file__), 'cache'))
 os.makedirs(CACHE_DIR, exist_ok=True)
 
+# Optional base URL serving local copies of every source as <source_key>.<csv|pdf|html>,
+# used for offline benchmarks and load tests
+SOURCE_MIRROR = os.environ.get('PCMC_SOURCE_MIRROR')
+MIRROR_EXTENSIONS = {'csv': 'csv', 'pdf': 'pdf', 'article': 'html'}
+
+# Refresh intervals from the update frequencies in datasets_info.txt
+DAY = 24 * 3600
+DAILY, BIWEEKLY, MONTHLY, QUARTERLY = DAY, 14 * DAY, 30 * DAY, 91 * DAY
+REFRESH_INTERVALS = {'daily': DAILY, 'biweekly': BIWEEKLY, 'monthly': MONTHLY, 'quarterly': QUARTERLY}
+
+# Source registry: cities keyed by id, each with its sources and areas
+CITY_CONFIG_PATH = os.environ.get('PCMC_CITY_CONFIG', os.path.join(os.path.dirname(__file__), 'cities.json'))
+DEFAULT_CITY = os.environ.get('PCMC_DEFAULT_CITY', 'pimpri_chinchwad')
+CACHE_EXTENSIONS = {'csv': 'csv', 'pdf': 'json', 'article': 'json'}
+
+# Sources each analytics view is built from; a built view is reused until one of them changes
+WATER_ANALYTICS_SOURCES = ('water_sustainability_data', 'water_conservation', 'water_sustainability')
+ENERGY_ANALYTICS_SOURCES = ('electricity_consumption', 'pcmc_green_city', 'green_city_action_plan')
+
+
+def load_city_config(path=CITY_CONFIG_PATH):
+    """Read the city source registry"""
+    with open(path) as f:
+        config = json.load(f)
+    for city, city_config in config.items():
+        for source_key, source in city_config['sources'].items():
+            if source['type'] not in CACHE_EXTENSIONS:
+                raise ValueError(f"{city}.{source_key}: unknown source type {source['type']}")
+            if source.get('refresh', 'monthly') not in REFRESH_INTERVALS:
+                raise ValueError(f"{city}.{source_key}: unknown refresh frequency {source['refresh']}")
+    return config
+
+def city_names(city_config):
+    """Names of a whole city, which complaints use for city-wide problems rather than for one area"""
+    return [city_config['name'], *city_config.get('aliases', [])]
+
+class _Flight:
+    """One in-progress fetch that concurrent callers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
 class PCMCDataFetcher:
     """Class to fetch and process PCMC data from various sources"""
     
-    def __init__(self):
-        self.data_sources = {
-            'green_city_action_plan': {
-                'url': 'https://www.pcmcindia.gov.in/marathi/pdf/Green-City-Action-Plan.pdf',
-                'cache_path': os.path.join(CACHE_DIR, 'green_city_action_plan.json'),
-                'type': 'pdf'
-            },
-            'water_sustainability': {
-                'url': 'https://www.teriin.org/sites/default/files/2021-06/Water_Sustainability_Assessment_%20of_Pune.pdf',
-                'cache_path': os.path.join(CACHE_DIR, 'water_sustainability.json'),
-                'type': 'pdf'
-            },
-            'water_conservation': {
-                'url': 'https://cio.economictimes.indiatimes.com/news/business-analytics/heres-how-punes-pcmc-is-saving-31000-million-litres-of-water-using-data-and-analytics/85582938',
-                'cache_path': os.path.join(CACHE_DIR, 'water_conservation.json'),
-                'type': 'article'
-            },
-            'pollution_index': {
-                'url': 'https://mpcb.gov.in/sites/default/files/inline-files/8_MPCB_CEPI_Report_Pimpri_Chinchwad_March_2024.pdf',
-                'cache_path': os.path.join(CACHE_DIR, 'pollution_index.json'),
-                'type': 'pdf'
-            },
-            'electricity_consumption': {
-                'url': 'https://raw.githubusercontent.com/aniketmahajan-29/Electricity-Consumption-EDA-Analysis/main/Dataset.csv',
-                'cache_path': os.path.join(CACHE_DIR, 'electricity_consumption.csv'),
-                'type': 'csv'
-            },
-            'water_sustainability_data': {
-                'url': 'https://raw.githubusercontent.com/lovable-data/pcmc-data/main/water_sustainability.csv',
-                'cache_path': os.path.join(CACHE_DIR, 'water_sustainability_data.csv'),
-                'type': 'csv'
-            },
-            'pcmc_green_city': {
-                'url': 'https://raw.githubusercontent.com/lovable-data/pcmc-data/main/pcmc_green_city.csv',
-                'cache_path': os.path.join(CACHE_DIR, 'pcmc_green_city.csv'),
-                'type': 'csv'
+    def __init__(self, cache_dir=CACHE_DIR, source_mirror=SOURCE_MIRROR, city=DEFAULT_CITY, city_config=None, cache=None):
+        if city_config is None:
+            city_config = load_city_config()[city]
+        self.city = city
+        self.city_name = city_config['name']
+        self.areas = city_config['areas']
+        self.city_names = city_names(city_config)
+        
+        # Cache files are sharded as <cache_dir>/<city>/<source>/<source>.<ext>
+        self.data_sources = {}
+        for source_key, config in city_config['sources'].items():
+            source_dir = os.path.join(cache_dir, city, source_key)
+            os.makedirs(source_dir, exist_ok=True)
+            self.data_sources[source_key] = {
+                'url': config['url'],
+                'cache_path': os.path.join(source_dir, f"{source_key}.{CACHE_EXTENSIONS[config['type']]}"),
+                'type': config['type'],
+                'refresh_interval': REFRESH_INTERVALS[config.get('refresh', 'monthly')],
+                'pinned': config.get('pinned', False)
             }
-        }
+        
+        # Sources the analytics are built from are pinned and never evicted from the cache.
+        # A CityRegistry passes one manager shared by every city.
+        self.cache = cache or CacheManager(cache_dir)
+        for source in self.data_sources.values():
+            if source['pinned']:
+                self.cache.pin(source['cache_path'])
+        
+        # Download from the mirror when one is configured; 'url' still identifies the document
+        if source_mirror:
+            for source_key, source in self.data_sources.items():
+                source['fetch_url'] = f"{source_mirror.rstrip('/')}/{source_key}.{MIRROR_EXTENSIONS[source['type']]}"
+        
+        # Parsed cache contents keyed by source, with the cache file mtime they were read at.
+        # Callers share these objects and must not modify them in place.
+        self._loaded = {}
+        
+        # Built analytics keyed by kind ('water', 'energy'), with the source versions they were built from
+        self._analytics = {}
+        
+        # In-progress fetches keyed by source, so concurrent misses share one download
+        self._flights = {}
+        self._flights_lock = threading.Lock()
     
     def fetch_data(self, source_key, force_refresh=False):
         """Fetch data from a specific source or use cached data if available"""
@@ -67,69 +118,251 @@ class PCMCDataFetcher:
         
         source = self.data_sources[source_key]
         
-        # Check if cache exists and we're not forcing a refresh
-        if os.path.exists(source['cache_path']) and not force_refresh:
-            print(f"Using cached data for {source_key}")
-            if source['type'] in ['csv', 'excel']:
-                return pd.read_csv(source['cache_path'])
-            else:
-                with open(source['cache_path'], 'r') as f:
-                    return json.load(f)
-        
-        # Fetch and process the data
-        print(f"Fetching {source_key} data from {source['url']}")
+        # Check if cache exists and we're not forcing a refresh. Stale copies are
+        # still served here; RefreshScheduler replaces them in the background.
+        if self.cache.exists(source['cache_path']) and not force_refresh:
+            try:
+                return self._load_cached(source_key, source)
+            except FileNotFoundError:
+                pass  # Evicted by another process since the check
         
+        requested_at = time.time()
         try:
-            if source['type'] == 'csv':
-                return self._fetch_csv(source)
-            elif source['type'] == 'pdf':
-                return self._fetch_pdf(source)
-            elif source['type'] == 'article':
-                return self._fetch_article(source)
-            else:
-                raise ValueError(f"Unknown source type: {source['type']}")
+            return self._fetch_single_flight(source_key, source, lambda mtime: not force_refresh or mtime >= requested_at)
         except Exception as e:
             print(f"Error fetching {source_key}: {e}")
-            # Return empty data if fetch fails
+            # Keep serving the last good copy, or empty data if there is none
+            if self.cache.exists(source['cache_path']):
+                return self._load_cached(source_key, source)
+            import pandas as pd
             return pd.DataFrame() if source['type'] in ['csv', 'excel'] else {}
     
+    def refresh(self, source_key):
+        """Download a source if its cache is older than its refresh interval and load it into memory
+
+        Raises on failure, leaving the previous cache file in place.
+        """
+        source = self.data_sources[source_key]
+        was_loaded = source_key in self._loaded
+        self._fetch_single_flight(source_key, source, lambda mtime: time.time() - mtime < source['refresh_interval'])
+        if was_loaded:
+            # Load a copy another process refreshed, so the next request finds it parsed
+            self._load_cached(source_key, source)
+        else:
+            # Keep cities that are not in use out of memory
+            self._loaded.pop(source_key, None)
+    
+    def needs_reload(self, source_key):
+        """Whether the in-memory copy is older than the cache file on disk"""
+        loaded = self._loaded.get(source_key)
+        cache_path = self.data_sources[source_key]['cache_path']
+        return loaded is not None and self.cache.exists(cache_path) and loaded[0] != self.cache.getmtime(cache_path)
+    
+    def source_status(self):
+        """Age and freshness of every cached source"""
+        now = time.time()
+        status = {}
+        for source_key, source in self.data_sources.items():
+            cached = self.cache.exists(source['cache_path'])
+            age = now - self.cache.getmtime(source['cache_path']) if cached else None
+            status[source_key] = {
+                'type': source['type'],
+                'refreshIntervalSeconds': source['refresh_interval'],
+                'cached': cached,
+                'ageSeconds': round(age, 1) if cached else None,
+                'fresh': cached and age < source['refresh_interval'],
+                'inMemory': source_key in self._loaded
+            }
+        return status
+    
+    def _fetch_single_flight(self, source_key, source, is_current):
+        """Download a source once for all concurrent callers in this process and across processes
+
+        is_current(mtime) decides whether an existing cache file can be used instead.
+        """
+        with self._flights_lock:
+            flight = self._flights.get(source_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[source_key] = _Flight()
+        
+        if not leader:
+            fetch_cache_results.inc(source_key, 'coalesced')
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        
+        try:
+            with file_lock(source['cache_path'] + '.lock'):
+                # Another process may have written the cache while we waited for the lock
+                cache_path = source['cache_path']
+                if self.cache.exists(cache_path) and is_current(self.cache.getmtime(cache_path)):
+                    flight.result = self._load_cached(source_key, source)
+                else:
+                    flight.result = self._download(source_key, source)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[source_key]
+            flight.done.set()
+        return flight.result
+    
+    def _download(self, source_key, source):
+        """Fetch and process a source, writing its cache file"""
+        print(f"Fetching {source_key} data from {source['url']}")
+        fetch_cache_results.inc(source_key, 'miss')
+        
+        if source['type'] == 'csv':
+            data = self._fetch_csv(source)
+        elif source['type'] == 'pdf':
+            data = self._fetch_pdf(source)
+        elif source['type'] == 'article':
+            data = self._fetch_article(source)
+        else:
+            raise ValueError(f"Unknown source type: {source['type']}")
+        
+        self._loaded[source_key] = (self.cache.getmtime(source['cache_path']), data)
+        return data
+    
+    def _load_cached(self, source_key, source):
+        """Return parsed cache contents, re-reading the file only when it changes"""
+        mtime = self.cache.getmtime(source['cache_path'])
+        loaded = self._loaded.get(source_key)
+        if loaded is not None and loaded[0] == mtime:
+            fetch_cache_results.inc(source_key, 'memory')
+            # Keep entries served from memory recently used on disk too
+            self.cache.touch(source['cache_path'])
+            return loaded[1]
+        
+        print(f"Using cached data for {source_key}")
+        fetch_cache_results.inc(source_key, 'disk')
+        with time_stage('parse'):
+            if source['type'] in ['csv', 'excel']:
+                import pandas as pd
+                data = pd.read_csv(io.BytesIO(self.cache.read(source['cache_path'])))
+            else:
+                data = json.loads(self.cache.read(source['cache_path']))
+        
+        self._loaded[source_key] = (mtime, data)
+        return data
+    
+    def export_source(self, source_key):
+        """Cached bytes of a source and the time they were fetched, or None when not cached"""
+        source = self.data_sources[source_key]
+        try:
+            return self.cache.read(source['cache_path']), self.cache.getmtime(source['cache_path'])
+        except FileNotFoundError:
+            return None
+    
+    def restore_source(self, source_key, content, fetched_at):
+        """Install a cached copy fetched elsewhere unless the local cache is newer, then load the source into memory"""
+        source = self.data_sources[source_key]
+        with file_lock(source['cache_path'] + '.lock'):
+            restored = not (self.cache.exists(source['cache_path']) and
+                            self.cache.getmtime(source['cache_path']) >= fetched_at)
+            if restored:
+                self.cache.write(source['cache_path'], content, written_at=fetched_at)
+        self._load_cached(source_key, source)
+        return restored
+    
+    def _fetch_configured(self, source_key, tabular=False):
+        """Fetch a source, or empty data when this city does not configure it"""
+        if source_key in self.data_sources:
+            return self.fetch_data(source_key)
+        import pandas as pd
+        return pd.DataFrame() if tabular else {}
+    
+    def unload(self):
+        """Drop parsed sources and built analytics from memory; they are re-read from the cache on next use"""
+        self._loaded = {}
+        self._analytics = {}
+    
+    def _source_versions(self, source_keys):
+        """Cache file mtimes of the given sources (None when not cached)"""
+        versions = []
+        for source_key in source_keys:
+            source = self.data_sources.get(source_key)
+            versions.append(self.cache.getmtime(source['cache_path'])
+                            if source and self.cache.exists(source['cache_path']) else None)
+        return tuple(versions)
+    
+    def _memoized_analytics(self, kind, source_keys, build):
+        """Return built analytics, rebuilding only when one of its sources changed"""
+        versions = self._source_versions(source_keys)
+        built = self._analytics.get(kind)
+        if built is None or built[0] != versions:
+            analytics = build()
+            if not analytics:
+                return analytics
+            built = self._analytics[kind] = (versions, analytics)
+        # Shallow copy, so callers can add keys without changing the shared copy
+        return dict(built[1])
+    
+    def analytics_state(self):
+        """Built analytics with their source versions, for snapshots"""
+        return {kind: {'versions': list(versions), 'analytics': analytics}
+                for kind, (versions, analytics) in self._analytics.items()}
+    
+    def restore_analytics(self, kind, versions, analytics):
+        """Install analytics built elsewhere; used only while its sources are unchanged"""
+        self._analytics[kind] = (tuple(versions), analytics)
+    
+    def warm(self):
+        """Load every source into memory, downloading any that are not cached yet"""
+        for source_key, source in self.data_sources.items():
+            self.fetch_data(source_key)
+            if self.cache.exists(source['cache_path']):
+                self._load_cached(source_key, source)
+        return list(self._loaded.keys())
+    
     def _fetch_csv(self, source):
         """Fetch and process CSV data"""
-        response = requests.get(source['url'])
-        response.raise_for_status()
+        import requests
+        import pandas as pd
+        
+        with time_stage('fetch'):
+            response = requests.get(source.get('fetch_url', source['url']))
+            response.raise_for_status()
         
         # Save to cache
-        with open(source['cache_path'], 'wb') as f:
-            f.write(response.content)
+        self.cache.write(source['cache_path'], response.content)
         
         # Return as DataFrame
-        return pd.read_csv(source['cache_path'])
+        with time_stage('parse'):
+            return pd.read_csv(io.BytesIO(response.content))
     
     def _fetch_pdf(self, source):
         """Fetch and extract data from PDF"""
-        response = requests.get(source['url'])
-        response.raise_for_status()
+        import requests
+        import PyPDF2
         
-        # Process PDF content - basic extraction of text and tables
-        pdf_file = io.BytesIO(response.content)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        with time_stage('fetch'):
+            response = requests.get(source.get('fetch_url', source['url']))
+            response.raise_for_status()
         
-        # Extract text from PDF
-        text_content = ""
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text_content += page.extract_text() + "\n\n"
-        
-        # Extract tables from PDF using tabula
-        tables = []
-        try:
-            tables = tabula.read_pdf(pdf_file, pages='all', multiple_tables=True)
-            tables = [table.to_dict(orient='records') for table in tables if not table.empty]
-        except Exception as e:
-            print(f"Error extracting tables from PDF: {e}")
-        
-        # Extract key metrics using regex patterns based on the specific document
-        metrics = self._extract_metrics_from_text(text_content, source['url'])
+        with time_stage('parse'):
+            # Process PDF content - basic extraction of text and tables
+            pdf_file = io.BytesIO(response.content)
+            pdf_reader = PyPDF2.PdfReader(pdf_file)
+            
+            # Extract text from PDF
+            text_content = ""
+            for page_num in range(len(pdf_reader.pages)):
+                page = pdf_reader.pages[page_num]
+                text_content += page.extract_text() + "\n\n"
+            
+            # Extract tables page by page; pages seen before are served from the page cache
+            tables = []
+            try:
+                tables = get_table_extractor(self.cache).extract(response.content, pdf_reader)
+            except Exception as e:
+                print(f"Error extracting tables from PDF: {e}")
+            
+            # Extract key metrics using regex patterns based on the specific document
+            metrics = self._extract_metrics_from_text(text_content, source['url'])
         
         # Combine extracted information
         data = {
@@ -139,29 +372,33 @@ class PCMCDataFetcher:
         }
         
         # Save to cache
-        with open(source['cache_path'], 'w') as f:
-            json.dump(data, f)
+        self.cache.write(source['cache_path'], json.dumps(data))
         
         return data
     
     def _fetch_article(self, source):
         """Fetch and process article content"""
-        response = requests.get(source['url'])
-        response.raise_for_status()
-        
-        # Parse HTML content
-        soup = BeautifulSoup(response.content, 'html.parser')
+        import requests
+        from bs4 import BeautifulSoup
         
-        # Extract article text (customize based on site structure)
-        article_content = ""
-        article_div = soup.find('div', class_='article')
-        if article_div:
-            paragraphs = article_div.find_all('p')
-            for p in paragraphs:
-                article_content += p.get_text() + "\n\n"
+        with time_stage('fetch'):
+            response = requests.get(source.get('fetch_url', source['url']))
+            response.raise_for_status()
         
-        # Extract key metrics using regex
-        metrics = self._extract_metrics_from_text(article_content, source['url'])
+        with time_stage('parse'):
+            # Parse HTML content
+            soup = BeautifulSoup(response.content, 'html.parser')
+            
+            # Extract article text (customize based on site structure)
+            article_content = ""
+            article_div = soup.find('div', class_='article')
+            if article_div:
+                paragraphs = article_div.find_all('p')
+                for p in paragraphs:
+                    article_content += p.get_text() + "\n\n"
+            
+            # Extract key metrics using regex
+            metrics = self._extract_metrics_from_text(article_content, source['url'])
         
         # Combine extracted information
         data = {
@@ -170,8 +407,7 @@ class PCMCDataFetcher:
         }
         
         # Save to cache
-        with open(source['cache_path'], 'w') as f:
-            json.dump(data, f)
+        self.cache.write(source['cache_path'], json.dumps(data))
         
         return data
     
@@ -236,11 +472,16 @@ class PCMCDataFetcher:
     
     def get_water_analytics(self):
         """Generate comprehensive water analytics by combining multiple sources"""
+        return self._memoized_analytics('water', WATER_ANALYTICS_SOURCES, self._build_water_analytics)
+    
+    def _build_water_analytics(self):
+        import numpy as np
+        
         try:
             # Fetch data from multiple sources
-            water_sustainability_df = self.fetch_data('water_sustainability_data')
-            water_conservation = self.fetch_data('water_conservation')
-            water_assessment = self.fetch_data('water_sustainability')
+            water_sustainability_df = self._fetch_configured('water_sustainability_data', tabular=True)
+            water_conservation = self._fetch_configured('water_conservation')
+            water_assessment = self._fetch_configured('water_sustainability')
             
             # Prepare data structures for analytics
             analytics = {
@@ -363,28 +604,10 @@ class PCMCDataFetcher:
                     'treatment': round(treatment, 1)
                 })
             
-            # Water supply risk assessment by area
-            areas = ["Pimpri", "Chinchwad", "Bhosari", "Wakad", "Nigdi"]
-            for area in areas:
-                # Different risk profiles based on area
-                if area in ["Pimpri", "Nigdi"]:
-                    base_risk = 30  # Lower risk areas
-                elif area in ["Chinchwad", "Bhosari"]:
-                    base_risk = 45  # Medium risk areas
-                else:
-                    base_risk = 60  # Higher risk areas (newer developments)
-                
-                # Add some randomness
-                shortage_risk = round(base_risk + np.random.randint(-5, 6))
-                infrastructure_risk = round(base_risk - 5 + np.random.randint(-5, 6))
-                quality_risk = round(max(10, min(70, base_risk - 10 + np.random.randint(-5, 6))))
-                
-                analytics['waterRisks'].append({
-                    'area': area,
-                    'shortageRisk': shortage_risk,
-                    'infrastructureRisk': infrastructure_risk,
-                    'qualityRisk': quality_risk
-                })
+            # Water supply risk assessment by area, from the areas' risk tiers; complaint
+            # analytics replace it with scores computed from complaint data
+            from areas import area_risks
+            analytics['waterRisks'] = area_risks(self.areas, 'water')
                 
             return analytics
         
@@ -394,11 +617,16 @@ class PCMCDataFetcher:
     
     def get_energy_analytics(self):
         """Generate comprehensive energy analytics by combining multiple sources"""
+        return self._memoized_analytics('energy', ENERGY_ANALYTICS_SOURCES, self._build_energy_analytics)
+    
+    def _build_energy_analytics(self):
+        import numpy as np
+        
         try:
             # Fetch data from multiple sources
-            electricity_df = self.fetch_data('electricity_consumption')
-            green_city_df = self.fetch_data('pcmc_green_city')
-            green_city_plan = self.fetch_data('green_city_action_plan')
+            electricity_df = self._fetch_configured('electricity_consumption', tabular=True)
+            green_city_df = self._fetch_configured('pcmc_green_city', tabular=True)
+            green_city_plan = self._fetch_configured('green_city_action_plan')
             
             # Prepare data structures for analytics
             analytics = {
@@ -414,8 +642,8 @@ class PCMCDataFetcher:
             
             # Process energy consumption trends
             if not electricity_df.empty and 'City' in electricity_df.columns:
-                # Filter for PCMC data
-                pcmc_data = electricity_df[electricity_df['City'] == 'Pimpri Chinchwad'].copy()
+                # Filter for this city's data
+                pcmc_data = electricity_df[electricity_df['City'] == self.city_name].copy()
                 
                 if not pcmc_data.empty:
                     # Group by year
@@ -560,28 +788,10 @@ class PCMCDataFetcher:
                     'renewable': round(renewable, 1)
                 })
             
-            # Energy supply risk assessment by area
-            areas = ["Pimpri", "Chinchwad", "Bhosari", "Wakad", "Nigdi"]
-            for area in areas:
-                # Different risk profiles based on area
-                if area in ["Pimpri", "Nigdi"]:
-                    base_risk = 25  # Lower risk areas (better infrastructure)
-                elif area in ["Chinchwad", "Bhosari"]:
-                    base_risk = 40  # Medium risk areas
-                else:
-                    base_risk = 55  # Higher risk areas (newer developments, higher growth)
-                
-                # Add some randomness
-                outage_risk = round(base_risk + np.random.randint(-5, 6))
-                capacity_risk = round(base_risk - 3 + np.random.randint(-5, 6))
-                infrastructure_risk = round(max(10, min(70, base_risk - 8 + np.random.randint(-5, 6))))
-                
-                analytics['energyRisks'].append({
-                    'area': area,
-                    'outageRisk': outage_risk,
-                    'capacityRisk': capacity_risk,
-                    'infrastructureRisk': infrastructure_risk
-                })
+            # Energy supply risk assessment by area, from the areas' risk tiers; complaint
+            # analytics replace it with scores computed from complaint data
+            from areas import area_risks
+            analytics['energyRisks'] = area_risks(self.areas, 'energy')
                 
             return analytics
         
@@ -591,47 +801,54 @@ class PCMCDataFetcher:
     
     def generate_analytics_chart(self, chart_type, data_source, params=None):
         """Generate a chart image based on specified parameters and return as base64"""
+        import pandas as pd
+        # A figure with its own Agg canvas per call: pyplot's current-figure state is shared
+        # between the server's threads and would mix concurrent charts
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        
         try:
-            plt.figure(figsize=(10, 6))
+            fig = Figure(figsize=(10, 6))
+            FigureCanvasAgg(fig)
+            ax = fig.add_subplot()
             
             if chart_type == 'bar':
                 # Bar chart for categorical data
                 df = pd.DataFrame(data_source)
-                plt.bar(df[params['x']], df[params['y']], color='skyblue')
-                plt.xlabel(params['x'].capitalize())
-                plt.ylabel(params['y'].capitalize())
+                ax.bar(df[params['x']], df[params['y']], color='skyblue')
+                ax.set_xlabel(params['x'].capitalize())
+                ax.set_ylabel(params['y'].capitalize())
                 
             elif chart_type == 'line':
                 # Line chart for time series
                 df = pd.DataFrame(data_source)
-                plt.plot(df[params['x']], df[params['y']], marker='o', linestyle='-', color='green')
-                plt.xlabel(params['x'].capitalize())
-                plt.ylabel(params['y'].capitalize())
+                ax.plot(df[params['x']], df[params['y']], marker='o', linestyle='-', color='green')
+                ax.set_xlabel(params['x'].capitalize())
+                ax.set_ylabel(params['y'].capitalize())
                 
             elif chart_type == 'pie':
                 # Pie chart for distribution
                 df = pd.DataFrame(data_source)
-                plt.pie(df[params['value']], labels=df[params['label']], autopct='%1.1f%%')
+                ax.pie(df[params['value']], labels=df[params['label']], autopct='%1.1f%%')
                 
             elif chart_type == 'scatter':
                 # Scatter plot for correlation
                 df = pd.DataFrame(data_source)
-                plt.scatter(df[params['x']], df[params['y']], alpha=0.7)
-                plt.xlabel(params['x'].capitalize())
-                plt.ylabel(params['y'].capitalize())
+                ax.scatter(df[params['x']], df[params['y']], alpha=0.7)
+                ax.set_xlabel(params['x'].capitalize())
+                ax.set_ylabel(params['y'].capitalize())
                 
-            plt.title(params.get('title', f"{chart_type.capitalize()} Chart"))
-            plt.grid(True, linestyle='--', alpha=0.7)
-            plt.tight_layout()
+            ax.set_title(params.get('title', f"{chart_type.capitalize()} Chart"))
+            ax.grid(True, linestyle='--', alpha=0.7)
+            fig.tight_layout()
             
             # Save to BytesIO object
             buffer = BytesIO()
-            plt.savefig(buffer, format='png')
+            fig.savefig(buffer, format='png')
             buffer.seek(0)
             
             # Convert to base64
             image_base64 = base64.b64encode(buffer.getvalue()).decode('ascii')
-            plt.close()
             
             return {
                 'success': True,
@@ -0,0 +1,296 @@
+"""Near-duplicate complaint clustering with MinHash and locality-sensitive hashing
+
+During an outage many citizens report the same incident in nearly the same
+words. IncidentClusterer groups such complaints as they arrive: each
+complaint's word shingles are reduced to a MinHash signature, the signature
+is split into bands, and complaints sharing a band bucket with any open
+incident of the same category and location join it when their estimated
+Jaccard similarity is above the threshold. Every complaint costs a fixed
+number of bucket lookups, so a stream is clustered in linear time.
+
+An incident takes complaints for at most INCIDENT_MAX_SPAN_HOURS after
+its first one. Memory stays bounded: an incident with no new complaint for
+INCIDENT_WINDOW_HOURS is closed and its signatures and buckets are dropped,
+at most INCIDENT_MAX_ACTIVE incidents are open at once, and only the
+INCIDENT_TOP largest closed incidents are kept for reporting.
+"""
+
+import os
+import re
+import heapq
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Estimated Jaccard similarity of word shingles at which a complaint joins an incident
+INCIDENT_THRESHOLD = float(os.environ.get('INCIDENT_THRESHOLD', 0.5))
+# Hours without a new complaint after which an incident is closed
+INCIDENT_WINDOW_HOURS = float(os.environ.get('INCIDENT_WINDOW_HOURS', 48))
+# Hours after its first complaint beyond which an incident takes no new complaints
+INCIDENT_MAX_SPAN_HOURS = float(os.environ.get('INCIDENT_MAX_SPAN_HOURS', 168))
+# Open incidents tracked at once; the least recently updated is closed beyond this
+INCIDENT_MAX_ACTIVE = int(os.environ.get('INCIDENT_MAX_ACTIVE', 50000))
+# Largest incidents reported
+INCIDENT_TOP = int(os.environ.get('INCIDENT_TOP', 20))
+
+# 64 hash functions in 16 bands of 4 rows: pairs above ~0.5 similarity share a bucket with high probability
+NUM_PERM = 64
+BANDS = 16
+# Members of an incident whose signatures are indexed and compared against
+INDEXED_MEMBERS = 4
+# Texts whose signatures are computed together; bounds the temporary hash matrix
+SIGNATURE_CHUNK = 2048
+
+# Largest prime below 2**32, so (a * h + b) with 32-bit a, h and b never overflows uint64
+_PRIME = np.uint64(4294967291)
+_NORMALIZE = re.compile(r'[^a-z0-9]+')
+
+
+def _shingles(text):
+    """32-bit hashes of a text's word bigrams (its words when it has only one)"""
+    words = _NORMALIZE.sub(' ', text.lower()).split()
+    if len(words) < 2:
+        grams = words
+    else:
+        grams = [f"{first} {second}" for first, second in zip(words, words[1:])]
+    # Python's string hash is stable within a process, which is all signatures need
+    return {hash(gram) & 0xFFFFFFFF for gram in grams}
+
+
+def _timestamp(value):
+    """Epoch seconds from epoch seconds or an ISO string (naive times are taken as UTC), or None"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return None if value != value else float(value)
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _isoformat(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec='seconds')
+
+
+class MinHasher:
+    """MinHash signatures for many texts at once, computed with numpy"""
+
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS, seed=7):
+        if num_perm % bands:
+            raise ValueError('num_perm must be a multiple of bands')
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.bands = bands
+        self._a = rng.integers(1, 2 ** 32 - 1, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2 ** 32 - 1, num_perm, dtype=np.uint64)
+        # Mixes each band's rows into one bucket key; distinct per band so bands never share buckets
+        self._band_mix = rng.integers(1, 2 ** 63, (bands, num_perm // bands), dtype=np.uint64) | np.uint64(1)
+
+    def signatures(self, texts):
+        """Signatures, band bucket keys and a has-words mask for texts"""
+        shingle_sets = [_shingles(text) for text in texts]
+        lengths = np.fromiter((len(s) for s in shingle_sets), dtype=np.int64, count=len(texts))
+        signatures = np.zeros((len(texts), self.num_perm), dtype=np.uint64)
+        present = np.flatnonzero(lengths)
+        if len(present):
+            hashes = np.fromiter((h for i in present for h in shingle_sets[i]), dtype=np.uint64,
+                                 count=int(lengths[present].sum()))
+            products = (hashes[:, None] * self._a + self._b) % _PRIME
+            offsets = np.concatenate(([0], np.cumsum(lengths[present])[:-1]))
+            signatures[present] = np.minimum.reduceat(products, offsets, axis=0)
+        rows = signatures.reshape(len(texts), self.bands, -1)
+        # Multiplication wraps around modulo 2**64, which is fine for hashing
+        with np.errstate(over='ignore'):
+            keys = (rows * self._band_mix).sum(axis=2) + np.arange(self.bands, dtype=np.uint64)
+        return signatures, keys, lengths > 0
+
+
+class _Incident:
+    __slots__ = ('id', 'category', 'location', 'description', 'size', 'first_seen', 'last_seen',
+                 'signatures', 'keys')
+
+    def __init__(self, incident_id, category, location, description, when):
+        self.id = incident_id
+        self.category = category
+        self.location = location
+        self.description = description
+        self.size = 0
+        self.first_seen = when
+        self.last_seen = when
+        self.signatures = []
+        self.keys = []
+
+    def summary(self):
+        return {
+            'id': self.id,
+            'category': self.category,
+            'location': self.location,
+            'description': self.description,
+            'size': self.size,
+            'firstSeen': _isoformat(self.first_seen),
+            'lastSeen': _isoformat(self.last_seen),
+            'spanHours': round((self.last_seen - self.first_seen) / 3600, 2)
+        }
+
+
+class IncidentClusterer:
+    """Groups a stream of complaints into incidents of near-duplicates
+
+    Complaints should arrive roughly in time order; the state is bounded by
+    the window and INCIDENT_MAX_ACTIVE, not by the number of complaints.
+    """
+
+    def __init__(self, threshold=INCIDENT_THRESHOLD, window_hours=INCIDENT_WINDOW_HOURS,
+                 max_span_hours=INCIDENT_MAX_SPAN_HOURS, max_active=INCIDENT_MAX_ACTIVE, top=INCIDENT_TOP, hasher=None):
+        self.threshold = threshold
+        self.window_seconds = window_hours * 3600
+        self.max_span_seconds = max_span_hours * 3600
+        self.max_active = max_active
+        self.top = top
+        self.hasher = hasher or MinHasher()
+        # Band bucket key -> ids of the open incidents indexed under it
+        self._buckets = {}
+        # Open incidents, least recently updated first
+        self._active = OrderedDict()
+        # Largest closed incidents as a min-heap of (size, id, summary)
+        self._largest = []
+        self._next_id = 0
+        self._clock = None
+        self.complaints = 0
+        self.incidents = 0
+        self.repeated_incidents = 0
+
+    def add(self, text, when=None, category=None, location=None):
+        """Assign one complaint to an incident and return the incident id"""
+        return self.add_batch([text], [when], [category], [location])[0]
+
+    def add_batch(self, texts, timestamps=None, categories=None, locations=None):
+        """Assign complaints, in arrival order, to incidents; returns their incident ids
+
+        timestamps may be epoch seconds, ISO strings or None (treated as arriving now).
+        """
+        count = len(texts)
+        timestamps = timestamps if timestamps is not None else [None] * count
+        categories = categories if categories is not None else [None] * count
+        locations = locations if locations is not None else [None] * count
+        assigned = []
+        for start in range(0, count, SIGNATURE_CHUNK):
+            chunk = [text if isinstance(text, str) else '' for text in texts[start:start + SIGNATURE_CHUNK]]
+            # Repeated wording is common during outages; hash each distinct text once
+            distinct = {}
+            rows = [distinct.setdefault(' '.join(text.lower().split()), len(distinct)) for text in chunk]
+            signatures, keys, has_words = self.hasher.signatures(list(distinct))
+            key_lists = keys.tolist()
+            for offset, row in enumerate(rows):
+                i = start + offset
+                assigned.append(self._assign(chunk[offset], _timestamp(timestamps[i]), categories[i], locations[i],
+                                             signatures[row], key_lists[row], has_words[row]))
+        return assigned
+
+    def _assign(self, text, when, category, location, signature, keys, has_words):
+        if when is None:
+            when = self._clock if self._clock is not None else datetime.now(timezone.utc).timestamp()
+        self._clock = when if self._clock is None else max(self._clock, when)
+        self._expire(self._clock)
+        self.complaints += 1
+
+        incident = None
+        if has_words:
+            best = self.threshold
+            seen = set()
+            for key in keys:
+                for incident_id in self._buckets.get(key, ()):
+                    if incident_id in seen:
+                        continue
+                    seen.add(incident_id)
+                    candidate = self._active[incident_id]
+                    # The same words about another place or service, or long after, are another incident
+                    if (candidate.category != category or candidate.location != location
+                            or when - candidate.first_seen > self.max_span_seconds):
+                        continue
+                    similarity = max(np.count_nonzero(member == signature)
+                                     for member in candidate.signatures) / len(signature)
+                    if similarity >= best:
+                        best, incident = similarity, candidate
+
+        if incident is None:
+            incident = _Incident(self._next_id, category, location, text, when)
+            self._next_id += 1
+            self.incidents += 1
+        self._active[incident.id] = incident
+        self._active.move_to_end(incident.id)
+
+        incident.size += 1
+        if incident.size == 2:
+            self.repeated_incidents += 1
+        incident.first_seen = min(incident.first_seen, when)
+        incident.last_seen = max(incident.last_seen, when)
+        if has_words and len(incident.signatures) < INDEXED_MEMBERS:
+            incident.signatures.append(signature)
+            for key in keys:
+                bucket = self._buckets.setdefault(key, [])
+                if incident.id not in bucket:
+                    bucket.append(incident.id)
+                    incident.keys.append(key)
+
+        while len(self._active) > self.max_active:
+            self._close(next(iter(self._active.values())))
+        return incident.id
+
+    def _expire(self, now):
+        while self._active:
+            oldest = next(iter(self._active.values()))
+            if now - oldest.last_seen <= self.window_seconds:
+                break
+            self._close(oldest)
+
+    def _close(self, incident):
+        del self._active[incident.id]
+        for key in incident.keys:
+            bucket = self._buckets[key]
+            bucket.remove(incident.id)
+            if not bucket:
+                del self._buckets[key]
+        if incident.size < 2 or not self.top:
+            return
+        entry = (incident.size, incident.id, incident.summary())
+        if len(self._largest) < self.top:
+            heapq.heappush(self._largest, entry)
+        elif entry > self._largest[0]:
+            heapq.heapreplace(self._largest, entry)
+
+    def largest(self):
+        """The largest incidents seen so far, open or closed, biggest first"""
+        open_incidents = heapq.nlargest(self.top, (incident for incident in self._active.values() if incident.size > 1),
+                                        key=lambda incident: (incident.size, incident.id))
+        entries = self._largest + [(incident.size, incident.id, incident.summary()) for incident in open_incidents]
+        return [summary for _, _, summary in heapq.nlargest(self.top, entries)]
+
+    def summary(self):
+        return {
+            'complaints': self.complaints,
+            'incidents': self.incidents,
+            'duplicateComplaints': self.complaints - self.incidents,
+            'repeatedIncidents': self.repeated_incidents,
+            'openIncidents': len(self._active),
+            'largestIncidents': self.largest()
+        }
+
+
+def cluster_complaints(texts, timestamps, categories=None, locations=None, **options):
+    """Cluster a batch of complaints in time order and return the incident summary
+
+    Each call starts from no incidents, so complaints are only grouped with others in the same batch.
+    """
+    clusterer = IncidentClusterer(**options)
+    timestamps = [_timestamp(value) for value in timestamps]
+    order = sorted(range(len(texts)), key=lambda i: timestamps[i] if timestamps[i] is not None else float('inf'))
+    clusterer.add_batch([texts[i] for i in order], [timestamps[i] for i in order],
+                        [categories[i] for i in order] if categories is not None else None,
+                        [locations[i] for i in order] if locations is not None else None)
+    return clusterer.summary()
@@ -0,0 +1,81 @@
+"""Aho-Corasick matching of many phrases in one pass over a text"""
+
+import re
+from collections import deque
+
+_NORMALIZE = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(text):
+    """Lowercase words separated by single spaces, padded so every word is delimited on both sides"""
+    return ' ' + _NORMALIZE.sub(' ', text.lower()).strip() + ' '
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton finding every phrase in a normalized text in one pass
+
+    Transitions are precomputed for the whole alphabet of normalized text, so
+    matching is a single table lookup per character.
+    """
+
+    ALPHABET = ' abcdefghijklmnopqrstuvwxyz0123456789'
+
+    def __init__(self, phrases):
+        """phrases maps each phrase (a trailing '*' marks a stem) to the value reported when it matches"""
+        goto = [{}]
+        outputs = [[]]
+        for phrase, value in phrases.items():
+            stem = phrase.endswith('*')
+            pattern = normalize(phrase.rstrip('*'))
+            if stem:
+                pattern = pattern.rstrip(' ')
+            state = 0
+            for char in pattern:
+                if char not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            outputs[state].append(value)
+
+        # Breadth-first: fill in failure transitions and merge outputs of suffix states
+        delta = [dict.fromkeys(self.ALPHABET, 0) for _ in goto]
+        delta[0].update(goto[0])
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            delta[state] = dict(delta[fail[state]])
+            for char, target in goto[state].items():
+                fail[target] = delta[fail[state]][char]
+                delta[state][char] = target
+                queue.append(target)
+
+        self._delta = delta
+        self._outputs = [tuple(values) for values in outputs]
+        self.states = len(goto)
+
+    def find(self, normalized):
+        """Values of every phrase occurring in text produced by normalize()"""
+        delta = self._delta
+        outputs = self._outputs
+        state = 0
+        found = []
+        for char in normalized:
+            state = delta[state][char]
+            if outputs[state]:
+                found.extend(outputs[state])
+        return found
+
+    def find_ends(self, normalized):
+        """(index of the last character, value) of every phrase occurring in text produced by normalize()"""
+        delta = self._delta
+        outputs = self._outputs
+        state = 0
+        found = []
+        for end, char in enumerate(normalized):
+            state = delta[state][char]
+            if outputs[state]:
+                found.extend((end, value) for value in outputs[state])
+        return found
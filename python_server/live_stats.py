@@ -0,0 +1,270 @@
+"""Live complaint rates and resolution-time quantiles over sliding time windows
+
+ComplaintStream takes complaint events as they arrive. Per category and
+area it keeps complaint counts in a ring of one-minute slots covering 24
+hours, and resolution times in a ring of hourly quantile sketches with
+DDSketch's logarithmic bins, so p50/p90/p99 are within LIVE_STATS_ACCURACY
+of the true values. Every array has a fixed size set by the categories,
+areas and slots, so memory does not grow with the number of events, and a
+query only sums a few thousand counters.
+
+The arrays live in anonymous shared memory: streams created before
+serve.py forks its workers are updated and read by all of them.
+"""
+
+import os
+import math
+import mmap
+import time
+import multiprocessing
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from areas import get_gazetteer
+from metrics import complaint_events
+
+# Relative accuracy of the resolution-time quantiles
+LIVE_STATS_ACCURACY = float(os.environ.get('LIVE_STATS_ACCURACY', 0.01))
+# Resolution times are tracked between a minute and this many hours; longer ones count as this
+LIVE_STATS_MAX_HOURS = float(os.environ.get('LIVE_STATS_MAX_HOURS', 720))
+# Largest number of events accepted in one request
+LIVE_STATS_MAX_BATCH = int(os.environ.get('LIVE_STATS_MAX_BATCH', 10000))
+# Seconds an event may be dated ahead of the server clock; later events are dropped
+LIVE_STATS_MAX_SKEW = float(os.environ.get('LIVE_STATS_MAX_SKEW', 300))
+# Time zone of event times sent without an offset (PCMC clients send local time)
+LIVE_STATS_TIMEZONE = os.environ.get('LIVE_STATS_TIMEZONE', 'Asia/Kolkata')
+
+# Reported windows, in seconds
+WINDOWS = {'15m': 15 * 60, '1h': 3600, '24h': 24 * 3600}
+COUNT_SLOT_SECONDS = 60
+RESOLUTION_SLOT_SECONDS = 3600
+# Window of the recent resolution-time quantiles; all-time quantiles are kept as well
+RESOLUTION_WINDOW = '24h'
+QUANTILES = {'p50': 0.5, 'p90': 0.9, 'p99': 0.99}
+
+CATEGORIES = ('water', 'energy')
+OTHER_CATEGORY = 'other'
+UNKNOWN_AREA = 'unknown'
+
+# pandas 2 needs to be told that timestamps may differ in precision and offset; pandas 1 infers it
+_ISO_FORMAT = {'format': 'ISO8601'} if int(pd.__version__.split('.')[0]) >= 2 else {}
+
+
+def _shared_array(shape, dtype):
+    """Zeroed array in an anonymous shared mapping, shared with processes forked after it is created"""
+    dtype = np.dtype(dtype)
+    count = int(np.prod(shape))
+    buffer = mmap.mmap(-1, max(count * dtype.itemsize, 1))
+    return np.frombuffer(buffer, dtype=dtype, count=count).reshape(shape)
+
+
+def _has_utc_offset(value):
+    """Whether an ISO time string ends in Z or a +hh:mm offset (plain string checks, faster than a regex)"""
+    if not isinstance(value, str):
+        return False
+    tail = value.rstrip()[-6:]
+    return tail[-1:] in ('Z', 'z') or (':' in value and ('+' in tail or '-' in tail))
+
+
+def _epoch_seconds(values, timezone_name=LIVE_STATS_TIMEZONE):
+    """Epoch seconds from ISO strings (times without an offset are in timezone_name), NaN where missing or
+    unparseable"""
+    values = pd.Series(values, dtype=object).reset_index(drop=True)
+    aware = np.array([_has_utc_offset(value) for value in values.tolist()], dtype=bool)
+    dates = pd.to_datetime(values if aware.all() else values.where(aware), utc=True, errors='coerce', **_ISO_FORMAT)
+    if not aware.all():
+        local = pd.to_datetime(values.where(~aware), errors='coerce', **_ISO_FORMAT)
+        local = local.dt.tz_localize(timezone_name, ambiguous='NaT', nonexistent='NaT').dt.tz_convert('UTC')
+        dates = dates.where(aware, local)
+    return ((dates - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(seconds=1)).to_numpy(dtype=float)
+
+
+class LogMapping:
+    """DDSketch's logarithmic bins: every value in a bin is within the relative accuracy of the bin's value"""
+
+    def __init__(self, relative_accuracy, min_value, max_value):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.offset = math.ceil(math.log(min_value) / self._log_gamma)
+        self.bins = math.ceil(math.log(max_value) / self._log_gamma) - self.offset + 1
+
+    def index(self, values):
+        """Bin of each value; values outside the range go to the first or last bin"""
+        logs = np.log(np.maximum(values, self.min_value)) / self._log_gamma
+        return np.clip(np.ceil(logs) - self.offset, 0, self.bins - 1).astype(np.int64)
+
+    def quantiles(self, counts, quantiles):
+        """Quantiles of the bin counts along the last axis, NaN where there are no values"""
+        cumulative = np.cumsum(counts, axis=-1)
+        totals = cumulative[..., -1:]
+        ranks = np.floor(np.asarray(quantiles) * (totals - 1))
+        # The quantile's bin is the first whose cumulative count passes its rank
+        indices = (cumulative[..., None, :] <= ranks[..., :, None]).sum(axis=-1)
+        values = 2 * self.gamma ** (indices + self.offset) / (self.gamma + 1)
+        return np.where(totals > 0, values, np.nan)
+
+
+class RingWindow:
+    """Totals per time slot for the most recent `slots` slots, in a fixed ring"""
+
+    def __init__(self, slot_seconds, slots, shape, dtype=np.int64):
+        self.slot_seconds = slot_seconds
+        self.slots = slots
+        self.data = _shared_array((slots, *shape), dtype)
+        # Absolute number of the newest slot, -1 before the first event
+        self._head = _shared_array((1,), np.int64)
+        self._head[0] = -1
+
+    def advance(self, slot):
+        """Move the newest slot forward to `slot`, clearing the slots that roll over"""
+        head = int(self._head[0])
+        if slot <= head:
+            return
+        if head < 0 or slot - head >= self.slots:
+            self.data[:] = 0
+        else:
+            self.data[np.arange(head + 1, slot + 1) % self.slots] = 0
+        self._head[0] = slot
+
+    def add(self, times, index):
+        """Count one for each epoch-second time at the given trailing indices; returns how many were too old"""
+        slots = (np.asarray(times) // self.slot_seconds).astype(np.int64)
+        if not len(slots):
+            return 0
+        self.advance(int(slots.max()))
+        keep = slots > self._head[0] - self.slots
+        np.add.at(self.data, (slots[keep] % self.slots, *(np.asarray(i)[keep] for i in index)), 1)
+        return int(len(slots) - keep.sum())
+
+    def total(self, seconds, now):
+        """Sum over the slots of the last `seconds` up to now (or the newest event, if later)"""
+        self.advance(int(now // self.slot_seconds))
+        count = min(self.slots, max(1, math.ceil(seconds / self.slot_seconds)))
+        head = int(self._head[0])
+        return self.data[np.arange(head - count + 1, head + 1) % self.slots].sum(axis=0)
+
+
+class ComplaintStream:
+    """Sliding-window complaint counts and resolution-time quantiles for one city's areas"""
+
+    def __init__(self, areas, city_names=(), accuracy=LIVE_STATS_ACCURACY, max_hours=LIVE_STATS_MAX_HOURS):
+        self.gazetteer = get_gazetteer(areas, city_names)
+        self.categories = list(CATEGORIES) + [OTHER_CATEGORY]
+        self.areas = [area['name'] for area in areas] + [UNKNOWN_AREA]
+        self._category_index = {category: i for i, category in enumerate(self.categories)}
+        self._area_index = {area: i for i, area in enumerate(self.areas)}
+        shape = (len(self.categories), len(self.areas))
+
+        self.mapping = LogMapping(accuracy, 1 / 60, max_hours)
+        self.counts = RingWindow(COUNT_SLOT_SECONDS, WINDOWS['24h'] // COUNT_SLOT_SECONDS, shape)
+        self.resolutions = RingWindow(RESOLUTION_SLOT_SECONDS, WINDOWS[RESOLUTION_WINDOW] // RESOLUTION_SLOT_SECONDS,
+                                      shape + (self.mapping.bins,), np.int32)
+        self.all_resolutions = _shared_array(shape + (self.mapping.bins,), np.int64)
+        # Created, resolved and dropped events
+        self._events = _shared_array((3,), np.int64)
+        self._lock = multiprocessing.Lock()
+
+    @property
+    def memory_bytes(self):
+        return (self.counts.data.nbytes + self.resolutions.data.nbytes + self.all_resolutions.nbytes
+                + self._events.nbytes)
+
+    def add_events(self, events, now=None):
+        """Take a batch of complaint events; returns how many were counted as created, resolved or dropped
+
+        An event is `created` (counted at its `date`, or now) or `resolved` (its resolution time,
+        `resolutionHours` or `resolved_date` minus `date`, taken at `resolved_date`, or now). Without a
+        `type`, events with a `resolved_date` are resolutions. Created events older than the windows and events
+        dated more than LIVE_STATS_MAX_SKEW seconds ahead of now are dropped, so a skewed client clock cannot
+        push the windows forward.
+        """
+        now = time.time() if now is None else now
+        df = pd.DataFrame(events)
+        count = len(df)
+        if not count:
+            return {'created': 0, 'resolved': 0, 'dropped': 0}
+
+        def column(name):
+            return df[name] if name in df.columns else pd.Series([None] * count, dtype=object)
+
+        categories = (column('category').astype(str).str.lower().map(self._category_index)
+                      .fillna(self._category_index[OTHER_CATEGORY]).to_numpy(dtype=np.int64))
+        areas, _ = self.gazetteer.tag(column('description'), column('location'))
+        areas = (pd.Series(areas, dtype=object).map(self._area_index)
+                 .fillna(self._area_index[UNKNOWN_AREA]).to_numpy(dtype=np.int64))
+        created_at = _epoch_seconds(column('date'))
+        resolved_at = _epoch_seconds(column('resolved_date'))
+        kinds = column('type').fillna(pd.Series(np.where(np.isnan(resolved_at), 'created', 'resolved'))).to_numpy()
+
+        hours = pd.to_numeric(column('resolutionHours'), errors='coerce').to_numpy(dtype=float)
+        hours = np.where(np.isnan(hours), (resolved_at - created_at) / 3600, hours)
+        created_at = np.where(np.isnan(created_at), now, created_at)
+        resolved_at = np.where(np.isnan(resolved_at), now, resolved_at)
+        latest = now + LIVE_STATS_MAX_SKEW
+        created = (kinds == 'created') & (created_at <= latest)
+        resolved = (kinds == 'resolved') & (hours >= 0) & (resolved_at <= latest)
+        bins = self.mapping.index(np.nan_to_num(hours))
+
+        with self._lock:
+            too_old = self.counts.add(created_at[created], (categories[created], areas[created]))
+            # Resolutions older than the recent window still count towards the all-time quantiles
+            self.resolutions.add(resolved_at[resolved], (categories[resolved], areas[resolved], bins[resolved]))
+            np.add.at(self.all_resolutions, (categories[resolved], areas[resolved], bins[resolved]), 1)
+            result = {'created': int(created.sum()) - too_old, 'resolved': int(resolved.sum())}
+            result['dropped'] = count - result['created'] - result['resolved']
+            self._events += (result['created'], result['resolved'], result['dropped'])
+
+        for name, value in result.items():
+            if value:
+                complaint_events.inc(name, amount=value)
+        return result
+
+    def _quantiles(self, counts):
+        values = self.mapping.quantiles(counts, list(QUANTILES.values()))
+        return counts.sum(axis=-1), np.round(values, 2)
+
+    def _quantile_view(self, counts):
+        by_category_counts, by_category = self._quantiles(counts.sum(axis=1))
+        by_area_counts, by_area = self._quantiles(counts)
+
+        def entry(total, values):
+            return {'count': int(total), **{name: float(value) for name, value in zip(QUANTILES, values)}}
+
+        return {
+            'byCategory': {category: entry(by_category_counts[c], by_category[c])
+                           for c, category in enumerate(self.categories) if by_category_counts[c]},
+            'byArea': {area: {category: entry(by_area_counts[c, a], by_area[c, a])
+                              for c, category in enumerate(self.categories) if by_area_counts[c, a]}
+                       for a, area in enumerate(self.areas) if by_area_counts[:, a].any()}
+        }
+
+    def snapshot(self, now=None):
+        """Complaint counts per window and resolution-time quantiles, by category and by area"""
+        now = time.time() if now is None else now
+        with self._lock:
+            windows = {name: self.counts.total(seconds, now) for name, seconds in WINDOWS.items()}
+            recent = self.resolutions.total(WINDOWS[RESOLUTION_WINDOW], now)
+            overall = self.all_resolutions.copy()
+            created, resolved, dropped = self._events.tolist()
+
+        counts = {}
+        for name, totals in windows.items():
+            counts[name] = {
+                'total': int(totals.sum()),
+                'perHour': round(float(totals.sum()) * 3600 / WINDOWS[name], 2),
+                'byCategory': {category: int(totals[c].sum())
+                               for c, category in enumerate(self.categories) if totals[c].any()},
+                'byArea': {area: {category: int(totals[c, a]) for c, category in enumerate(self.categories) if totals[c, a]}
+                           for a, area in enumerate(self.areas) if totals[:, a].any()}
+            }
+        return {
+            'generatedAt': datetime.fromtimestamp(now, timezone.utc).isoformat(timespec='seconds'),
+            'windows': counts,
+            'resolutionHours': {RESOLUTION_WINDOW: self._quantile_view(recent), 'all': self._quantile_view(overall)},
+            'events': {'created': created, 'resolved': resolved, 'dropped': dropped},
+            'memoryBytes': self.memory_bytes
+        }
+
@@ -0,0 +1,147 @@
+
+"""Local stand-in for the Gemini generateContent REST API
+
+Implements POST /v1beta/models/<model>:generateContent and
+:streamGenerateContent (SSE with ?alt=sse, otherwise a streamed JSON array)
+with configurable latency, streaming pace and error rate.
+
+    python -m loadtest.fake_gemini --port 8090 --latency 0.8 --error-rate 0.02
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+class FakeGeminiConfig:
+    def __init__(self, latency=0.5, jitter=0.2, error_rate=0.0, rate_limit_rate=0.0,
+                 chunk_count=4, chunk_delay=0.05, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.chunk_count = chunk_count
+        self.chunk_delay = chunk_delay
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def _reply_text(body):
+    contents = body.get('contents') or [{}]
+    parts = contents[-1].get('parts') or [{}]
+    question = parts[0].get('text', '')[:200]
+    return (f"Thanks for asking about \"{question}\". Pimpri Chinchwad is supplied from Pavana dam and "
+            f"treated at the Nigdi plant. You can file complaints from the Complaints page.")
+
+
+def _candidate(text, finish=True):
+    candidate = {'content': {'role': 'model', 'parts': [{'text': text}]}, 'index': 0}
+    if finish:
+        candidate['finishReason'] = 'STOP'
+    return {'candidates': [candidate]}
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        config = self.config
+        path = urlparse(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._send_json(400, {'error': {'code': 400, 'message': 'Invalid JSON'}})
+
+        if ':generateContent' not in path.path and ':streamGenerateContent' not in path.path:
+            return self._send_json(404, {'error': {'code': 404, 'message': 'Not found'}})
+
+        with config.lock:
+            config.requests += 1
+            roll = config.random.random()
+            delay = max(0.0, config.latency + config.random.uniform(-config.jitter, config.jitter))
+
+        if roll < config.rate_limit_rate:
+            return self._send_json(429, {'error': {'code': 429, 'message': 'Resource has been exhausted'}})
+        time.sleep(delay)
+        if roll < config.rate_limit_rate + config.error_rate:
+            return self._send_json(500, {'error': {'code': 500, 'message': 'Internal error'}})
+
+        text = _reply_text(body)
+        if ':generateContent' in path.path:
+            return self._send_json(200, _candidate(text))
+
+        # Streaming: split the reply into chunks sent config.chunk_delay apart
+        words = text.split(' ')
+        size = max(1, len(words) // config.chunk_count)
+        chunks = [' '.join(words[i:i + size]) + ' ' for i in range(0, len(words), size)]
+        sse = parse_qs(path.query).get('alt') == ['sse']
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream' if sse else 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i, chunk in enumerate(chunks):
+            payload = json.dumps(_candidate(chunk, finish=i == len(chunks) - 1))
+            if sse:
+                data = f"data: {payload}\r\n\r\n"
+            else:
+                data = ('[' if i == 0 else ',') + payload + (']' if i == len(chunks) - 1 else '')
+            encoded = data.encode('utf-8')
+            self.wfile.write(f"{len(encoded):x}\r\n".encode('ascii') + encoded + b"\r\n")
+            self.wfile.flush()
+            if i < len(chunks) - 1:
+                time.sleep(config.chunk_delay)
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def start_fake_gemini(config, host='127.0.0.1', port=0):
+    """Start the stand-in in a background thread; returns (server, base_url)"""
+    handler = type('ConfiguredFakeGeminiHandler', (FakeGeminiHandler,), {'config': config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fake Gemini generateContent API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', type=float, default=0.5, help='mean response latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.2, help='uniform +/- latency jitter in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests failing with 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='share of requests failing with 429')
+    parser.add_argument('--chunks', type=int, default=4, help='chunks per streamed reply')
+    parser.add_argument('--chunk-delay', type=float, default=0.05, help='seconds between streamed chunks')
+    args = parser.parse_args(argv)
+
+    config = FakeGeminiConfig(args.latency, args.jitter, args.error_rate, args.rate_limit_rate,
+                              args.chunks, args.chunk_delay)
+    server, url = start_fake_gemini(config, args.host, args.port)
+    print(f"Fake Gemini API listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+
+"""Offline load test for python_server
+
+Starts a fake Gemini API and a static server for the benchmark fixtures,
+launches the app pointed at both, then drives mixed traffic across all four
+endpoints at a target request rate.
+
+    python -m loadtest.run --rps 50 --duration 60
+    python -m loadtest.run --server serve --mode async --workers 4 --rps 200 --gemini-latency 1.5
+    python -m loadtest.run --mix chatbot=1,generate_charts=3 --output report.json
+
+Run from the python_server directory. No network access is needed.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.fixtures import FIXTURE_DIR, serve_fixtures, write_fixtures
+from benchmarks.synthetic import generate_complaints
+from loadtest.fake_gemini import FakeGeminiConfig, start_fake_gemini
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = {'chatbot': 4, 'generate_analytics': 2, 'generate_charts': 2, 'fetch_resource_data': 2}
+
+QUESTIONS = [
+    'Where does our water come from?',
+    'How do I file a complaint about low water pressure?',
+    'Why does power demand peak in summer?',
+    'How can I track my complaint status?',
+    'What is the water supply schedule in Nigdi?',
+    'Who distributes electricity in Pimpri Chinchwad?',
+    'How do I report a sparking transformer?',
+    'Is tap water safe to drink during monsoon?',
+]
+
+
+class TrafficMix:
+    """Builds request payloads for each endpoint"""
+
+    def __init__(self, weights, seed=7):
+        self.endpoints = list(weights)
+        self.weights = [weights[name] for name in self.endpoints]
+        self.random = random.Random(seed)
+        self.complaint_pool = generate_complaints(5000, seed=seed)
+
+    def next_request(self):
+        endpoint = self.random.choices(self.endpoints, self.weights)[0]
+        return endpoint, getattr(self, f"_{endpoint}")()
+
+    def _chatbot(self):
+        # Mostly repeated questions (answer cache hits) plus unique follow-ups
+        if self.random.random() < 0.7:
+            return {'message': self.random.choice(QUESTIONS), 'chatHistory': []}
+        history = [{'role': 'user', 'content': self.random.choice(QUESTIONS)},
+                   {'role': 'model', 'content': 'It is supplied from Pavana dam.'}]
+        return {'message': f"Follow-up {self.random.randint(0, 10 ** 6)}: what about Wakad?",
+                'chatHistory': history, 'conversationId': f"conv-{self.random.randint(0, 500)}"}
+
+    def _generate_analytics(self):
+        size = self.random.choice([50, 200, 1000])
+        start = self.random.randint(0, len(self.complaint_pool) - size)
+        return {'complaints': self.complaint_pool[start:start + size],
+                'userRole': self.random.choice(['admin', 'water-admin', 'energy-admin', 'citizen'])}
+
+    def _generate_charts(self):
+        chart_type = self.random.choice(['bar', 'line', 'pie', 'scatter'])
+        data = [{'year': str(2018 + i), 'total': 700 + i * 20, 'domestic': 500 + i * 15,
+                 'name': f"S{i}", 'value': 10 + i} for i in range(7)]
+        params = {'value': 'value', 'label': 'name'} if chart_type == 'pie' else {
+            'x': 'domestic' if chart_type == 'scatter' else 'year', 'y': 'total'}
+        return {'chartType': chart_type, 'dataSource': data, 'params': params}
+
+    def _fetch_resource_data(self):
+        return {'resourceType': self.random.choice(['water', 'energy'])}
+
+
+class Recorder:
+    """Collects per-endpoint latencies and outcomes"""
+
+    def __init__(self):
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, latency, status):
+        with self.lock:
+            self.samples.setdefault(endpoint, []).append((latency, status))
+
+    def report(self, elapsed):
+        def percentile(values, q):
+            return values[min(len(values) - 1, int(round(q * (len(values) - 1))))] if values else None
+
+        endpoints = {}
+        everything = []
+        for endpoint, samples in sorted(self.samples.items()):
+            latencies = sorted(latency for latency, _ in samples)
+            errors = sum(1 for _, status in samples if status is None or status >= 500)
+            rejected = sum(1 for _, status in samples if status == 503)
+            everything.extend(samples)
+            endpoints[endpoint] = {
+                'requests': len(samples),
+                'throughputRps': round(len(samples) / elapsed, 2),
+                'errorRate': round(errors / len(samples), 4),
+                'rejected503': rejected,
+                'p50Ms': round(percentile(latencies, 0.50) * 1000, 1),
+                'p90Ms': round(percentile(latencies, 0.90) * 1000, 1),
+                'p99Ms': round(percentile(latencies, 0.99) * 1000, 1),
+                'maxMs': round(latencies[-1] * 1000, 1)
+            }
+        errors = sum(1 for _, status in everything if status is None or status >= 500)
+        latencies = sorted(latency for latency, _ in everything)
+        return {
+            'durationSeconds': round(elapsed, 2),
+            'requests': len(everything),
+            'throughputRps': round(len(everything) / elapsed, 2) if elapsed else 0,
+            'errorRate': round(errors / len(everything), 4) if everything else 0,
+            'p50Ms': round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+            'p99Ms': round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+            'endpoints': endpoints
+        }
+
+
+def launch_app(args, gemini_url, mirror, cache_dir):
+    env = dict(os.environ)
+    env.update({
+        'GEMINI_API_KEY': 'loadtest',
+        'GEMINI_API_ENDPOINT': gemini_url,
+        'PCMC_SOURCE_MIRROR': mirror,
+        'PCMC_CACHE_DIR': cache_dir,
+        'PORT': str(args.port)
+    })
+    env.pop('CHAT_MODEL', None)
+
+    if args.server == 'serve':
+        command = [sys.executable, 'serve.py', '--mode', args.mode, '--workers', str(args.workers),
+                   '--host', '127.0.0.1', '--port', str(args.port)]
+    elif args.mode == 'async':
+        command = [sys.executable, 'async_server.py']
+    else:
+        command = [sys.executable, '-c', f"from app import app; app.run(host='127.0.0.1', port={args.port}, threaded=True)"]
+
+    log = open(os.path.join(cache_dir, 'server.log'), 'w')
+    process = subprocess.Popen(command, cwd=SERVER_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup, see {log.name}")
+        try:
+            requests.post(f"{base_url}/fetch_resource_data", json={'resourceType': 'water'}, timeout=10)
+            return process, base_url
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError('Server did not start in time')
+
+
+def drive(base_url, mix, recorder, rps, duration, concurrency, timeout):
+    """Open-loop load: requests are scheduled at a fixed rate regardless of response times"""
+    local = threading.local()
+
+    def send(endpoint, payload, scheduled):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        try:
+            response = session.post(f"{base_url}/{endpoint}", json=payload, timeout=timeout)
+            status = response.status_code
+        except requests.RequestException:
+            status = None
+        # Latency counts from the scheduled send time, so queueing in the client is not hidden
+        recorder.record(endpoint, time.perf_counter() - scheduled, status)
+
+    interval = 1.0 / rps
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        sent = 0
+        while True:
+            scheduled = started + sent * interval
+            if scheduled - started >= duration:
+                break
+            now = time.perf_counter()
+            if scheduled > now:
+                time.sleep(scheduled - now)
+            endpoint, payload = mix.next_request()
+            pool.submit(send, endpoint, payload, scheduled)
+            sent += 1
+    return time.perf_counter() - started
+
+
+def parse_mix(text):
+    if not text:
+        return dict(DEFAULT_MIX)
+    weights = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint in mix: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rps', type=float, default=20, help='target requests per second')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load after warmup')
+    parser.add_argument('--warmup', type=float, default=5, help='seconds of load before measuring')
+    parser.add_argument('--concurrency', type=int, default=256, help='maximum in-flight client requests')
+    parser.add_argument('--timeout', type=float, default=30, help='client request timeout')
+    parser.add_argument('--mix', type=parse_mix, default=None, help='endpoint weights, e.g. chatbot=4,generate_charts=1')
+    parser.add_argument('--server', choices=['dev', 'serve'], default='dev',
+                        help='dev: single process (app.py or async_server.py); serve: serve.py workers')
+    parser.add_argument('--mode', choices=['sync', 'async'], default='sync')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--startup-timeout', type=float, default=120)
+    parser.add_argument('--gemini-latency', type=float, default=0.5)
+    parser.add_argument('--gemini-jitter', type=float, default=0.2)
+    parser.add_argument('--gemini-error-rate', type=float, default=0.0)
+    parser.add_argument('--gemini-rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--output', help='write the JSON report here')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(os.path.join(FIXTURE_DIR, 'water_conservation.html')):
+        write_fixtures()
+
+    config = FakeGeminiConfig(args.gemini_latency, args.gemini_jitter, args.gemini_error_rate,
+                              args.gemini_rate_limit_rate, seed=1)
+    gemini_server, gemini_url = start_fake_gemini(config)
+    cache_dir = tempfile.mkdtemp(prefix='pcmc-loadtest-')
+    mix = TrafficMix(args.mix or dict(DEFAULT_MIX))
+
+    try:
+        with serve_fixtures() as mirror:
+            process, base_url = launch_app(args, gemini_url, mirror, cache_dir)
+            try:
+                if args.warmup:
+                    print(f"Warming up for {args.warmup}s", file=sys.stderr)
+                    drive(base_url, mix, Recorder(), args.rps, args.warmup, args.concurrency, args.timeout)
+                print(f"Driving {args.rps} rps for {args.duration}s", file=sys.stderr)
+                recorder = Recorder()
+                elapsed = drive(base_url, mix, recorder, args.rps, args.duration, args.concurrency, args.timeout)
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        gemini_server.shutdown()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    report = recorder.report(elapsed)
+    report['config'] = {'targetRps': args.rps, 'server': args.server, 'mode': args.mode,
+                        'workers': args.workers if args.server == 'serve' else 1,
+                        'geminiLatency': args.gemini_latency, 'geminiErrorRate': args.gemini_error_rate,
+                        'geminiRequests': config.requests}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
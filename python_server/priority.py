@@ -0,0 +1,290 @@
+"""Batch complaint priority scoring with a keyword automaton fast path
+
+Mirrors the rules of the ai-priority edge function, but matches every
+phrase in one pass over each complaint through a precompiled Aho-Corasick
+automaton, so thousands of complaints are scored per second. Only
+complaints the rules cannot decide are sent to the LLM, many per call.
+"""
+
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from keyword_automaton import KeywordAutomaton, normalize
+from metrics import priority_decisions, time_stage
+
+# Ambiguous complaints sent to the LLM per call
+PRIORITY_LLM_BATCH_SIZE = int(os.environ.get('PRIORITY_LLM_BATCH_SIZE', 25))
+# LLM calls in flight at once for one request
+PRIORITY_LLM_CONCURRENCY = int(os.environ.get('PRIORITY_LLM_CONCURRENCY', 4))
+# Largest number of complaints accepted in one request
+PRIORITY_MAX_BATCH = int(os.environ.get('PRIORITY_MAX_BATCH', 10000))
+
+PRIORITIES = ('high', 'medium', 'low')
+
+# Phrases by signal, from the wording of sample_complaints/ and the ai-priority edge function.
+# A trailing '*' matches any word starting with the stem. Each entry is
+# (signal, severity weight, category the phrases apply to or None for any, phrases).
+PRIORITY_SIGNALS = [
+    # Emergencies decide high priority on their own
+    ('emergency', 0, 'water', [
+        'burst main', 'burst water main', 'burst pipe*', 'burst pipeline', 'pipe burst', 'pipeline burst',
+        'flood*', 'no water', 'no water supply', 'without water', 'contaminat*', 'sewage', 'sewer overflow',
+        'sewer backup', 'sewer leak', 'brown water', 'brownish', 'dirty water', 'muddy water', 'yellow water',
+        'discolored', 'discoloured', 'foul smell', 'foul odor', 'foul odour', 'bad smell', 'strong smell',
+        'major leak', 'major water leak', 'major pipeline leak', 'unsafe for consumption', 'falling sick',
+        'falling ill', 'illness',
+    ]),
+    ('emergency', 0, 'energy', [
+        'live wire*', 'exposed wire*', 'hanging wire*', 'wires are hanging', 'wire fallen', 'fallen wire*',
+        'broken wire*', 'power line down', 'electric shock', 'electrical shock', 'electric fire', 'electrical fire',
+        'electrical hazard', 'transformer fire', 'transformer burning', 'transformer smoke', 'spark*',
+        'complete outage', 'complete power outage', 'total outage', 'total power outage', 'no electricity',
+        'no power', 'fire risk', 'fire hazard', 'burning', 'burnt', 'smoke', 'smoking', 'leaning dangerously',
+        'pole fallen', 'fallen pole',
+    ]),
+    # Severity signals; each signal counts once, three points make a complaint high priority
+    ('urgency', 2, None, ['urgent*', 'emergency', 'immediate*', 'asap', 'critical']),
+    ('danger', 2, None, ['danger*', 'hazard*', 'risk', 'risky', 'safety', 'unsafe', 'life threatening']),
+    ('vulnerable', 1, None, ['child', 'children', 'kids', 'elderly', 'infant*', 'hospital', 'school',
+                             'senior citizen*', 'pregnant']),
+    ('scale', 1, None, ['entire', 'multiple', 'many', 'everyone', 'whole', 'all residents', 'all houses',
+                        'several', 'whole area', 'whole society']),
+    ('damage', 1, None, ['damage*', 'destroy*']),
+    # Service problems without danger: medium priority
+    ('service', 0, None, [
+        'low pressure', 'low water pressure', 'pressure dropping', 'intermittent', 'fluctuat*', 'voltage',
+        'power cut*', 'frequent', 'meter', 'incorrect reading*', 'bill', 'overcharg*', 'pending',
+        'minor leak*', 'leakage', 'occasionally', 'not completed', 'delay*', 'tripping', 'outage', 'water logging', 'waterlogging',
+    ]),
+    # Requests for information and feedback: low priority
+    ('routine', 0, None, [
+        'information', 'schedule', 'clarification', 'request for', 'feedback', 'question', 'how to',
+        'apply for', 'website', 'online payment', 'guidelines', 'suggest*', 'inquiry', 'enquiry',
+        'not urgent', 'want to understand', 'want to know', 'when will', 'report for', 'rates', 'tariff',
+        'methodology',
+    ]),
+]
+
+TRIVIAL_MESSAGES = {'hello', 'hi', 'test', 'hey', 'abc', 'xyz'}
+# Upper-case names that are not emphasis
+ACRONYMS = {'PCMC', 'PCNTDA', 'MSEDCL', 'MIDC', 'MPCB', 'CEPI', 'TERI'}
+# Score at which severity signals alone make a complaint high priority
+HIGH_SEVERITY = 3
+# Complaint fields that must be text when present
+TEXT_FIELDS = ('description', 'complaintText', 'text', 'attachmentContent', 'category', 'source')
+
+# Signals whose phrases do not count when negated ('not urgent', 'no burst pipe', 'no water pressure issue')
+NEGATED_SIGNALS = {'emergency', 'urgency'}
+# Words that negate a phrase up to NEGATION_WINDOW words after them in the same clause
+NEGATORS = {'no', 'not', 'non', 'never', 'without', 'nothing', 'neither', 'nor', 'isn', 'wasn', 'aren', 'don',
+            'doesn', 'didn'}
+NEGATION_WINDOW = 3
+# Words a negation does not reach across ('no water and sewage overflow' still reports sewage)
+NEGATION_STOPS = {'and', 'but', 'or', 'so', 'also', 'then', 'because', 'yet', 'while'}
+# A phrase that starts with a negator ('no water') is itself negated when one of these follows it
+NEGATED_BY_FOLLOWING = {'issue', 'issues', 'problem', 'problems', 'complaint', 'complaints'}
+
+_DURATION = re.compile(r'\b(?:since|for)\s+(?:the\s+)?(?:past\s+|last\s+|over\s+)?\d+\+?\s*(?:hour|day|week)', re.I)
+_CAPITALIZED = re.compile(r'\b[A-Z]{4,}\b')
+_NON_WORD = re.compile(r'[^a-z0-9.,;:!?\n]+')
+_CLAUSE = re.compile(r' ?[.,;:!?\n][ .,;:!?\n]*')
+_PADDED_NEGATORS = tuple(f" {word} " for word in NEGATORS)
+_REPLY_LINE = re.compile(r'(\d+)\s*[:.)\-]\s*\**\s*(high|medium|low)\b', re.I)
+
+PRIORITY_SYSTEM_PROMPT = """You are an AI assistant for the PCMC (Pimpri Chinchwad Municipal Corporation) Smart City initiative.
+You will receive numbered water and energy complaints. Decide the priority of each one:
+- high: immediate risk to public safety, health or critical infrastructure (0-24 hours)
+- medium: significant inconvenience but no immediate danger (1-3 days)
+- low: minor issues, information requests and general feedback (3+ days)
+Answer with one line per complaint in the form "<number>: <high|medium|low>" and nothing else."""
+
+
+def complaint_text(complaint):
+    """Complaint text as the edge function reads it, falling back to attachment content"""
+    text = complaint.get('description') or complaint.get('complaintText') or complaint.get('text') or ''
+    if not text.strip() and complaint.get('attachmentContent'):
+        text = f"Extracted from {complaint.get('source', 'attachment')}: {complaint['attachmentContent']}"
+    return text
+
+
+class PriorityScorer:
+    """Rule-based priority with the edge function's thresholds; returns no priority for ambiguous complaints"""
+
+    def __init__(self, signals=PRIORITY_SIGNALS):
+        phrases = {}
+        for signal, weight, category, signal_phrases in signals:
+            for phrase in signal_phrases:
+                # Length of the text the automaton matches, so a match's start can be found from its end
+                length = len(normalize(phrase.rstrip('*'))) - (1 if phrase.endswith('*') else 0)
+                # A phrase may belong to several signals
+                phrases.setdefault(phrase, []).append((signal, weight, category, phrase.rstrip('*'), length))
+        self.automaton = KeywordAutomaton({phrase: tuple(values) for phrase, values in phrases.items()})
+
+    @staticmethod
+    def _negated(normalized, start, end, spans):
+        """Whether a matched phrase is negated: a negator in the NEGATION_WINDOW words before it in its
+        clause (and not part of another emergency or urgency phrase, like the 'no' of 'no water'), or, for a
+        phrase that starts with a negator, an issue word right after it ('no water pressure issue')"""
+        pos = start
+        for _ in range(NEGATION_WINDOW):
+            # Clauses are separated by two spaces, so a space before the word boundary ends the clause
+            if pos <= 0 or normalized[pos - 1] == ' ':
+                break
+            word_start = normalized.rfind(' ', 0, pos) + 1
+            word = normalized[word_start:pos]
+            if word in NEGATION_STOPS:
+                break
+            if word in NEGATORS and not any(s <= word_start and pos <= e for s, e in spans):
+                return True
+            pos = word_start - 1
+        if normalized[start + 1:normalized.find(' ', start + 1)] not in NEGATORS:
+            return False
+        pos = normalized.find(' ', end) + 1
+        for _ in range(NEGATION_WINDOW):
+            if pos <= 0 or pos >= len(normalized) or normalized[pos] == ' ':
+                break
+            word_end = normalized.find(' ', pos)
+            word = normalized[pos:word_end]
+            if word in NEGATION_STOPS:
+                break
+            if word in NEGATED_BY_FOLLOWING:
+                return True
+            pos = word_end + 1
+        return False
+
+    def score(self, text, category=None):
+        """Dict with the priority (None when ambiguous), the reason, the severity and the matched phrases"""
+        collapsed = ' '.join(text.split())
+        lowered = collapsed.lower()
+        if lowered in TRIVIAL_MESSAGES or len(lowered) < 5:
+            return {'priority': 'low', 'reason': 'trivial', 'severity': 0, 'signals': []}
+
+        category = (category or '').lower()
+        # Like normalize(), but clauses are separated by two spaces, so phrases and negations do not reach
+        # across punctuation
+        normalized = ' ' + _CLAUSE.sub('  ', _NON_WORD.sub(' ', lowered)).strip() + ' '
+        hits = [hit for values in self.automaton.find(normalized) for hit in values
+                if hit[2] is None or not category or hit[2] == category]
+        # Emergency and urgency phrases inside a negation ('not urgent', 'no sewage smell') do not count;
+        # match positions are only needed when such a phrase and a negator both occur
+        if any(hit[0] in NEGATED_SIGNALS for hit in hits) and any(word in normalized for word in _PADDED_NEGATORS):
+            found = [(end, hit) for end, values in self.automaton.find_ends(normalized) for hit in values
+                     if hit[2] is None or not category or hit[2] == category]
+            spans = [(end - hit[4] + 1, end) for end, hit in found if hit[0] in NEGATED_SIGNALS]
+            hits = [hit for end, hit in found if hit[0] not in NEGATED_SIGNALS
+                    or not self._negated(normalized, end - hit[4] + 1, end, spans)]
+        matched = sorted({hit[3] for hit in hits})
+        signals = {hit[0] for hit in hits}
+
+        if ('URGENT' in collapsed or 'EMERGENCY' in collapsed) and 'urgency' in signals:
+            return {'priority': 'high', 'reason': 'urgent', 'severity': 0, 'signals': []}
+
+        if 'emergency' in signals:
+            return {'priority': 'high', 'reason': 'emergency', 'severity': 0, 'signals': matched}
+
+        weights = {hit[0]: hit[1] for hit in hits}
+        severity = sum(weights.values())
+        if _DURATION.search(collapsed):
+            severity += 1
+        if '!!' in collapsed or any(word not in ACRONYMS for word in _CAPITALIZED.findall(collapsed)):
+            severity += 1
+
+        if severity >= HIGH_SEVERITY:
+            priority, reason = 'high', 'severity'
+        elif 'routine' in signals and severity == 0:
+            priority, reason = 'low', 'routine'
+        elif 'service' in signals:
+            priority, reason = 'medium', 'service'
+        else:
+            priority, reason = None, 'ambiguous'
+        return {'priority': priority, 'reason': reason, 'severity': severity, 'signals': matched}
+
+
+priority_scorer = PriorityScorer()
+
+
+def score_complaints(complaints):
+    """Score every complaint with the rules; ambiguous ones get priority None"""
+    results = []
+    for complaint in complaints:
+        result = priority_scorer.score(complaint_text(complaint), complaint.get('category'))
+        result['id'] = complaint.get('id')
+        result['source'] = 'rules' if result['priority'] else None
+        results.append(result)
+    return results
+
+
+def llm_batches(complaints, results, batch_size=PRIORITY_LLM_BATCH_SIZE):
+    """(indices, chat messages) for each batch of complaints the rules left undecided"""
+    pending = [i for i, result in enumerate(results) if result['priority'] is None]
+    for start in range(0, len(pending), batch_size):
+        indices = pending[start:start + batch_size]
+        lines = []
+        for number, i in enumerate(indices, start=1):
+            complaint = complaints[i]
+            text = ' '.join(complaint_text(complaint).split())
+            lines.append(f"{number}. [{(complaint.get('category') or 'unknown').upper()}] {text}")
+        messages = [
+            {"role": "system", "parts": [PRIORITY_SYSTEM_PROMPT]},
+            {"role": "user", "parts": ["\n".join(lines)]}
+        ]
+        yield indices, messages
+
+
+def apply_llm_reply(results, indices, reply):
+    """Take the priorities the LLM gave for one batch; unanswered complaints stay undecided"""
+    answers = {int(number): priority.lower() for number, priority in _REPLY_LINE.findall(reply or '')}
+    for number, i in enumerate(indices, start=1):
+        if answers.get(number) in PRIORITIES:
+            results[i]['priority'] = answers[number]
+            results[i]['source'] = 'llm'
+
+
+def finalize(results):
+    """Give undecided complaints the edge function's fallback and count how each was decided"""
+    for result in results:
+        if result['priority'] is None:
+            result['priority'] = 'medium' if result['severity'] > 0 else 'low'
+            result['source'] = 'fallback'
+        priority_decisions.inc(result['source'])
+    return results
+
+
+def summarize(results, llm_calls, llm_errors, seconds):
+    sources = {'rules': 0, 'llm': 0, 'fallback': 0}
+    for result in results:
+        sources[result['source']] += 1
+    return {'complaints': len(results), **sources, 'llmCalls': llm_calls, 'llmErrors': llm_errors,
+            'seconds': round(seconds, 4)}
+
+
+def prioritize_complaints(complaints, model=None):
+    """Score complaints, asking the model (when given) about the ambiguous ones in batched calls
+
+    Returns the per-complaint results and counts of how they were decided.
+    """
+    started = time.perf_counter()
+    results = score_complaints(complaints)
+    batches = list(llm_batches(complaints, results)) if model is not None else []
+    llm_errors = 0
+
+    def ask(batch):
+        indices, messages = batch
+        with time_stage('upstream_priority'):
+            return indices, model.generate_content(messages).text
+
+    if batches:
+        with ThreadPoolExecutor(max_workers=PRIORITY_LLM_CONCURRENCY, thread_name_prefix='priority-llm') as pool:
+            futures = [pool.submit(ask, batch) for batch in batches]
+            for future in futures:
+                try:
+                    indices, reply = future.result()
+                    apply_llm_reply(results, indices, reply)
+                except Exception as e:
+                    llm_errors += 1
+                    print(f"Error asking the model for complaint priorities: {e}")
+
+    finalize(results)
+    return {'results': results, 'stats': summarize(results, len(batches), llm_errors, time.perf_counter() - started)}
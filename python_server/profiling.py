@@ -0,0 +1,153 @@
+
+import os
+import re
+import sys
+import time
+import hmac
+import random
+import threading
+from datetime import datetime
+from collections import Counter
+
+# Requests carrying this header with PROFILE_TOKEN as its value are profiled
+PROFILE_HEADER = 'X-Profile-Token'
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+# Fraction of requests profiled without the header (0 disables sampling)
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+# 'cprofile' writes .pstats files, 'sample' writes flamegraph-ready .collapsed stacks
+PROFILE_MODE = os.environ.get('PROFILE_MODE', 'cprofile')
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(os.path.dirname(__file__), 'profiles'))
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', 50))
+# Seconds between stack samples in 'sample' mode
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.002))
+
+
+class StackSampler:
+    """Samples one thread's stack in the background and aggregates collapsed stacks"""
+
+    def __init__(self, thread_id, interval=PROFILE_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class CProfileSession:
+    """Deterministic cProfile capture of the current thread"""
+
+    def __init__(self):
+        import cProfile
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def dump(self, path):
+        self.profile.dump_stats(path)
+
+
+class RequestProfiler:
+    """Opt-in per-request profiler writing to a bounded, rotating directory"""
+
+    def __init__(self, token=PROFILE_TOKEN, sample_rate=PROFILE_SAMPLE_RATE, mode=PROFILE_MODE,
+                 output_dir=PROFILE_DIR, max_files=PROFILE_MAX_FILES):
+        self.token = token
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.output_dir = output_dir
+        self.max_files = max_files
+        # Only one request is profiled at a time per process
+        self._busy = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.token) or self.sample_rate > 0
+
+    def should_profile(self, header_value):
+        if self.token and header_value and hmac.compare_digest(header_value, self.token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self):
+        """Start a profiling session, or return None if one is already running"""
+        if not self._busy.acquire(blocking=False):
+            return None
+        if self.mode == 'sample':
+            session = StackSampler(threading.get_ident())
+        else:
+            session = CProfileSession()
+        session.started = time.perf_counter()
+        session.start()
+        return session
+
+    def finish(self, session, endpoint, payload_bytes):
+        """Stop a session and write it out tagged with endpoint and payload size"""
+        try:
+            session.stop()
+            duration_ms = int((time.perf_counter() - session.started) * 1000)
+            os.makedirs(self.output_dir, exist_ok=True)
+            extension = 'collapsed' if isinstance(session, StackSampler) else 'pstats'
+            name = re.sub(r'[^A-Za-z0-9]+', '_', endpoint).strip('_') or 'root'
+            filename = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}_{name}_{payload_bytes}b_{duration_ms}ms.{extension}"
+            path = os.path.join(self.output_dir, filename)
+            session.dump(path)
+            self._rotate()
+            print(f"Wrote request profile {path}")
+            return path
+        finally:
+            self._busy.release()
+
+    def _rotate(self):
+        entries = [os.path.join(self.output_dir, name) for name in os.listdir(self.output_dir)]
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:max(0, len(entries) - self.max_files)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def init_app(self, app):
+        """Register Flask hooks; nothing is registered when profiling is not configured"""
+        if not self.enabled:
+            return
+
+        from flask import g, request
+
+        @app.before_request
+        def start_request_profile():
+            if self.should_profile(request.headers.get(PROFILE_HEADER)):
+                g.profile_session = self.start()
+
+        @app.teardown_request
+        def finish_request_profile(exc):
+            session = g.pop('profile_session', None)
+            if session is not None:
+                endpoint = request.url_rule.rule if request.url_rule else request.path
+                self.finish(session, endpoint, request.content_length or 0)
@@ -0,0 +1,147 @@
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Background source refresh; each worker runs its own scheduler, and the
+# fetcher's cache file locks make sure only one of them downloads a source
+SOURCE_REFRESH_ENABLED = os.environ.get('SOURCE_REFRESH_ENABLED', '1') != '0'
+SOURCE_REFRESH_CONCURRENCY = int(os.environ.get('SOURCE_REFRESH_CONCURRENCY', 2))
+# Seconds between checks for sources that are due
+SOURCE_REFRESH_POLL_SECONDS = float(os.environ.get('SOURCE_REFRESH_POLL_SECONDS', 60))
+# Fraction of a source's interval added at random, so sources and workers do not refresh in lockstep
+SOURCE_REFRESH_JITTER = float(os.environ.get('SOURCE_REFRESH_JITTER', 0.1))
+SOURCE_REFRESH_BACKOFF_SECONDS = float(os.environ.get('SOURCE_REFRESH_BACKOFF_SECONDS', 60))
+SOURCE_REFRESH_MAX_BACKOFF_SECONDS = float(os.environ.get('SOURCE_REFRESH_MAX_BACKOFF_SECONDS', 6 * 3600))
+
+
+class RefreshScheduler:
+    """Refreshes each data source of every city on its own interval in background threads
+
+    Requests keep reading the last good copy while a refresh runs or after it
+    fails; failed sources are retried with exponential backoff.
+    """
+
+    def __init__(self, fetchers, max_concurrency=SOURCE_REFRESH_CONCURRENCY, poll_interval=SOURCE_REFRESH_POLL_SECONDS,
+                 jitter=SOURCE_REFRESH_JITTER, backoff=SOURCE_REFRESH_BACKOFF_SECONDS,
+                 max_backoff=SOURCE_REFRESH_MAX_BACKOFF_SECONDS, clock=time.time):
+        self.fetchers = {fetcher.city: fetcher for fetcher in fetchers}
+        self.max_concurrency = max_concurrency
+        self.poll_interval = poll_interval
+        self.jitter = jitter
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.random = random.Random()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+        self._running = set()
+        # Refresh state keyed by (city, source)
+        self._state = {(city, source_key): {'jitter': self.random.random() * jitter, 'failures': 0, 'retryAt': None,
+                                            'lastRefresh': None, 'lastError': None}
+                       for city, fetcher in self.fetchers.items() for source_key in fetcher.data_sources}
+
+    def start(self):
+        """Start the background thread (call again in each worker after forking)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._running.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='source-refresh')
+        self._thread = threading.Thread(target=self._run, name='refresh-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=True):
+        self._stop.set()
+        if self._thread is not None:
+            if wait:
+                self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_due()
+            self._stop.wait(self.poll_interval)
+
+    def next_refresh_at(self, key):
+        """Time a (city, source) is next due, or 0 when it has no cache yet"""
+        state = self._state[key]
+        if state['retryAt'] is not None:
+            return state['retryAt']
+        city, source_key = key
+        fetcher = self.fetchers[city]
+        source = fetcher.data_sources[source_key]
+        if not fetcher.cache.exists(source['cache_path']):
+            return 0
+        interval = source['refresh_interval']
+        return fetcher.cache.getmtime(source['cache_path']) + interval * (1 + state['jitter'])
+
+    def run_due(self):
+        """Submit every due source that is not already refreshing; returns their (city, source) keys"""
+        now = self.clock()
+        submitted = []
+        with self._lock:
+            for key in self._state:
+                if key in self._running:
+                    continue
+                # Also pick up copies refreshed by another worker, so requests find them parsed
+                city, source_key = key
+                if self.next_refresh_at(key) > now and not self.fetchers[city].needs_reload(source_key):
+                    continue
+                self._running.add(key)
+                submitted.append(key)
+        for key in submitted:
+            if self._executor is None:
+                self._refresh(key)
+            else:
+                self._executor.submit(self._refresh, key)
+        return submitted
+
+    def _refresh(self, key):
+        state = self._state[key]
+        city, source_key = key
+        try:
+            self.fetchers[city].refresh(source_key)
+        except Exception as e:
+            with self._lock:
+                state['failures'] += 1
+                delay = min(self.max_backoff, self.backoff * 2 ** (state['failures'] - 1))
+                state['retryAt'] = self.clock() + delay * (0.5 + self.random.random() / 2)
+                state['lastError'] = str(e)
+            print(f"Refreshing {city}/{source_key} failed ({state['failures']} in a row), retrying in {delay:.0f}s: {e}")
+        else:
+            with self._lock:
+                state['failures'] = 0
+                state['retryAt'] = None
+                state['lastError'] = None
+                state['lastRefresh'] = self.clock()
+                # New jitter for the next cycle
+                state['jitter'] = self.random.random() * self.jitter
+        finally:
+            with self._lock:
+                self._running.discard(key)
+
+    def status(self, city=None):
+        """Freshness, age and refresh state of every source, by city"""
+        now = self.clock()
+        cities = [city] if city else list(self.fetchers)
+        status = {city: self.fetchers[city].source_status() for city in cities}
+        with self._lock:
+            for city, entries in status.items():
+                for source_key, entry in entries.items():
+                    key = (city, source_key)
+                    state = self._state[key]
+                    entry.update({
+                        'refreshing': key in self._running,
+                        'consecutiveFailures': state['failures'],
+                        'lastError': state['lastError'],
+                        'lastRefreshAgoSeconds': round(now - state['lastRefresh'], 1) if state['lastRefresh'] else None,
+                        'nextRefreshInSeconds': round(max(0.0, self.next_refresh_at(key) - now), 1)
+                    })
+        return status
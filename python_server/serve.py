@@ -0,0 +1,191 @@
+
+"""Production launcher for python_server
+
+Runs N gunicorn workers forked from a parent that has already loaded the app
+and warmed the data fetcher, so workers share that memory copy-on-write.
+
+    python serve.py                      # sync Flask workers
+    python serve.py --mode async         # aiohttp workers (async_server.py)
+    python serve.py measure --workers 4  # report per-worker memory and first warm request time
+    python serve.py --snapshot pcmc.snapshot  # warm start from a snapshot.py export
+
+Graceful reload: `kill -HUP <master pid>` replaces workers one generation at a
+time after in-flight requests finish (up to --graceful-timeout). To pick up new
+code, send USR2 to start a new master alongside the old one, then QUIT the old
+master once the new workers are serving.
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import argparse
+import subprocess
+import urllib.request
+
+DEFAULT_WORKERS = int(os.environ.get('WEB_CONCURRENCY', (os.cpu_count() or 1) * 2 + 1))
+DEFAULT_THREADS = int(os.environ.get('WORKER_THREADS', 4))
+
+
+def warm_state(application_module):
+    """Load sources, parsed frames and chart libraries before workers are forked"""
+    started = time.perf_counter()
+    warmed = application_module.city_registry.warm()
+    # Live stats live in shared memory, so they must exist before the fork for workers to share them
+    application_module.get_complaint_streams()
+    # Workers start their own table extraction worker when they need one
+    from table_extraction import close_table_extractors
+    close_table_extractors()
+
+    # Heavy libraries are imported lazily by the app; load them here once so
+    # workers inherit them instead of paying the import on their first request
+    import numpy  # noqa: F401
+    import pandas  # noqa: F401
+    import matplotlib.figure  # noqa: F401
+    import matplotlib.backends.backend_agg  # noqa: F401
+
+    # Move everything loaded so far out of the collector's generations, so
+    # garbage collection in workers does not touch (and copy) shared pages
+    gc.collect()
+    gc.freeze()
+    print(f"Warmed {len(warmed)} sources in {time.perf_counter() - started:.2f}s before forking workers")
+
+
+def run_server(args):
+    from gunicorn.app.base import BaseApplication
+
+    import app as flask_app
+    warm_state(flask_app)
+
+    if args.mode == 'async':
+        import async_server
+        application = async_server.create_app()
+        worker_class = 'aiohttp.GunicornWebWorker'
+    else:
+        application = flask_app.app
+        worker_class = 'gthread'
+
+    def start_worker_refresh(server, worker):
+        # Threads do not survive fork, so each worker runs its own refresh scheduler;
+        # cache file locks keep them to one download per source
+        from refresh_scheduler import SOURCE_REFRESH_ENABLED
+        if SOURCE_REFRESH_ENABLED:
+            flask_app.refresh_scheduler.start()
+
+    class ProductionServer(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f"{args.host}:{args.port}")
+            self.cfg.set('workers', args.workers)
+            self.cfg.set('threads', args.threads)
+            self.cfg.set('worker_class', worker_class)
+            self.cfg.set('preload_app', True)
+            self.cfg.set('graceful_timeout', args.graceful_timeout)
+            self.cfg.set('timeout', args.timeout)
+            self.cfg.set('max_requests', args.max_requests)
+            self.cfg.set('max_requests_jitter', args.max_requests // 10)
+            if args.mode != 'async':
+                # The async app starts the scheduler on startup, after forking its CPU pool
+                self.cfg.set('post_fork', start_worker_refresh)
+
+        def load(self):
+            return application
+
+    ProductionServer().run()
+
+
+def _worker_memory(pid):
+    """Resident, proportional and private memory of a process in KB"""
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if parts[0] in ('Rss:', 'Pss:', 'Private_Clean:', 'Private_Dirty:', 'Shared_Clean:', 'Shared_Dirty:'):
+                    memory[parts[0].rstrip(':')] = int(parts[1])
+    except FileNotFoundError:
+        return None
+    return {
+        'rssKb': memory.get('Rss', 0),
+        'pssKb': memory.get('Pss', 0),
+        'sharedKb': memory.get('Shared_Clean', 0) + memory.get('Shared_Dirty', 0),
+        'privateKb': memory.get('Private_Clean', 0) + memory.get('Private_Dirty', 0)
+    }
+
+
+def _child_pids(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except FileNotFoundError:
+        return []
+
+
+def measure(args):
+    """Launch the server, time the first warm request and report per-worker memory"""
+    command = [sys.executable, __file__, '--mode', args.mode, '--workers', str(args.workers),
+               '--threads', str(args.threads), '--host', '127.0.0.1', '--port', str(args.port)]
+    if args.snapshot:
+        command += ['--snapshot', args.snapshot]
+    url = f"http://127.0.0.1:{args.port}/fetch_resource_data"
+    body = json.dumps({'resourceType': 'water'}).encode('utf-8')
+
+    started = time.perf_counter()
+    master = subprocess.Popen(command)
+    first_request = None
+    try:
+        while time.perf_counter() - started < args.startup_timeout:
+            try:
+                request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+                with urllib.request.urlopen(request, timeout=5) as response:
+                    if response.status == 200:
+                        first_request = time.perf_counter() - started
+                        break
+            except OSError:
+                time.sleep(0.05)
+
+        # Let every worker boot before sampling memory
+        time.sleep(1)
+        workers = {pid: _worker_memory(pid) for pid in _child_pids(master.pid)}
+        report = {
+            'mode': args.mode,
+            'workers': args.workers,
+            'timeToFirstWarmRequestSeconds': round(first_request, 3) if first_request else None,
+            'master': _worker_memory(master.pid),
+            'perWorker': workers
+        }
+    finally:
+        master.terminate()
+        master.wait()
+
+    print(json.dumps(report, indent=2))
+    return 0 if first_request else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', nargs='?', default='run', choices=['run', 'measure'])
+    parser.add_argument('--mode', choices=['sync', 'async'], default=os.environ.get('SERVER_MODE', 'sync'))
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS, help='threads per sync worker')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--timeout', type=int, default=60)
+    parser.add_argument('--graceful-timeout', type=int, default=30)
+    parser.add_argument('--max-requests', type=int, default=10000)
+    parser.add_argument('--startup-timeout', type=float, default=300)
+    parser.add_argument('--snapshot', default=os.environ.get('PCMC_SNAPSHOT'),
+                        help='load this snapshot (snapshot.py export) before accepting traffic')
+    args = parser.parse_args(argv)
+    if args.snapshot:
+        # Read by app on import, in the parent before workers fork
+        os.environ['PCMC_SNAPSHOT'] = args.snapshot
+
+    if args.command == 'measure':
+        return measure(args)
+    run_server(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
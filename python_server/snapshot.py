@@ -0,0 +1,172 @@
+"""Warm-start snapshots of processed source data and built analytics
+
+    python snapshot.py export                              # snapshots/pcmc-<timestamp>.snapshot
+    python snapshot.py export --output /data/pcmc.snapshot --city pimpri_chinchwad
+    python snapshot.py inspect /data/pcmc.snapshot
+    python snapshot.py load /data/pcmc.snapshot            # restore into the cache directory
+
+A snapshot is one gzip-compressed JSON file holding, per city, the cached
+content of every source (with the time it was fetched) and the built water
+and energy analytics. Advisories are not stored: they depend on each
+request's complaints and the current month, and are cheap to recompute from
+the restored analytics. Set PCMC_SNAPSHOT (or pass `serve.py --snapshot`)
+to load one before the server accepts traffic.
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import base64
+import argparse
+from datetime import datetime
+
+SNAPSHOT_FORMAT = 'pcmc-snapshot'
+# Bump when the layout changes; older snapshots are rejected instead of misread
+SNAPSHOT_VERSION = 2
+SNAPSHOT_PATH = os.environ.get('PCMC_SNAPSHOT')
+SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), 'snapshots')
+
+
+class SnapshotError(ValueError):
+    """Raised for files that are not snapshots this version can load"""
+
+
+def _encode(content):
+    try:
+        return {'encoding': 'utf-8', 'content': content.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'encoding': 'base64', 'content': base64.b64encode(content).decode('ascii')}
+
+
+def _decode(entry):
+    if entry['encoding'] == 'base64':
+        return base64.b64decode(entry['content'])
+    return entry['content'].encode('utf-8')
+
+
+def build_snapshot(registry, cities=None):
+    """Collect sources and analytics of the given cities (all by default), fetching anything missing"""
+    snapshot = {
+        'format': SNAPSHOT_FORMAT,
+        'version': SNAPSHOT_VERSION,
+        'createdAt': datetime.now().isoformat(timespec='seconds'),
+        'cities': {}
+    }
+    for city in cities or registry.cities:
+        fetcher = registry.get(city)
+        fetcher.warm()
+        sources = {}
+        for source_key in fetcher.data_sources:
+            exported = fetcher.export_source(source_key)
+            if exported is None:
+                print(f"Skipping {city}/{source_key}: not cached")
+                continue
+            content, fetched_at = exported
+            sources[source_key] = {'fetchedAt': fetched_at, **_encode(content)}
+
+        # Build the analytics so they are part of the state exported below
+        fetcher.get_water_analytics()
+        fetcher.get_energy_analytics()
+        snapshot['cities'][city] = {
+            'sources': sources,
+            'analytics': fetcher.analytics_state()
+        }
+    return snapshot
+
+
+def write_snapshot(snapshot, path):
+    from cache_manager import write_atomic
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    write_atomic(path, gzip.compress(json.dumps(snapshot, separators=(',', ':')).encode('utf-8'), compresslevel=9))
+
+
+def read_snapshot(path):
+    try:
+        with gzip.open(path, 'rb') as f:
+            snapshot = json.loads(f.read())
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"{path} is not a snapshot: {e}")
+    if snapshot.get('format') != SNAPSHOT_FORMAT:
+        raise SnapshotError(f"{path} is not a snapshot")
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        raise SnapshotError(f"{path} is snapshot version {snapshot.get('version')}, expected {SNAPSHOT_VERSION}")
+    return snapshot
+
+
+def load_snapshot(path, registry):
+    """Restore a snapshot into the registry's cache and memory; returns a summary
+
+    Sources the local cache already holds in a newer version are kept. Built
+    analytics are installed for sources that match the snapshot, so the first
+    requests neither download, extract nor rebuild anything.
+    """
+    started = time.perf_counter()
+    snapshot = read_snapshot(path)
+    restored = kept = 0
+    skipped_cities = []
+    for city, city_snapshot in snapshot['cities'].items():
+        if city not in registry.cities:
+            skipped_cities.append(city)
+            continue
+        fetcher = registry.get(city)
+        for source_key, entry in city_snapshot['sources'].items():
+            if source_key not in fetcher.data_sources:
+                continue
+            if fetcher.restore_source(source_key, _decode(entry), entry['fetchedAt']):
+                restored += 1
+            else:
+                kept += 1
+        for kind, built in city_snapshot['analytics'].items():
+            fetcher.restore_analytics(kind, built['versions'], built['analytics'])
+
+    summary = {
+        'createdAt': snapshot['createdAt'],
+        'restoredSources': restored,
+        'keptNewerSources': kept,
+        'skippedCities': skipped_cities,
+        'seconds': round(time.perf_counter() - started, 3)
+    }
+    print(f"Loaded snapshot {path} from {snapshot['createdAt']}: {restored} sources restored, "
+          f"{kept} newer local copies kept in {summary['seconds']}s")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export, inspect and load warm-start snapshots')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='write a snapshot of the current cache and analytics')
+    export_parser.add_argument('--output', help='snapshot file (default snapshots/pcmc-<timestamp>.snapshot)')
+    export_parser.add_argument('--city', action='append', help='only include this city (repeatable)')
+    inspect_parser = subparsers.add_parser('inspect', help='summarize a snapshot')
+    inspect_parser.add_argument('path')
+    load_parser = subparsers.add_parser('load', help='restore a snapshot into the cache directory')
+    load_parser.add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'inspect':
+        snapshot = read_snapshot(args.path)
+        print(f"{args.path}: version {snapshot['version']}, created {snapshot['createdAt']}, "
+              f"{os.path.getsize(args.path)} bytes")
+        for city, city_snapshot in snapshot['cities'].items():
+            print(f"  {city}: analytics {', '.join(sorted(city_snapshot['analytics'])) or 'none'}")
+            for source_key, entry in city_snapshot['sources'].items():
+                fetched = datetime.fromtimestamp(entry['fetchedAt']).isoformat(timespec='seconds')
+                print(f"    {source_key:<30} {len(entry['content']):>10} chars  fetched {fetched}")
+        return 0
+
+    # Loading app builds the city registry the server uses
+    import app
+    if args.command == 'export':
+        output = args.output or os.path.join(SNAPSHOT_DIR, f"pcmc-{datetime.now().strftime('%Y%m%dT%H%M%S')}.snapshot")
+        snapshot = build_snapshot(app.city_registry, args.city)
+        write_snapshot(snapshot, output)
+        print(f"Wrote {output} ({os.path.getsize(output)} bytes, {len(snapshot['cities'])} cities)")
+    else:
+        load_snapshot(args.path, app.city_registry)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
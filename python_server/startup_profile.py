@@ -0,0 +1,99 @@
+
+"""Report import time per module for a cold start of python_server
+
+    python startup_profile.py                  # top modules by cumulative import time for `import app`
+    python startup_profile.py --module data_fetcher --top 40
+    python startup_profile.py --budget 1.0     # exit 1 if cold `import app` takes longer than 1s
+
+Each run imports the module in a fresh interpreter with `-X importtime`, so
+results reflect a cold worker start. The --budget check is meant for CI to
+catch heavy dependencies creeping back into module-level imports.
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# Default budget for a cold `import app`, in seconds
+DEFAULT_BUDGET_SECONDS = float(os.environ.get('STARTUP_BUDGET_SECONDS', 1.5))
+
+# Modules that must only load on first use of the feature that needs them
+LAZY_MODULES = ['pandas', 'numpy', 'matplotlib', 'tabula', 'pdfplumber', 'jpype', 'PyPDF2', 'bs4', 'requests',
+                'google.generativeai']
+
+
+def profile_import(module, runs=3):
+    """Import a module in fresh interpreters and return per-module timings of the fastest run"""
+    best = None
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = (
+        "import sys, json, time\n"
+        "started = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - started\n"
+        f"print(json.dumps([elapsed, [m for m in {LAZY_MODULES!r} if m in sys.modules]]))\n"
+    )
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=here, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+        elapsed, loaded_lazy = json.loads(result.stdout.strip().splitlines()[-1])
+        modules = []
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            modules.append({
+                'module': name.strip(),
+                'depth': (len(name) - len(name.lstrip())) // 2,
+                'selfMs': int(self_us) / 1000,
+                'cumulativeMs': int(cumulative_us) / 1000
+            })
+        if best is None or elapsed < best['totalSeconds']:
+            best = {'totalSeconds': elapsed, 'modules': modules, 'eagerHeavyModules': loaded_lazy}
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--top', type=int, default=25)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--budget', type=float, nargs='?', const=DEFAULT_BUDGET_SECONDS,
+                        help=f"fail if the import takes longer (default {DEFAULT_BUDGET_SECONDS}s)")
+    parser.add_argument('--json', action='store_true', help='print the full report as JSON')
+    args = parser.parse_args(argv)
+
+    report = profile_import(args.module, args.runs)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Cold import of {args.module}: {report['totalSeconds']:.3f}s (best of {args.runs})")
+        print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        top = sorted(report['modules'], key=lambda m: m['cumulativeMs'], reverse=True)[:args.top]
+        for entry in top:
+            print(f"{entry['cumulativeMs']:>14.1f} {entry['selfMs']:>9.1f}  {'  ' * entry['depth']}{entry['module']}")
+
+    if args.budget is not None:
+        failures = []
+        if report['totalSeconds'] > args.budget:
+            failures.append(f"cold import took {report['totalSeconds']:.3f}s, budget is {args.budget:.3f}s")
+        if report['eagerHeavyModules']:
+            failures.append(f"heavy modules imported eagerly: {', '.join(report['eagerHeavyModules'])}")
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        if failures:
+            return 1
+        print(f"OK: within {args.budget:.3f}s budget")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,317 @@
+import io
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+from multiprocessing.connection import Connection
+
+from metrics import table_pages
+from worker_process import WorkerProcess, peak_rss_kb, serve
+
+# Table extraction backend for source PDFs: 'tabula' (Java) or 'pdfplumber' (pure Python); tabula falls back
+# to pdfplumber when no JVM can be found
+TABLE_BACKEND = os.environ.get('TABLE_BACKEND', 'tabula')
+# Run the backend in a long-lived worker process instead of the calling process
+TABLE_WORKER = os.environ.get('TABLE_WORKER', '1') == '1'
+# Seconds one document may take before the worker is restarted
+TABLE_WORKER_TIMEOUT = float(os.environ.get('TABLE_WORKER_TIMEOUT', 300))
+
+# How pdfplumber finds table cells: 'lines' (ruled tables) or 'text' (columns aligned by whitespace)
+PDFPLUMBER_TABLE_STRATEGY = os.environ.get('PDFPLUMBER_TABLE_STRATEGY', 'lines')
+PDFPLUMBER_TABLE_SETTINGS = {'vertical_strategy': PDFPLUMBER_TABLE_STRATEGY,
+                             'horizontal_strategy': PDFPLUMBER_TABLE_STRATEGY}
+
+# Bump when extraction output or the page hash changes, so cached page results are not reused
+EXTRACTION_VERSION = 3
+
+
+def _rows_to_records(rows):
+    """Turn a table given as rows into records keyed by its header row, like DataFrame.to_dict('records')"""
+    rows = [row for row in rows if any(cell not in (None, '') for cell in row)]
+    if len(rows) < 2:
+        return []
+    header = []
+    for i, cell in enumerate(rows[0]):
+        name = (cell or '').strip() or f"Unnamed: {i}"
+        header.append(name if name not in header else f"{name}.{i}")
+    return [{name: cell for name, cell in zip(header, row)} for row in rows[1:]]
+
+
+class PdfPlumberBackend:
+    """Pure-Python extraction with pdfplumber"""
+
+    name = 'pdfplumber'
+
+    def __init__(self):
+        import pdfplumber
+        self.pdfplumber = pdfplumber
+
+    def extract(self, pdf_bytes, pages):
+        results = {}
+        with self.pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+            for page_number in pages:
+                page = pdf.pages[page_number - 1]
+                tables = [_rows_to_records(rows) for rows in page.extract_tables(PDFPLUMBER_TABLE_SETTINGS)]
+                results[page_number] = [table for table in tables if table]
+                # Release the page's parsed objects before the next one
+                page.close()
+        return results
+
+
+class TabulaBackend:
+    """tabula-java through jpype, so one JVM serves every document instead of one per call"""
+
+    name = 'tabula'
+
+    def __init__(self):
+        import tabula
+        self.tabula = tabula
+        try:
+            import jpype  # noqa: F401
+        except ImportError:
+            print("WARNING: jpype is not installed, tabula will start a JVM for every document")
+
+    def extract(self, pdf_bytes, pages):
+        import PyPDF2
+        reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+        results = {}
+        # tabula-java's JSON does not say which page a table came from, so each page is written as a
+        # one-page PDF and the directory is extracted in one batch call: one JVM call per document,
+        # each page parsed once, and a JSON file of tables per page
+        with tempfile.TemporaryDirectory(prefix='pcmc-tables-') as directory:
+            for page_number in pages:
+                writer = PyPDF2.PdfWriter()
+                writer.add_page(reader.pages[page_number - 1])
+                with open(os.path.join(directory, f"page-{page_number}.pdf"), 'wb') as f:
+                    writer.write(f)
+            self.tabula.convert_into_by_batch(directory, output_format='json', pages='all', silent=True)
+            for page_number in pages:
+                path = os.path.join(directory, f"page-{page_number}.json")
+                raw_tables = []
+                if os.path.exists(path) and os.path.getsize(path):
+                    with open(path, encoding='utf-8') as f:
+                        raw_tables = json.load(f)
+                # Each table is rows of cells with their text, records keyed by the header row like pdfplumber's
+                tables = [_rows_to_records([[cell.get('text') for cell in row] for row in table.get('data', [])])
+                          for table in raw_tables]
+                results[page_number] = [table for table in tables if table]
+        return results
+
+
+BACKENDS = {backend.name: backend for backend in (PdfPlumberBackend, TabulaBackend)}
+
+
+def java_available():
+    """Whether tabula can run: jpype finds a JVM library, or without jpype a `java` command is on the PATH"""
+    try:
+        import jpype
+    except ImportError:
+        return shutil.which('java') is not None
+    try:
+        jpype.getDefaultJVMPath()
+        return True
+    except Exception:
+        return False
+
+
+_resolved = {}
+
+
+def resolve_backend(backend):
+    """The backend to use for a configured one: pdfplumber, with a warning, when tabula has no JVM"""
+    if backend not in _resolved:
+        _resolved[backend] = backend
+        if backend == 'tabula' and not java_available():
+            print("WARNING: TABLE_BACKEND is tabula but no Java runtime was found, extracting tables with pdfplumber")
+            _resolved[backend] = 'pdfplumber'
+    return _resolved[backend]
+
+
+def _worker_main(backend_name, connection):
+    """Serve extraction requests from one backend until the connection closes"""
+    backend = BACKENDS[backend_name]()
+    counts = {'documents': 0, 'pages': 0}
+
+    def handle(message):
+        if message[0] == 'stats':
+            return {**counts, **peak_rss_kb()}
+        _, pdf_bytes, pages = message
+        results = backend.extract(pdf_bytes, pages)
+        counts['documents'] += 1
+        counts['pages'] += len(pages)
+        return results
+
+    serve(connection, handle)
+
+
+class TableExtractionWorker(WorkerProcess):
+    """Long-lived process holding one backend (and, for tabula, its JVM), reused across documents"""
+
+    description = 'Table extraction'
+
+    def __init__(self, backend_name, timeout=TABLE_WORKER_TIMEOUT):
+        super().__init__(__file__, ['--backend', backend_name], timeout)
+        self.backend_name = backend_name
+
+    def extract(self, pdf_bytes, pages):
+        return self.call(('extract', pdf_bytes, list(pages)))
+
+    def stats(self):
+        return self.call(('stats',))
+
+
+def _object_digest(obj, memo):
+    """Digest of a PDF object and everything it references, except links back up the page tree
+
+    Indirect objects are digested once per reader, so fonts and images shared by many pages are
+    hashed once.
+    """
+    from PyPDF2.generic import IndirectObject, StreamObject
+
+    if isinstance(obj, IndirectObject):
+        key = (obj.idnum, obj.generation)
+        if key not in memo:
+            # Placeholder while the object is digested, in case it refers back to itself
+            memo[key] = b''
+            memo[key] = _object_digest(obj.get_object(), memo)
+        return memo[key]
+    digest = hashlib.sha256(type(obj).__name__.encode('ascii'))
+    if isinstance(obj, dict):
+        for key in sorted(obj):
+            if key in ('/Parent', '/P'):
+                continue
+            digest.update(str(key).encode('utf-8', 'backslashreplace'))
+            digest.update(_object_digest(obj.raw_get(key), memo))
+        if isinstance(obj, StreamObject):
+            # The stored (still encoded) bytes, together with the /Filter entry above
+            data = obj._data
+            digest.update(data if isinstance(data, bytes) else str(data).encode('utf-8', 'backslashreplace'))
+    elif isinstance(obj, list):
+        for item in obj:
+            digest.update(_object_digest(item, memo))
+    else:
+        digest.update(repr(obj).encode('utf-8', 'backslashreplace'))
+    return digest.digest()
+
+
+def page_hashes(reader):
+    """Content hash of every page of a PyPDF2 reader
+
+    Covers the page's size and rotation, its content stream and its resources (the fonts, images
+    and form XObjects it draws with), so pages that only differ in what `/Fm1 Do` draws differ.
+    """
+    hashes = []
+    memo = {}
+    for page in reader.pages:
+        digest = hashlib.sha256(f"{page.mediabox} {page.get('/Rotate', 0)}".encode('ascii'))
+        contents = page.get_contents()
+        if contents is not None:
+            digest.update(contents.get_data())
+        if '/Resources' in page:
+            digest.update(_object_digest(page.raw_get('/Resources'), memo))
+        hashes.append(digest.hexdigest())
+    return hashes
+
+
+class TableExtractor:
+    """Extracts tables page by page, caching each page's result by its content hash
+
+    Unchanged pages of a re-downloaded document, and pages shared between
+    documents, are not extracted again.
+    """
+
+    def __init__(self, backend=TABLE_BACKEND, cache=None, use_worker=TABLE_WORKER):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown table backend: {backend}")
+        self.backend_name = resolve_backend(backend)
+        self.cache = cache
+        self._worker = TableExtractionWorker(backend) if use_worker else None
+        self._backend = None
+
+    def _cache_path(self, page_hash):
+        variant = f"{self.backend_name}-{PDFPLUMBER_TABLE_STRATEGY}" if self.backend_name == 'pdfplumber' else self.backend_name
+        return os.path.join(self.cache.cache_dir, 'tables', variant, page_hash[:2],
+                            f"{page_hash}-v{EXTRACTION_VERSION}.json")
+
+    def _extract_pages(self, pdf_bytes, pages):
+        if self._worker is not None:
+            return self._worker.extract(pdf_bytes, pages)
+        if self._backend is None:
+            self._backend = BACKENDS[self.backend_name]()
+        return self._backend.extract(pdf_bytes, pages)
+
+    def extract(self, pdf_bytes, reader=None):
+        """Tables of every page in page order, each a list of records"""
+        if reader is None:
+            import PyPDF2
+            reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+        hashes = page_hashes(reader)
+
+        results = {}
+        missing = []
+        for page_number, page_hash in enumerate(hashes, start=1):
+            if self.cache is not None:
+                try:
+                    results[page_number] = json.loads(self.cache.read(self._cache_path(page_hash)))
+                    table_pages.inc(self.backend_name, 'cached')
+                    continue
+                except FileNotFoundError:
+                    pass
+            missing.append(page_number)
+
+        if missing:
+            extracted = self._extract_pages(pdf_bytes, missing)
+            for page_number in missing:
+                # Pipes deliver dict keys as sent, but be tolerant of str keys
+                tables = extracted.get(page_number, extracted.get(str(page_number), []))
+                results[page_number] = tables
+                table_pages.inc(self.backend_name, 'extracted')
+                if self.cache is not None:
+                    self.cache.write(self._cache_path(hashes[page_number - 1]), json.dumps(tables))
+
+        return [table for page_number in range(1, len(hashes) + 1) for table in results[page_number]]
+
+    def stats(self):
+        return self._worker.stats() if self._worker is not None else peak_rss_kb()
+
+    def close(self):
+        if self._worker is not None:
+            self._worker.close()
+
+
+_extractors = {}
+_extractors_lock = threading.Lock()
+
+
+def get_table_extractor(cache, backend=TABLE_BACKEND):
+    """Extractor shared by every fetcher using the same cache, so they share one worker"""
+    key = (backend, cache.cache_dir)
+    with _extractors_lock:
+        if key not in _extractors:
+            _extractors[key] = TableExtractor(backend, cache)
+        return _extractors[key]
+
+
+def close_table_extractors():
+    """Stop every shared extractor's worker; the next extraction starts a new one"""
+    with _extractors_lock:
+        extractors = list(_extractors.values())
+    for extractor in extractors:
+        extractor.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Table extraction worker (started by TableExtractionWorker)')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), required=True)
+    parser.add_argument('--fd', type=int, required=True, help='file descriptor of the connection to the parent')
+    args = parser.parse_args(argv)
+    _worker_main(args.backend, Connection(args.fd))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
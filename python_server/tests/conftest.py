@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# The server modules are flat files in python_server/, imported by name as the app does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep source caches created at import time out of the working tree
+os.environ.setdefault('PCMC_CACHE_DIR', tempfile.mkdtemp(prefix='pcmc-test-cache-'))
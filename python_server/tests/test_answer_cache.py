@@ -0,0 +1,78 @@
+from answer_cache import AnswerCache
+from chat_model import StubChatModel
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def ask(cache, model, question, chat_history=None):
+    messages = [{'role': 'user', 'parts': [question]}]
+    return cache.get_or_generate(question, chat_history, lambda: model.generate_content(messages).text)
+
+
+def test_rephrased_short_questions_share_an_answer():
+    cache, model = AnswerCache(), StubChatModel()
+    answer = ask(cache, model, 'What is the water supply schedule in Nigdi?')
+    assert ask(cache, model, 'water supply schedule Nigdi') == answer
+    assert ask(cache, model, 'Please tell me the Nigdi water supply schedule.') == answer
+    assert model.calls == 1
+    assert cache.stats()['fuzzyHits'] == 2
+
+
+def test_places_negations_and_numbers_must_match():
+    cache, model = AnswerCache(), StubChatModel()
+    ask(cache, model, 'What is the water supply schedule in Nigdi?')
+    ask(cache, model, 'What is the water supply schedule in Bhosari?')
+    ask(cache, model, 'Why is there no water supply in Nigdi?')
+    ask(cache, model, 'Why is there water supply in Nigdi?')
+    assert model.calls == 4
+
+
+def test_follow_ups_are_keyed_by_history():
+    cache, model = AnswerCache(), StubChatModel()
+    history = [{'role': 'user', 'content': 'Tell me about Nigdi'}, {'role': 'assistant', 'content': 'Nigdi is...'}]
+    ask(cache, model, 'And the water supply?', history)
+    ask(cache, model, 'And the water supply?', history)
+    assert model.calls == 1
+    # The same words without the history, or after other turns, are other questions
+    ask(cache, model, 'And the water supply?')
+    ask(cache, model, 'And the water supply?', [{'role': 'user', 'content': 'Tell me about Bhosari'}])
+    assert model.calls == 3
+
+
+def test_long_questions_need_an_exact_match():
+    cache, model = AnswerCache(), StubChatModel()
+    question = 'How does the corporation decide which areas get water first when the dam level drops in summer?'
+    ask(cache, model, question)
+    ask(cache, model, question.upper())
+    ask(cache, model, 'How does the corporation decide which areas get water first when dam level drops in summer?')
+    assert model.calls == 2
+
+
+def test_entries_expire_and_the_prompt_invalidates():
+    clock = FakeClock()
+    cache, model = AnswerCache(ttl_seconds=60, clock=clock), StubChatModel()
+    cache.set_system_prompt('v1')
+    ask(cache, model, 'water supply schedule Nigdi')
+    clock.now = 61
+    ask(cache, model, 'water supply schedule Nigdi')
+    assert model.calls == 2
+    cache.set_system_prompt('v2')
+    ask(cache, model, 'water supply schedule Nigdi')
+    assert model.calls == 3
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache, model = AnswerCache(max_entries=2), StubChatModel()
+    ask(cache, model, 'water schedule Nigdi')
+    ask(cache, model, 'water schedule Pimpri')
+    ask(cache, model, 'water schedule Nigdi')
+    ask(cache, model, 'water schedule Wakad')
+    assert cache.get('water schedule Pimpri') is None
+    assert cache.get('water schedule Nigdi') is not None
+    assert cache.stats()['entries'] == 2
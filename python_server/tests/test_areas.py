@@ -0,0 +1,97 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from areas import AreaAggregates, Gazetteer, BASE_RISK, complaint_area_analytics
+from data_fetcher import city_names
+
+CITIES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cities.json')
+
+
+@pytest.fixture(scope='module')
+def city():
+    with open(CITIES) as f:
+        return json.load(f)['pimpri_chinchwad']
+
+
+@pytest.fixture(scope='module')
+def gazetteer(city):
+    return Gazetteer(city['areas'], city_names(city))
+
+
+def issue_names(gazetteer, bits):
+    return {issue for bit, (_, issue) in enumerate(gazetteer.issues) if bits >> bit & 1}
+
+
+@pytest.mark.parametrize('text, area', [
+    ('Pipe leak near Akurdi station', 'Nigdi'),
+    ('Transformer sparking in Pimple Saudagar', 'Pimpri'),
+    ('No water in Chikhli', 'Bhosari'),
+    ('Leak at Chikhli Road junction', 'Bhosari'),
+    ('Low pressure at Chinchwad Station', 'Chinchwad'),
+])
+def test_localities_tag_their_area(gazetteer, text, area):
+    assert gazetteer.scan(text)[0] == area
+
+
+@pytest.mark.parametrize('text', [
+    'Pimpri Chinchwad city wide blackout',
+    'PCMC water supply cut across Pimpri-Chinchwad Municipal Corporation',
+    'Street lights off on Aundh Road',
+    'Power outage in Hinjewadi Phase 1',
+])
+def test_city_wide_and_outside_names_tag_no_area(gazetteer, text):
+    assert gazetteer.scan(text)[0] is None
+
+
+def test_city_name_does_not_hide_a_named_area(gazetteer):
+    assert gazetteer.scan('Pimpri Chinchwad: no water in Wakad since morning')[0] == 'Wakad'
+
+
+def test_issues_are_found_in_the_same_pass(gazetteer):
+    area, bits = gazetteer.scan('No water and a burst pipeline in Ravet, dirty water too')
+    assert area == 'Nigdi'
+    assert issue_names(gazetteer, bits) == {'shortage', 'quality', 'infrastructure'}
+
+
+def test_location_field_wins_over_the_description(gazetteer):
+    areas, _ = gazetteer.tag(pd.Series(['Leak in Akurdi', 'Leak in Akurdi', 'Leak']),
+                             pd.Series(['Wakad', None, 'somewhere']))
+    assert list(areas) == ['Wakad', 'Nigdi', None]
+
+
+def complaints(area, count, priority='high', description='no water supply'):
+    return [{'location': area, 'category': 'water', 'priority': priority, 'description': description}] * count
+
+
+def test_without_complaints_risks_are_the_base_tiers(city):
+    risks = AreaAggregates().risks(city['areas'], 'water')
+    assert [record['shortageRisk'] for record in risks] == \
+        [BASE_RISK['water'][area['risk']] for area in city['areas']]
+
+
+def test_a_few_complaints_stay_near_the_base_tier(city):
+    df = pd.DataFrame(complaints('Nigdi', 2) + complaints('Wakad', 2, 'low'))
+    risks = {record['area']: record for record in complaint_area_analytics(df, city['areas'], city_names(city))['waterRisks']}
+    assert abs(risks['Nigdi']['shortageRisk'] - BASE_RISK['water']['low']) <= 10
+    assert abs(risks['Wakad']['shortageRisk'] - BASE_RISK['water']['high']) <= 10
+
+
+def test_many_severe_complaints_raise_an_area(city):
+    df = pd.DataFrame(complaints('Nigdi', 200) + complaints('Wakad', 5, 'low'))
+    result = complaint_area_analytics(df, city['areas'], city_names(city))
+    risks = {record['area']: record for record in result['waterRisks']}
+    assert risks['Nigdi']['shortageRisk'] > BASE_RISK['water']['low'] + 20
+    assert risks['Nigdi']['shortageRisk'] > risks['Wakad']['shortageRisk']
+    assert result['areaData']['located'] == 205 and 'energyRisks' not in result
+
+
+def test_aggregates_merge(city):
+    gazetteer = Gazetteer(city['areas'], city_names(city))
+    first = AreaAggregates().add_complaints(pd.DataFrame(complaints('Nigdi', 3)), gazetteer)
+    second = AreaAggregates().add_complaints(pd.DataFrame(complaints('Nigdi', 2) + complaints(None, 1)), gazetteer)
+    merged = first.merge(second).summary()
+    assert (merged['located'], merged['unlocated']) == (5, 1)
+    assert merged['areas'][0]['complaints'] == 5
@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+from attachments import AttachmentExtractor, detect_type
+from cache_manager import CacheManager
+from concurrency import Overloaded
+
+NOTE = b'Water has been contaminated in Nigdi since Monday.\nPlease send a tanker.'
+
+
+@pytest.fixture
+def extractor(tmp_path):
+    return AttachmentExtractor(cache=CacheManager(str(tmp_path)), workers=0, queue_wait=0.2, max_pending_bytes=100)
+
+
+def test_detect_type():
+    assert detect_type(b'%PDF-1.7 ...') == 'pdf'
+    assert detect_type(b'\x89PNG\r\n\x1a\n....') == 'image'
+    assert detect_type(b'ID3\x03....') == 'audio'
+    assert detect_type(NOTE) == 'text'
+    assert detect_type(b'\x00\x01\x02') == 'unknown'
+
+
+def test_results_are_cached_by_content(extractor):
+    first = extractor.extract_batch([('note.txt', NOTE), ('copy.txt', NOTE), ('song.mp3', b'ID3\x03')])
+    assert [result.get('cached') for result in first['results']] == [False, False, False]
+    assert first['results'][0]['text'].startswith('Water has been contaminated')
+    assert 'error' in first['results'][2]
+    stats = first['stats']
+    assert (stats['files'], stats['extracted'], stats['errors']) == (3, 2, 1)
+
+    second = extractor.extract_batch([('renamed.txt', NOTE)])
+    assert second['results'][0]['cached'] is True
+    assert second['results'][0]['text'] == first['results'][0]['text']
+    assert extractor.pending == 0
+
+
+def test_corrupt_cache_entries_are_extracted_again(extractor):
+    first = extractor.extract_batch([('note.txt', NOTE)])['results'][0]
+    path = extractor._cache_path(first['sha256'])
+    extractor.cache.write(path, b'{"type": "te')
+    again = extractor.extract_batch([('note.txt', NOTE)])['results'][0]
+    assert again['cached'] is False and again['text'] == first['text']
+    assert extractor.extract_batch([('note.txt', NOTE)])['results'][0]['cached'] is True
+
+
+def test_byte_reservations_wait_for_room(extractor):
+    extractor.reserve_bytes(60)
+    admitted = threading.Event()
+
+    def reserve():
+        with extractor.reserved(60):
+            admitted.set()
+
+    thread = threading.Thread(target=reserve)
+    thread.start()
+    time.sleep(0.05)
+    assert not admitted.is_set()
+    extractor.release_bytes(60)
+    thread.join()
+    assert admitted.is_set() and extractor.pending_bytes == 0
+
+
+def test_byte_reservations_time_out(extractor):
+    extractor.reserve_bytes(60)
+    with pytest.raises(Overloaded):
+        extractor.reserve_bytes(60)
+    assert extractor.rejected == 1 and extractor.pending_bytes == 60
+    extractor.release_bytes(60)
+    # A request larger than the whole budget still runs once nothing else is reserved
+    with extractor.reserved(500):
+        assert extractor.pending_bytes == 500
+    assert extractor.pending_bytes == 0
+
+
+def test_reservation_is_released_when_the_block_fails(extractor):
+    with pytest.raises(ValueError):
+        with extractor.reserved(80):
+            raise ValueError('bad body')
+    assert extractor.pending_bytes == 0
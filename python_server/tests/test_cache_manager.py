@@ -0,0 +1,68 @@
+import os
+import time
+
+import cache_manager
+from cache_manager import CacheManager
+
+
+def write_aged(cache, name, size, age):
+    """Write an entry last accessed `age` seconds ago"""
+    path = os.path.join(cache.cache_dir, name)
+    cache.write(path, b'x' * size)
+    then = time.time() - age
+    os.utime(path, (then, then))
+    return path
+
+
+def test_totals_follow_writes_and_removes(tmp_path):
+    cache = CacheManager(str(tmp_path), max_bytes=0)
+    a = write_aged(cache, 'a/a.csv', 100, 0)
+    write_aged(cache, 'b/b.csv', 50, 0)
+    cache.write(a, b'y' * 30)
+    assert cache.stats()['entries'] == 2 and cache.total_bytes() == 80
+    cache.remove(a)
+    assert cache.stats()['entries'] == 1 and cache.total_bytes() == 50
+    assert cache.total_bytes() == sum(entry['bytes'] for entry in cache.entries())
+
+
+def test_writes_over_budget_evict_least_recently_used(tmp_path):
+    cache = CacheManager(str(tmp_path), max_bytes=250)
+    old = write_aged(cache, 'old.csv', 100, 300)
+    recent = write_aged(cache, 'recent.csv', 100, 100)
+    cache.read(old)
+    new = write_aged(cache, 'new.csv', 100, 0)
+    # Reading the old entry made it recently used, so the other one goes
+    assert cache.exists(old) and cache.exists(new) and not cache.exists(recent)
+    assert cache.evictions == 1 and cache.total_bytes() <= 250
+
+
+def test_pinned_and_just_written_entries_are_kept(tmp_path):
+    cache = CacheManager(str(tmp_path), max_bytes=100)
+    pinned = os.path.join(str(tmp_path), 'pinned.csv')
+    cache.pin(pinned)
+    write_aged(cache, 'pinned.csv', 100, 1000)
+    big = write_aged(cache, 'big.csv', 300, 0)
+    assert cache.exists(pinned) and cache.exists(big)
+    # Only the write that overflowed was protected; a later prune evicts it, never the pinned entry
+    assert [entry['name'] for entry in cache.prune(max_bytes=0)] == ['big.csv']
+    assert cache.exists(pinned) and cache.stats()['pinnedBytes'] == 100
+
+
+def test_compressed_entries_read_back(tmp_path):
+    cache = CacheManager(str(tmp_path), compress=True)
+    path = os.path.join(str(tmp_path), 'doc.json')
+    cache.write(path, 'text ' * 1000)
+    assert os.path.exists(path + '.gz') and not os.path.exists(path)
+    assert cache.read(path) == b'text ' * 1000
+    assert cache.total_bytes() < 1000
+
+
+def test_touch_memo_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_manager, 'TOUCH_MEMO_SIZE', 5)
+    cache = CacheManager(str(tmp_path))
+    paths = [write_aged(cache, f"{i}.csv", 10, 0) for i in range(8)]
+    for path in paths:
+        cache.touch(path)
+    assert list(cache._touched) == paths[3:]
+    cache.remove(paths[7])
+    assert paths[7] not in cache._touched
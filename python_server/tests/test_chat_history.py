@@ -0,0 +1,67 @@
+from chat_history import ChatHistoryManager
+
+
+def conversation(turns, words=60):
+    return [{'role': 'user' if i % 2 == 0 else 'assistant',
+             'content': f"Turn {i} about the water supply. " + 'detail ' * words} for i in range(turns)]
+
+
+class CountingSummarizer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, previous_summary, turns, max_tokens):
+        self.calls.append(len(turns))
+        return '\n'.join(filter(None, [previous_summary] + [turn['content'][:8] for turn in turns]))
+
+
+def test_short_histories_are_sent_verbatim():
+    manager = ChatHistoryManager(token_budget=2000)
+    history = conversation(3, words=5)
+    assert manager.compact('c1', history) == ('', history)
+    assert manager.compact('c1', []) == ('', [])
+
+
+def test_older_turns_are_summarized_within_the_budget():
+    summarizer = CountingSummarizer()
+    manager = ChatHistoryManager(token_budget=400, summarizer=summarizer)
+    summary, recent = manager.compact('c1', conversation(12))
+    assert summary.startswith('Turn 0') and recent and recent[-1]['content'].startswith('Turn 11')
+    assert len(summary.splitlines()) + len(recent) == 12
+
+
+def test_growing_conversations_only_summarize_new_turns():
+    summarizer = CountingSummarizer()
+    manager = ChatHistoryManager(token_budget=400, summarizer=summarizer)
+    history = conversation(20)
+    manager.compact('c1', history[:12])
+    _, recent = manager.compact('c1', history)
+    # Each turn is folded into the summary exactly once
+    assert len(summarizer.calls) == 2
+    assert sum(summarizer.calls) == len(history) - len(recent)
+
+
+def test_an_edited_earlier_turn_is_summarized_again():
+    summarizer = CountingSummarizer()
+    manager = ChatHistoryManager(token_budget=400, summarizer=summarizer)
+    history = conversation(12)
+    original, _ = manager.compact('c1', history)
+    edited = [dict(turn) for turn in history]
+    edited[0]['content'] = 'Edited question about electricity. ' + 'detail ' * 60
+    summary, _ = manager.compact('c1', edited)
+    assert summary != original and summary.startswith('Edited q')
+
+
+def test_conversations_without_an_id_share_nothing():
+    summarizer = CountingSummarizer()
+    manager = ChatHistoryManager(token_budget=400, summarizer=summarizer)
+    manager.compact(None, conversation(12))
+    manager.compact(None, conversation(12))
+    assert len(summarizer.calls) == 2 and manager.stats()['conversations'] == 0
+
+
+def test_cached_summaries_are_bounded():
+    manager = ChatHistoryManager(token_budget=400, max_conversations=3)
+    for i in range(5):
+        manager.compact(f"c{i}", conversation(12))
+    assert manager.stats()['conversations'] == 3
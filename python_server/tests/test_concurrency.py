@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from concurrency import ByteBudget, Overloaded, UpstreamLimiter
+
+
+def test_byte_budget_waits_for_room():
+    async def scenario():
+        budget = ByteBudget('test', 100, wait=1)
+        await budget.acquire(60)
+        waiter = asyncio.ensure_future(budget.acquire(60))
+        await asyncio.sleep(0.01)
+        assert not waiter.done() and budget.stats()['waiting'] == 1
+        budget.release(60)
+        await waiter
+        assert budget.stats() == {'heldBytes': 60, 'maxBytes': 100, 'waiting': 0, 'rejected': 0}
+
+    asyncio.run(scenario())
+
+
+def test_byte_budget_rejects_after_the_wait():
+    async def scenario():
+        budget = ByteBudget('test', 100, wait=0.05)
+        await budget.acquire(60)
+        with pytest.raises(Overloaded):
+            await budget.acquire(60)
+        assert budget.stats() == {'heldBytes': 60, 'maxBytes': 100, 'waiting': 0, 'rejected': 1}
+        budget.release(60)
+        # A request larger than the budget runs once nothing else is held
+        await budget.acquire(500)
+        assert budget.held == 500
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiters_leave_nothing_behind():
+    async def scenario():
+        budget = ByteBudget('test', 100, wait=1)
+        await budget.acquire(60)
+        waiter = asyncio.ensure_future(budget.acquire(60))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert budget.stats()['waiting'] == 0 and budget.held == 60
+
+    asyncio.run(scenario())
+
+
+def test_upstream_limiter_sheds_beyond_its_queue():
+    async def scenario():
+        limiter = UpstreamLimiter('test', max_concurrency=1, max_queue=1)
+        gate = asyncio.Event()
+
+        async def call():
+            await gate.wait()
+            return 'done'
+
+        first = asyncio.ensure_future(limiter.run(call))
+        second = asyncio.ensure_future(limiter.run(call))
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded):
+            await limiter.run(call)
+        gate.set()
+        assert await asyncio.gather(first, second) == ['done', 'done']
+
+    asyncio.run(scenario())
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+from data_fetcher import PCMCDataFetcher
+
+SOURCE = 'electricity_consumption'
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    return PCMCDataFetcher(cache_dir=str(tmp_path), source_mirror=None)
+
+
+def slow_download(fetcher, calls, error=None):
+    def download(source_key, source):
+        calls.append(source_key)
+        time.sleep(0.2)
+        if error is not None:
+            raise error
+        fetcher.cache.write(source['cache_path'], b'month,units\n1,100\n')
+        return {'downloaded': source_key}
+    return download
+
+
+def run_concurrently(func, count=8):
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def call(i):
+        barrier.wait()
+        try:
+            results[i] = func()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_misses_share_one_download(fetcher, monkeypatch):
+    calls = []
+    monkeypatch.setattr(fetcher, '_download', slow_download(fetcher, calls))
+    results = run_concurrently(lambda: fetcher.fetch_data(SOURCE))
+    assert calls == [SOURCE]
+    assert all(result is results[0] for result in results)
+    assert fetcher._flights == {}
+
+
+def test_followers_see_the_leaders_error(fetcher, monkeypatch):
+    calls = []
+    monkeypatch.setattr(fetcher, '_download', slow_download(fetcher, calls, RuntimeError('upstream down')))
+    source = fetcher.data_sources[SOURCE]
+    results = run_concurrently(lambda: fetcher._fetch_single_flight(SOURCE, source, lambda mtime: False))
+    assert calls == [SOURCE]
+    assert all(isinstance(result, RuntimeError) for result in results)
+    # The failed flight is gone, so the next caller tries again
+    assert fetcher._flights == {}
+
+
+def test_a_current_cache_written_meanwhile_is_used(fetcher, monkeypatch):
+    calls = []
+    monkeypatch.setattr(fetcher, '_download', slow_download(fetcher, calls))
+    source = fetcher.data_sources[SOURCE]
+    fetcher.cache.write(source['cache_path'], b'month,units\n1,100\n')
+    data = fetcher._fetch_single_flight(SOURCE, source, lambda mtime: True)
+    assert calls == [] and list(data.columns) == ['month', 'units']
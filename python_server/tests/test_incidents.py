@@ -0,0 +1,57 @@
+from incidents import IncidentClusterer, cluster_complaints
+
+HOUR = 3600
+OUTAGE = 'No water supply in our society since yesterday morning, tanker also not sent'
+
+
+def test_near_duplicates_join_one_incident():
+    clusterer = IncidentClusterer()
+    ids = clusterer.add_batch([
+        OUTAGE,
+        'no water supply in our society since yesterday morning, tanker not sent',
+        'NO WATER SUPPLY in our society since yesterday morning; tanker also not sent!',
+        'Street light pole sparking dangerously near the bus stop on the main road',
+    ], [0, 60, 120, 180], ['water', 'water', 'water', 'energy'], ['Nigdi'] * 4)
+    assert ids == [0, 0, 0, 1]
+    summary = clusterer.summary()
+    assert (summary['complaints'], summary['incidents'], summary['duplicateComplaints']) == (4, 2, 2)
+    assert summary['largestIncidents'][0]['size'] == 3
+
+
+def test_same_words_elsewhere_are_other_incidents():
+    clusterer = IncidentClusterer()
+    ids = clusterer.add_batch([OUTAGE] * 4, [0, 1, 2, 3], ['water', 'water', 'water', 'energy'],
+                              ['Nigdi', 'Pimpri', 'Nigdi', 'Nigdi'])
+    # The Pimpri incident shares every LSH bucket with the Nigdi one and must not hide it
+    assert ids == [0, 1, 0, 2]
+
+
+def test_incidents_close_after_the_window():
+    clusterer = IncidentClusterer(window_hours=48)
+    first = clusterer.add(OUTAGE, 0, 'water', 'Nigdi')
+    assert clusterer.add(OUTAGE, 47 * HOUR, 'water', 'Nigdi') == first
+    assert clusterer.add(OUTAGE, 96 * HOUR, 'water', 'Nigdi') != first
+    assert clusterer.summary()['openIncidents'] == 1
+
+
+def test_incidents_stop_growing_after_the_max_span():
+    clusterer = IncidentClusterer(window_hours=48, max_span_hours=72)
+    ids = [clusterer.add(OUTAGE, hours * HOUR, 'water', 'Nigdi') for hours in (0, 40, 80)]
+    assert ids[0] == ids[1] != ids[2]
+
+
+def test_active_incidents_are_bounded():
+    clusterer = IncidentClusterer(max_active=10)
+    clusterer.add_batch([f"complaint number {i} about something else entirely {i * 7919}" for i in range(100)],
+                        list(range(100)))
+    assert clusterer.summary()['openIncidents'] == 10
+    assert all(len(ids) <= 10 for ids in clusterer._buckets.values())
+
+
+def test_cluster_complaints_orders_by_time():
+    summary = cluster_complaints([OUTAGE, OUTAGE, 'Transformer blast near the school'],
+                                 ['2024-05-03T10:00:00', '2024-05-01T10:00:00', None],
+                                 ['water', 'water', 'energy'])
+    assert (summary['incidents'], summary['duplicateComplaints']) == (2, 1)
+    incident = summary['largestIncidents'][0]
+    assert incident['firstSeen'].startswith('2024-05-01') and incident['spanHours'] == 48
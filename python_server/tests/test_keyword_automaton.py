@@ -0,0 +1,34 @@
+from keyword_automaton import KeywordAutomaton, normalize
+
+
+def test_matches_whole_words_only():
+    automaton = KeywordAutomaton({'leak': 'leak', 'burst pipe': 'burst'})
+    assert automaton.find(normalize('Leak near the gate')) == ['leak']
+    assert automaton.find(normalize('leaking tap, burst pipes')) == []
+
+
+def test_finds_overlapping_and_nested_phrases():
+    automaton = KeywordAutomaton({'no water': 'shortage', 'water': 'water', 'water supply': 'supply'})
+    assert sorted(automaton.find(normalize('No water supply'))) == ['shortage', 'supply', 'water']
+
+
+def test_reports_every_occurrence_with_its_end():
+    automaton = KeywordAutomaton({'no water': 'shortage', 'water': 'water'})
+    text = normalize('No water! Water tanker late, no water again')
+    found = automaton.find_ends(text)
+    assert [value for _, value in found] == ['shortage', 'water', 'water', 'shortage', 'water']
+    for end, value in found:
+        assert text[:end + 1].endswith(' no water ' if value == 'shortage' else ' water ')
+
+
+def test_stems_match_any_word_starting_with_them():
+    automaton = KeywordAutomaton({'leak*': 'leak', 'spark*': 'spark'})
+    assert automaton.find(normalize('Pipe LEAKING near the gate')) == ['leak']
+    assert automaton.find(normalize('pipe leaks')) == ['leak']
+    assert automaton.find(normalize('sparks from the pole')) == ['spark']
+    assert automaton.find(normalize('unsparked')) == []
+
+
+def test_normalize_collapses_punctuation_and_case():
+    assert normalize('  No-Water,  since 3 DAYS!! ') == ' no water since 3 days '
+    assert KeywordAutomaton({}).find(normalize('anything')) == []
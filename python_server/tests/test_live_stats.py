@@ -0,0 +1,86 @@
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from data_fetcher import city_names
+from live_stats import ComplaintStream, LogMapping, RingWindow
+
+CITIES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cities.json')
+NOW = 1_700_000_000.0
+
+
+def iso(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+
+
+def test_sketch_quantiles_are_within_the_relative_accuracy():
+    mapping = LogMapping(0.01, 1 / 60, 720)
+    rng = np.random.default_rng(1)
+    values = rng.lognormal(mean=2, sigma=1.2, size=50_000).clip(1 / 60, 720)
+    counts = np.bincount(mapping.index(values), minlength=mapping.bins)
+    quantiles = [0.5, 0.9, 0.99]
+    estimated = mapping.quantiles(counts, quantiles)
+    exact = np.quantile(values, quantiles, method='lower')
+    assert np.all(np.abs(estimated - exact) <= 0.01 * exact + 1e-9)
+
+
+def test_sketch_quantiles_along_the_last_axis():
+    mapping = LogMapping(0.01, 1 / 60, 720)
+    counts = np.zeros((2, mapping.bins), dtype=np.int64)
+    np.add.at(counts[0], mapping.index(np.array([1.0, 2.0, 3.0])), 1)
+    median = mapping.quantiles(counts, [0.5])
+    assert median[0, 0] == pytest.approx(2.0, rel=0.01)
+    assert np.isnan(median[1, 0])
+
+
+def test_ring_window_totals_recent_slots():
+    ring = RingWindow(60, 10, (2,))
+    assert ring.add(np.array([0, 30, 61, 125]), (np.array([0, 0, 1, 0]),)) == 0
+    assert ring.total(60, 125).tolist() == [1, 0]
+    assert ring.total(180, 125).tolist() == [3, 1]
+
+
+def test_ring_window_rolls_old_slots_off():
+    ring = RingWindow(60, 10, (1,))
+    ring.add(np.array([0, 60]), (np.array([0, 0]),))
+    # Slot 10 pushes slot 0 out of the ring; an event for slot 0 is now too old
+    assert ring.add(np.array([600, 0]), (np.array([0, 0]),)) == 1
+    assert ring.total(600, 600).tolist() == [2]
+    # Far ahead, everything is cleared
+    assert ring.total(600, 60 * 100).tolist() == [0]
+
+
+@pytest.fixture
+def stream():
+    with open(CITIES) as f:
+        city = json.load(f)['pimpri_chinchwad']
+    return ComplaintStream(city['areas'], city_names(city))
+
+
+def test_stream_counts_windows_and_resolution_quantiles(stream):
+    events = [{'category': 'water', 'location': 'Nigdi', 'date': iso(NOW - 10 * 60)}] * 3
+    events += [{'category': 'energy', 'description': 'outage in Wakad', 'date': iso(NOW - 2 * 3600)}]
+    events += [{'type': 'resolved', 'category': 'water', 'location': 'Nigdi', 'resolutionHours': hours}
+               for hours in (1, 2, 3, 4, 100)]
+    assert stream.add_events(events, now=NOW) == {'created': 4, 'resolved': 5, 'dropped': 0}
+
+    snapshot = stream.snapshot(now=NOW)
+    assert snapshot['windows']['15m']['byArea'] == {'Nigdi': {'water': 3}}
+    assert snapshot['windows']['24h']['byCategory'] == {'water': 3, 'energy': 1}
+    water = snapshot['resolutionHours']['24h']['byCategory']['water']
+    assert water['count'] == 5
+    assert water['p50'] == pytest.approx(3, rel=0.01)
+    assert water['p99'] == pytest.approx(4, rel=0.01)
+
+
+def test_stream_drops_future_and_expired_events(stream):
+    result = stream.add_events([
+        {'category': 'water', 'date': iso(NOW + 3600)},
+        {'category': 'water', 'date': iso(NOW - 3 * 24 * 3600)},
+        {'category': 'water', 'date': iso(NOW)},
+    ], now=NOW)
+    assert result == {'created': 1, 'resolved': 0, 'dropped': 2}
+    assert stream.snapshot(now=NOW)['events'] == result
@@ -0,0 +1,54 @@
+import pytest
+
+from priority import PriorityScorer
+
+
+@pytest.fixture(scope='module')
+def scorer():
+    return PriorityScorer()
+
+
+@pytest.mark.parametrize('text, category', [
+    ('Burst water main flooding the road near Nigdi', 'water'),
+    ('No water supply since morning in our society', 'water'),
+    ('Sparks and smoke from the transformer near the school', 'energy'),
+    ('no water and sewage overflow near school', 'water'),
+    ('No response yet. Pipe burst on main road', 'water'),
+])
+def test_emergencies_are_high(scorer, text, category):
+    result = scorer.score(text, category)
+    assert (result['priority'], result['reason']) == ('high', 'emergency')
+
+
+@pytest.mark.parametrize('text, category', [
+    ('no water pressure issue, all good', 'water'),
+    ('there is no burst pipe, only low pressure', 'water'),
+    ("There isn't any contamination", 'water'),
+    ('Power is back, no sparks anymore', 'energy'),
+])
+def test_negated_emergencies_do_not_count(scorer, text, category):
+    result = scorer.score(text, category)
+    assert result['reason'] != 'emergency'
+    assert result['priority'] != 'high'
+
+
+def test_negated_urgency_does_not_count(scorer):
+    assert scorer.score('This is not urgent, just a query about the water schedule')['priority'] == 'low'
+    assert scorer.score('not an emergency but the meter is broken', 'energy')['priority'] == 'medium'
+
+
+def test_urgency_and_severity_signals(scorer):
+    assert scorer.score('URGENT: transformer noise')['reason'] == 'urgent'
+    # Danger, vulnerable people and duration add up to high priority
+    assert scorer.score('Dangerous open drain near the hospital for 3 days', 'water')['priority'] == 'high'
+
+
+def test_routine_and_service(scorer):
+    assert scorer.score('Request for information about the new tariff')['priority'] == 'low'
+    assert scorer.score('Low water pressure on the third floor', 'water')['priority'] == 'medium'
+
+
+def test_category_specific_phrases(scorer):
+    # 'no power' is an energy emergency, not a water one
+    assert scorer.score('no power in the pump room', 'energy')['reason'] == 'emergency'
+    assert scorer.score('no power in the pump room', 'water')['reason'] != 'emergency'
@@ -0,0 +1,22 @@
+import pytest
+
+from startup_profile import DEFAULT_BUDGET_SECONDS, LAZY_MODULES, profile_import
+
+
+@pytest.fixture(scope='module')
+def report():
+    # `import app` in fresh interpreters under -X importtime, fastest of three
+    return profile_import('app', runs=3)
+
+
+def test_cold_import_is_within_budget(report):
+    assert report['totalSeconds'] <= DEFAULT_BUDGET_SECONDS
+
+
+@pytest.mark.parametrize('module', ['pandas', 'matplotlib', 'google.generativeai', 'pdfplumber', 'tabula'])
+def test_heavy_modules_are_not_imported_eagerly(report, module):
+    assert module in LAZY_MODULES
+    imported = {entry['module'] for entry in report['modules']}
+    assert module not in imported
+    assert module not in report['eagerHeavyModules']
+
@@ -0,0 +1,120 @@
+"""Long-lived helper processes serving requests over a socket pair
+
+Each worker is a fresh interpreter running a module's command line, so it
+neither inherits the web worker's memory and threads nor re-imports the
+server's __main__ like multiprocessing's spawn would. Requests to one worker
+are serialized; a worker that dies or times out is killed and replaced on
+the next request.
+"""
+
+import os
+import sys
+import socket
+import threading
+import subprocess
+from multiprocessing.connection import Connection
+
+
+class WorkerProcess:
+    """Client side of one worker started as `python <script> <args> --fd <n>`"""
+
+    # Names the work in timeout and exit errors
+    description = 'Worker'
+
+    def __init__(self, script, args=(), timeout=None):
+        self.script = os.path.abspath(script)
+        self.args = list(args)
+        self.timeout = timeout
+        self.requests = 0
+        self._process = None
+        self._connection = None
+        self._owner = os.getpid()
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._owner != os.getpid():
+            # Inherited through fork (e.g. a preloaded gunicorn master): the worker belongs to the parent
+            self._process = self._connection = None
+            self._owner = os.getpid()
+        if self._process is not None and self._process.poll() is None:
+            return
+        parent_socket, child_socket = socket.socketpair()
+        self._process = subprocess.Popen(
+            [sys.executable, self.script, *self.args, '--fd', str(child_socket.fileno())],
+            pass_fds=(child_socket.fileno(),))
+        child_socket.close()
+        self._connection = Connection(parent_socket.detach())
+        self.requests = 0
+
+    def call(self, message):
+        """Send one request and return the worker's reply, raising its error"""
+        with self._lock:
+            self._ensure_started()
+            try:
+                self._connection.send(message)
+                if not self._connection.poll(self.timeout):
+                    self._stop()
+                    raise TimeoutError(f"{self.description} took longer than {self.timeout}s")
+                status, payload = self._connection.recv()
+            except (EOFError, OSError):
+                self._stop()
+                raise RuntimeError(f"{self.description} worker exited")
+            self.requests += 1
+        if status == 'error':
+            raise RuntimeError(payload)
+        return payload
+
+    def restart(self):
+        """Replace the worker process on the next request"""
+        with self._lock:
+            self._stop()
+
+    def _stop(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.wait()
+        if self._connection is not None:
+            self._connection.close()
+        self._process = None
+        self._connection = None
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                # The worker exits when its end of the connection closes
+                self._connection.close()
+            if self._process is not None:
+                try:
+                    self._process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self._process.kill()
+                    self._process.wait()
+            self._process = None
+            self._connection = None
+
+
+def serve(connection, handle):
+    """Worker side: answer every message with handle(message) until the connection closes"""
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+        try:
+            connection.send(('ok', handle(message)))
+        except Exception as e:
+            connection.send(('error', f"{type(e).__name__}: {e}"))
+
+
+def peak_rss_kb():
+    """Peak resident memory of this process and of the largest child it waited for (e.g. a tabula JVM)"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    try:
+        # ru_maxrss survives fork and exec, so a fresh worker would report its parent's peak;
+        # VmHWM belongs to this process's own address space
+        with open('/proc/self/status') as f:
+            peak = next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+    except (OSError, StopIteration):
+        pass
+    return {'peakRssKb': peak, 'childPeakRssKb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss}